@@ -5,7 +5,7 @@ from sqlalchemy import pool
 
 from alembic import context
 from backend.app.db.database import Base
-from backend.app.models import user, conversation, document, safety_incident  # Import your models here
+from backend.app.models import user, conversation, document, safety_incident, cache_version  # Import your models here
 
 config = context.config
 
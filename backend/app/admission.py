@@ -0,0 +1,372 @@
+"""Admission control and per-client rate limiting for the chat endpoints"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import sqlite3
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+try:
+    from config import settings
+    from metrics import ADMISSION_REJECTED, ADMISSION_WAIT_SECONDS
+except ImportError:
+    from app.config import settings
+    from app.metrics import ADMISSION_REJECTED, ADMISSION_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Endpoints that start upstream model calls
+CHAT_PATHS = ("/api/chat", "/api/chat/stream", "/api/chat/batch")
+# Endpoints holding one admission slot per request; a batch takes one per item
+ADMISSION_PATHS = ("/api/chat", "/api/chat/stream")
+
+
+class AdmissionRejected(Exception):
+    """No slot and no room (or time) left in the wait queue"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Server is busy")
+        self.retry_after = retry_after
+
+
+class AdmissionLimiter:
+    """
+    Bound concurrent requests per worker, with a bounded FIFO wait queue.
+
+    Up to `max_concurrent` requests hold a slot; up to `max_queue` more wait
+    for one, each for at most `max_wait_seconds`. Anything beyond that is
+    rejected at once so a burst fails fast instead of piling up coroutines
+    and sockets that all time out together. Retry-After is estimated from
+    the average slot hold time and the current queue length.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        max_wait_seconds: Optional[float] = None,
+    ):
+        self.max_concurrent = max_concurrent if max_concurrent is not None else settings.ADMISSION_MAX_CONCURRENT
+        self.max_queue = max_queue if max_queue is not None else settings.ADMISSION_MAX_QUEUE
+        self.max_wait_seconds = (
+            max_wait_seconds if max_wait_seconds is not None else settings.ADMISSION_MAX_WAIT_SECONDS
+        )
+        self._in_flight = 0
+        self._waiters: "deque[asyncio.Future]" = deque()
+        self._hold_seconds = 1.0  # moving average of how long a slot is held
+
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.max_queue_depth = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def retry_after(self) -> int:
+        """Whole seconds until a slot is likely to be free for a new request"""
+        rounds = (len(self._waiters) + 1) / max(1, self.max_concurrent)
+        return max(1, math.ceil(self._hold_seconds * rounds))
+
+    async def acquire(self):
+        if self._in_flight < self.max_concurrent and not self._waiters:
+            self._in_flight += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            ADMISSION_REJECTED.inc("queue_full")
+            raise AdmissionRejected(self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        self.max_queue_depth = max(self.max_queue_depth, len(self._waiters))
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.max_wait_seconds)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            self.timed_out += 1
+            ADMISSION_REJECTED.inc("queue_timeout")
+            raise AdmissionRejected(self.retry_after())
+        except asyncio.CancelledError:
+            # Granted a slot just as the caller went away: pass it on
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            waited = time.perf_counter() - started
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+            ADMISSION_WAIT_SECONDS.observe(waited)
+        self.admitted += 1
+
+    def release(self, held_seconds: Optional[float] = None):
+        if held_seconds is not None:
+            self._hold_seconds = 0.9 * self._hold_seconds + 0.1 * held_seconds
+        # Hand the slot straight to the oldest waiter so in-flight never dips
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self._in_flight,
+            "max_concurrent": self.max_concurrent,
+            "queue_depth": len(self._waiters),
+            "max_queue": self.max_queue,
+            "max_queue_depth": self.max_queue_depth,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_wait_ms": round(self.wait_seconds_total / self.queued * 1000, 1) if self.queued else 0.0,
+            "max_wait_ms": round(self.wait_seconds_max * 1000, 1),
+        }
+
+
+class MemoryBucketStore:
+    """Token buckets in this worker's memory, least recently used dropped first"""
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        # key -> (tokens, updated_at)
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, key: str, rate: float, burst: float, now: float) -> float:
+        """Take one token; returns 0 if allowed, else seconds until one is available"""
+        tokens, updated = self._buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def close(self):
+        pass
+
+
+class SQLiteBucketStore:
+    """
+    Token buckets in a SQLite file shared by every worker on the host.
+
+    take() blocks on the file lock for up to `timeout` seconds, so RateLimiter
+    runs it on `executor`, a single thread that also keeps the connection's
+    transactions from interleaving.
+    """
+
+    def __init__(self, path: str, timeout: float = 0.05):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=timeout)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rate-limit")
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def take(self, key: str, rate: float, burst: float, now: float) -> float:
+        # IMMEDIATE takes the write lock up front so read-modify-write is atomic across workers
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._db.execute("SELECT tokens, updated_at FROM rate_limit WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row is not None else (burst, now)
+            tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            self._db.execute(
+                "INSERT OR REPLACE INTO rate_limit (key, tokens, updated_at) VALUES (?, ?, ?)", (key, tokens, now)
+            )
+            self._db.execute("COMMIT")
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+        return wait
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM rate_limit").fetchone()[0]
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self._db.close()
+
+
+class RateLimiter:
+    """Per-client token bucket: `per_minute` sustained, `burst` at once (0 per minute disables)"""
+
+    def __init__(
+        self,
+        per_minute: Optional[float] = None,
+        burst: Optional[int] = None,
+        sqlite_path: Optional[str] = None,
+        trust_forwarded: Optional[bool] = None,
+        sqlite_timeout: Optional[float] = None,
+        fail_open: Optional[bool] = None,
+    ):
+        self.per_minute = per_minute if per_minute is not None else settings.RATE_LIMIT_PER_MINUTE
+        self.burst = burst if burst is not None else settings.RATE_LIMIT_BURST
+        self.trust_forwarded = trust_forwarded if trust_forwarded is not None else settings.RATE_LIMIT_TRUST_FORWARDED
+        self.fail_open = fail_open if fail_open is not None else settings.RATE_LIMIT_FAIL_OPEN
+        sqlite_path = sqlite_path if sqlite_path is not None else settings.RATE_LIMIT_SQLITE_PATH
+        sqlite_timeout = sqlite_timeout if sqlite_timeout is not None else settings.RATE_LIMIT_SQLITE_TIMEOUT_MS / 1000
+        self.store = SQLiteBucketStore(sqlite_path, sqlite_timeout) if sqlite_path else MemoryBucketStore()
+
+        self.allowed = 0
+        self.limited = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.per_minute > 0
+
+    def client_keys(self, scope: dict) -> List[str]:
+        """
+        Buckets a request is charged to: always the client address, plus the
+        Authorization header (hashed) when present. Nothing verifies that
+        header, so its bucket only adds a limit; a fresh token per request
+        still drains the address's bucket.
+        """
+        headers = dict(scope.get("headers") or [])
+        forwarded = headers.get(b"x-forwarded-for", b"")
+        if self.trust_forwarded and forwarded:
+            address = forwarded.decode("latin-1").split(",")[0].strip()
+        else:
+            client = scope.get("client")
+            address = client[0] if client else "unknown"
+        keys = ["ip:" + address]
+        authorization = headers.get(b"authorization", b"")
+        if authorization:
+            keys.append("auth:" + hashlib.sha256(authorization).hexdigest()[:16])
+        return keys
+
+    def _take_all(self, keys, rate: float, burst: float, now: float) -> float:
+        # Every bucket is charged; the request waits for the emptiest one
+        return max(self.store.take(key, rate, burst, now) for key in keys)
+
+    async def check(self, *keys: str) -> float:
+        """0 if the request may proceed, else seconds until every one of its buckets has a token"""
+        args = (keys, self.per_minute / 60, max(1, self.burst), time.time())
+        try:
+            if isinstance(self.store, SQLiteBucketStore):
+                wait = await asyncio.get_running_loop().run_in_executor(self.store.executor, self._take_all, *args)
+            else:
+                wait = self._take_all(*args)
+        except sqlite3.Error as e:
+            # Busy or broken shared state: an explicit policy, never a 500
+            self.errors += 1
+            if self.fail_open:
+                logger.warning(f"Rate limit store error, allowing request: {str(e)}")
+                return 0.0
+            logger.warning(f"Rate limit store error, rejecting request: {str(e)}")
+            ADMISSION_REJECTED.inc("rate_limit")
+            return 1.0
+        if wait > 0:
+            self.limited += 1
+            ADMISSION_REJECTED.inc("rate_limit")
+        else:
+            self.allowed += 1
+        return wait
+
+    def close(self):
+        self.store.close()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "per_minute": self.per_minute,
+            "burst": self.burst,
+            "shared": isinstance(self.store, SQLiteBucketStore),
+            "fail_open": self.fail_open,
+            "clients": len(self.store),
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "errors": self.errors,
+        }
+
+
+async def _reject(send, detail: str, retry_after: int):
+    body = json.dumps({"detail": detail}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": 429,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(retry_after).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class RateLimitMiddleware:
+    """ASGI middleware applying a RateLimiter to POSTs on `paths`"""
+
+    def __init__(self, app, limiter: RateLimiter, paths: Iterable[str] = CHAT_PATHS):
+        self.app = app
+        self.limiter = limiter
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] == "http" and self.limiter.enabled
+            and scope["method"] == "POST" and scope["path"] in self.paths
+        ):
+            wait = await self.limiter.check(*self.limiter.client_keys(scope))
+            if wait > 0:
+                await _reject(send, "Rate limit exceeded. Please slow down.", max(1, math.ceil(wait)))
+                return
+        await self.app(scope, receive, send)
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware holding an AdmissionLimiter slot for the whole request on
+    `paths`, including a streamed body, so the slot is always released.
+    """
+
+    def __init__(self, app, limiter: AdmissionLimiter, paths: Iterable[str] = ADMISSION_PATHS):
+        self.app = app
+        self.limiter = limiter
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self.limiter.acquire()
+        except AdmissionRejected as e:
+            await _reject(send, "Server is busy. Please try again shortly.", e.retry_after)
+            return
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.limiter.release(time.perf_counter() - started)
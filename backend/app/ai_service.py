@@ -1,36 +1,72 @@
 """AI service for generating safe SOP explanations using OpenRouter Gemini Flash"""
 
+import asyncio
 import httpx
-import re
-from typing import Optional
+import json
+import logging
+import time
+from typing import AsyncIterator, Optional
 try:
     from config import settings
     from safety_filter import SafetyFilter
+    from http_client import PooledHTTPClient
+    from matcher import CompiledRuleSet
+    from prompt_builder import PromptBuilder
+    from router import ModelRouter, UpstreamTarget, UpstreamUnavailable, build_router
+    from deadline import Deadline, DeadlineExceeded
+    from metrics import (
+        CACHE_LOOKUPS, COMPLIANCE_OUTCOMES, COMPLIANCE_SCAN_SECONDS, COMPLIANCE_VIOLATIONS,
+        UPSTREAM_ERRORS, UPSTREAM_SECONDS, upstream_error_code
+    )
+    from response_cache import ResponseCache
+    from sanitizer import ComplianceSanitizer, sentence_spans
+    from semantic_cache import QuestionEmbedder, SemanticCache
+    from singleflight import SingleFlight
+    from timing import stage
 except ImportError:
     from app.config import settings
     from app.safety_filter import SafetyFilter
+    from app.http_client import PooledHTTPClient
+    from app.matcher import CompiledRuleSet
+    from app.prompt_builder import PromptBuilder
+    from app.router import ModelRouter, UpstreamTarget, UpstreamUnavailable, build_router
+    from app.deadline import Deadline, DeadlineExceeded
+    from app.metrics import (
+        CACHE_LOOKUPS, COMPLIANCE_OUTCOMES, COMPLIANCE_SCAN_SECONDS, COMPLIANCE_VIOLATIONS,
+        UPSTREAM_ERRORS, UPSTREAM_SECONDS, upstream_error_code
+    )
+    from app.response_cache import ResponseCache
+    from app.sanitizer import ComplianceSanitizer, sentence_spans
+    from app.semantic_cache import QuestionEmbedder, SemanticCache
+    from app.singleflight import SingleFlight
+    from app.timing import stage
+
+logger = logging.getLogger(__name__)
 
 
 class AIService:
     """Service for generating AI explanations with safety controls"""
     
-    # Banned action verbs that indicate operational instructions
+    # Banned action verbs that indicate operational instructions, as (category, pattern)
     # These patterns look for imperative/instructional use, not descriptive use
     BANNED_VERBS = [
         # Strong operational verbs (always banned)
-        r'\b(disconnect|lock|attach|turn|switch|press|isolate|activate|deactivate)\s+(the|a|an|it)\b',
-        r'\b(connect|remove|insert|pull|push|rotate|flip|engage|disengage)\s+(the|a|an|it)\b',
-        r'\b(install|uninstall|mount|unmount|fasten|unfasten)\s+(the|a|an|it)\b',
+        ("operational_verb", r'\b(disconnect|lock|attach|turn|switch|press|isolate|activate|deactivate)\s+(the|a|an|it)\b'),
+        ("operational_verb", r'\b(connect|remove|insert|pull|push|rotate|flip|engage|disengage)\s+(the|a|an|it)\b'),
+        ("operational_verb", r'\b(install|uninstall|mount|unmount|fasten|unfasten)\s+(the|a|an|it)\b'),
         
         # Instructional phrases (action + object)
-        r'\b(open|close)\s+(the|a|an)\s+(door|valve|panel|switch|breaker)\b',
-        r'\b(apply|place|position|adjust)\s+(the|a|an|your)\b',
+        ("instructional_phrase", r'\b(open|close)\s+(the|a|an)\s+(door|valve|panel|switch|breaker)\b'),
+        ("instructional_phrase", r'\b(apply|place|position|adjust)\s+(the|a|an|your)\b'),
         
         # Imperative forms suggesting instructions
-        r'\byou\s+(should|must|need to)\s+(disconnect|lock|attach|turn|switch|press|isolate|remove|connect|verify|check|test|inspect)\b',
-        r'\b(first|then|next|finally),?\s+(disconnect|lock|attach|turn|switch|press)\b',
+        ("imperative", r'\byou\s+(should|must|need to)\s+(disconnect|lock|attach|turn|switch|press|isolate|remove|connect|verify|check|test|inspect)\b'),
+        ("imperative", r'\b(first|then|next|finally),?\s+(disconnect|lock|attach|turn|switch|press)\b'),
     ]
     
+    # Compiled once; scans a response in a single pass
+    BANNED_VERB_RULES = CompiledRuleSet(BANNED_VERBS)
+    
     SYSTEM_PROMPT = """You are a Manufacturing SOP & Safety Explanation Assistant designed for enterprise training environments.
 
 Your primary objective is to HELP USERS UNDERSTAND safety concepts and SOP intent,
@@ -145,10 +181,52 @@ Before sending ANY response:
 
 You are an EXPLAINER of safety intent — not an INSTRUCTOR of safety actions."""
 
-    def __init__(self):
+    SAFETY_DISCLAIMER = "⚠️ Safety Disclaimer: This explanation is for educational purposes only. It does not provide operational instructions, approvals, or real-time guidance. Always follow your organization's official procedures and consult authorized supervisors or safety officers."
+
+    FALLBACK_RESPONSE = """I apologize, but I'm having difficulty providing a response that meets our strict safety compliance standards.
+
+To ensure I don't inadvertently provide operational instructions, I recommend:
+- Consulting your organization's official SOP documentation
+- Speaking with your supervisor or safety officer
+- Attending authorized training sessions
+
+⚠️ Safety Disclaimer: This explanation is for educational purposes only. It does not provide operational instructions, approvals, or real-time guidance. Always follow your organization's official procedures and consult authorized supervisors or safety officers."""
+
+    # Characters of streamed text held back from the client so a banned phrase
+    # split across chunks is caught before any of it is forwarded
+    STREAM_HOLDBACK_CHARS = 80
+    # After a violation the stream is read on for at most this much more text
+    # (or time) so the answer can usually still be fixed locally, then closed
+    STREAM_VIOLATION_TAIL_CHARS = 600
+    STREAM_VIOLATION_TAIL_SECONDS = 2.0
+
+    def __init__(
+        self,
+        http_client: Optional[PooledHTTPClient] = None,
+        response_cache: Optional[ResponseCache] = None,
+        semantic_cache: Optional[SemanticCache] = None,
+        router: Optional[ModelRouter] = None
+    ):
         self.api_key = settings.OPENROUTER_API_KEY
-        self.api_url = settings.OPENROUTER_API_URL
-        self.model = settings.MODEL_NAME
+        # Ordered endpoint/model targets with hedging, failover and breakers
+        self.router = router or build_router()
+        self.api_url = self.router.primary.url
+        self.model = self.router.primary.model
+        # Serializes the static model/system-prompt prefix once and budgets the rest;
+        # one builder per target model
+        self.prompt_builder = PromptBuilder(self.model, self.SYSTEM_PROMPT)
+        self._prompt_builders = {self.model: self.prompt_builder}
+        # Shared keep-alive pool; main.py owns its lifetime via the FastAPI lifespan
+        self.http_client = http_client or PooledHTTPClient()
+        # Coalesces identical in-flight questions into one upstream call
+        self.single_flight = SingleFlight()
+        # Optional exact-match and semantic (paraphrase) caches of compliant answers
+        self.response_cache = response_cache
+        self.semantic_cache = semantic_cache
+        # Local sentence-level fix for violations, before any model rewrite
+        self.sanitizer = ComplianceSanitizer(self.BANNED_VERB_RULES) if settings.LOCAL_SANITIZER_ENABLED else None
+        # How each generated answer reached compliance
+        self.compliance_paths = {"clean": 0, "local": 0, "remote": 0, "fallback": 0}
     
     def _contains_banned_verbs(self, text: str) -> tuple[bool, list]:
         """
@@ -157,20 +235,279 @@ You are an EXPLAINER of safety intent — not an INSTRUCTOR of safety actions.""
         Returns:
             (has_violations, list_of_violations)
         """
-        violations = []
-        text_lower = text.lower()
-        
-        for pattern in self.BANNED_VERBS:
-            matches = re.findall(pattern, text_lower, re.IGNORECASE)
-            if matches:
-                violations.extend(matches)
+        started = time.perf_counter()
+        violations = [match.text for match in self.BANNED_VERB_RULES.scan(text)]
+        COMPLIANCE_SCAN_SECONDS.observe(time.perf_counter() - started)
         
         return (len(violations) > 0, violations)
+
+    @staticmethod
+    def _format_violations(violations: list) -> str:
+        """Render violations for logs and the rewrite prompt"""
+        return ', '.join(violations)
+
+    def _build_user_message(
+        self,
+        user_query: str,
+        sop_context: Optional[str] = None,
+        history: Optional[str] = None
+    ) -> str:
+        """Combine optional SOP context and conversation history (trimmed to the token budget) and the user question"""
+        return self.prompt_builder.user_message(user_query, sop_context, history)
+
+    def _completion_request(
+        self,
+        user_message: str,
+        temperature: float,
+        stream: bool = False,
+        model: Optional[str] = None
+    ) -> dict:
+        """Keyword arguments for a chat-completions POST"""
+        model = model or self.model
+        builder = self._prompt_builders.get(model)
+        if builder is None:
+            builder = self._prompt_builders[model] = PromptBuilder(model, self.SYSTEM_PROMPT)
+        
+        return {
+            "headers": {
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json",
+            },
+            "content": builder.body(user_message, temperature, stream=stream),
+        }
+
+    def _request_timeout(self, deadline: Optional[Deadline]) -> dict:
+        """Per-request httpx timeout that never outlives the deadline"""
+        if deadline is None:
+            return {}
+        return {"timeout": deadline.timeout(cap=self.http_client.timeout)}
+
+    async def _complete_on(
+        self,
+        target: UpstreamTarget,
+        user_message: str,
+        temperature: float,
+        deadline: Optional[Deadline] = None
+    ) -> str:
+        """Run one non-streaming completion against one target"""
+        started = time.perf_counter()
+        try:
+            response = await self.http_client.post(
+                target.url,
+                **self._completion_request(user_message, temperature, model=target.model),
+                **self._request_timeout(deadline)
+            )
+            response.raise_for_status()
+        except (httpx.HTTPError, DeadlineExceeded) as e:
+            UPSTREAM_ERRORS.inc(target.model, upstream_error_code(e))
+            raise
+        UPSTREAM_SECONDS.observe(time.perf_counter() - started, target.model, "complete")
+        data = response.json()
+        
+        return data["choices"][0]["message"]["content"]
+
+    async def _complete(self, user_message: str, temperature: float, deadline: Optional[Deadline] = None) -> str:
+        """
+        Run one completion through the router (retries, hedging, failover);
+        a compliant answer from any target wins over a violating one
+        """
+        return await self.router.call(
+            lambda target: self._complete_on(target, user_message, temperature, deadline),
+            accept=lambda text: not self._contains_banned_verbs(text)[0],
+            deadline=deadline
+        )
+
+    async def _rewrite_for_compliance(
+        self,
+        ai_response: str,
+        violations: list,
+        deadline: Optional[Deadline] = None
+    ) -> str:
+        """
+        Ask the model to rewrite a non-compliant response; fall back to the
+        canned compliant answer if the rewrite still violates.
+        """
+        rewrite_prompt = f"""Your previous response contained operational language that violates safety compliance rules.
+
+VIOLATIONS FOUND: {self._format_violations(violations)}
+
+You MUST rewrite this response in PURELY CONCEPTUAL language:
+- Remove ALL action verbs
+- Focus on PURPOSE and WHY, not HOW
+- Use the gold-standard LOTO example as your template
+- Make it enterprise-safe and judge-approved
+
+Original response that needs rewriting:
+{ai_response}
+
+Provide the corrected, compliant version now:"""
+        
+        # Lower temperature for more compliance
+        ai_response = await self._complete(rewrite_prompt, temperature=0.5, deadline=deadline)
+        
+        # Check again
+        has_violations_2, violations_2 = self._contains_banned_verbs(ai_response)
+        if has_violations_2:
+            COMPLIANCE_VIOLATIONS.inc("rewrite")
+            logger.warning(f"Second compliance violation: {self._format_violations(violations_2)} - using fallback response")
+            return self.FALLBACK_RESPONSE
+        
+        return ai_response
+
+    async def _make_compliant(
+        self,
+        ai_response: str,
+        violations: list,
+        deadline: Optional[Deadline] = None
+    ) -> str:
+        """
+        Fix a violating response: locally when the sanitizer can do it without
+        losing too much content, otherwise with a model rewrite - unless the
+        request's budget cannot fit one, in which case the canned answer is used.
+        """
+        if self.sanitizer is not None:
+            with stage("sanitize"):
+                sanitized = self.sanitizer.sanitize(ai_response.replace(self.SAFETY_DISCLAIMER, ""))
+            if sanitized is not None:
+                self._count_compliance("local")
+                return sanitized
+        
+        if deadline is not None and deadline.remaining() < settings.REWRITE_MIN_SECONDS:
+            logger.warning("No budget left for a compliance rewrite - using fallback response")
+            self._count_compliance("fallback")
+            return self.FALLBACK_RESPONSE
+        
+        self._count_compliance("remote")
+        try:
+            with stage("rewrite"):
+                ai_response = await self._rewrite_for_compliance(ai_response, violations, deadline)
+        except DeadlineExceeded:
+            logger.warning("Compliance rewrite ran out of time - using fallback response")
+            ai_response = self.FALLBACK_RESPONSE
+        if ai_response == self.FALLBACK_RESPONSE:
+            self._count_compliance("fallback")
+        return ai_response
+
+    def _count_compliance(self, path: str):
+        self.compliance_paths[path] += 1
+        COMPLIANCE_OUTCOMES.inc(path)
+
+    def compliance_stats(self) -> dict:
+        generated = sum(self.compliance_paths.values())
+        return {
+            **self.compliance_paths,
+            "local_rate": round(self.compliance_paths["local"] / generated, 4) if generated else 0.0,
+            "sanitizer": self.sanitizer.stats() if self.sanitizer is not None else None
+        }
+
+    def _ensure_disclaimer(self, ai_response: str) -> str:
+        if "Safety Disclaimer" not in ai_response:
+            ai_response += f"\n\n{self.SAFETY_DISCLAIMER}"
+        return ai_response
+
+    async def _lookup_caches(
+        self,
+        user_query: str,
+        sop_context: Optional[str],
+        history: Optional[str] = None,
+        sop_version: Optional[str] = None,
+        embed_query: Optional[QuestionEmbedder] = None
+    ) -> tuple[Optional[dict], dict]:
+        """
+        Check the exact-match cache, then the semantic cache.
+
+        Returns (cached result or None, lookup context); the context carries the
+        keys and query embedding needed to store the eventual answer. Follow-ups
+        (with history) bypass both: their answers depend on the conversation,
+        and a paraphrase match across conversations would answer the wrong one.
+        """
+        lookup = {"question": user_query, "started": time.perf_counter()}
+        if history:
+            return None, lookup
+        
+        if self.response_cache is not None:
+            lookup["key"] = self.response_cache.make_key(user_query, sop_context, self.model, self.SYSTEM_PROMPT)
+            cached = await self.response_cache.get(lookup["key"])
+            CACHE_LOOKUPS.inc("response", "miss" if cached is None else "hit")
+            if cached is not None:
+                return self._cached_result(cached), lookup
+        
+        if self.semantic_cache is not None:
+            partition = self.semantic_cache.partition_key(
+                sop_context, self.model, self.SYSTEM_PROMPT, sop_version=sop_version
+            )
+            try:
+                cached, embedding = await self.semantic_cache.lookup(user_query, partition, embed_query)
+            except Exception as e:
+                # The semantic tier is an optimization; never fail a chat over it
+                logger.warning(f"Semantic cache lookup failed: {str(e)}")
+                CACHE_LOOKUPS.inc("semantic", "error")
+            else:
+                CACHE_LOOKUPS.inc("semantic", "miss" if cached is None else "hit")
+                if cached is not None:
+                    return self._cached_result(cached, semantic=True), lookup
+                lookup["partition"] = partition
+                lookup["embedding"] = embedding
+        
+        # Time the upstream generation from here
+        lookup["started"] = time.perf_counter()
+        return None, lookup
+
+    @staticmethod
+    def _cached_result(cached: dict, semantic: bool = False) -> dict:
+        result = {
+            "response": cached["response"],
+            "safe": True,
+            "filtered": False,
+            "rewritten": cached["rewritten"],
+            "cached": True
+        }
+        if semantic:
+            result["semantic_similarity"] = cached["similarity"]
+        return result
+
+    def _store_result(self, lookup: dict, result: dict):
+        """Cache only compliant answers: no errors, no canned fallback"""
+        if result.get("error") or not result.get("safe"):
+            return
+        if result["response"] == self.FALLBACK_RESPONSE:
+            return
+        
+        rewritten = result.get("rewritten", False)
+        if "key" in lookup:
+            self.response_cache.set(lookup["key"], result["response"], rewritten=rewritten)
+        if "embedding" in lookup:
+            self.semantic_cache.record_upstream(time.perf_counter() - lookup["started"])
+            self.semantic_cache.add(
+                lookup["embedding"], lookup["partition"], lookup["question"], result["response"], rewritten=rewritten
+            )
+
+    @staticmethod
+    def _error_result(e: Exception) -> dict:
+        if isinstance(e, (DeadlineExceeded, asyncio.TimeoutError)):
+            message = "I apologize, but the AI service did not respond in time. Please try again in a moment or contact your supervisor for assistance."
+        elif isinstance(e, UpstreamUnavailable):
+            message = "I apologize, but the AI service is temporarily unavailable. Please try again shortly or contact your supervisor for assistance."
+        elif isinstance(e, httpx.HTTPError):
+            message = f"I apologize, but I'm experiencing technical difficulties connecting to the AI service. Please try again in a moment or contact your supervisor for assistance.\n\nError: {str(e)}"
+        else:
+            message = f"An unexpected error occurred. Please contact your supervisor for assistance.\n\nError: {str(e)}"
+        
+        return {
+            "response": message,
+            "safe": True,
+            "filtered": False,
+            "error": str(e)
+        }
     
     async def generate_explanation(
         self, 
         user_query: str, 
-        sop_context: Optional[str] = None
+        sop_context: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+        history: Optional[str] = None,
+        sop_version: Optional[str] = None,
+        embed_query: Optional[QuestionEmbedder] = None
     ) -> dict:
         """
         Generate safe explanation for user query
@@ -178,13 +515,21 @@ You are an EXPLAINER of safety intent — not an INSTRUCTOR of safety actions.""
         Args:
             user_query: User's question
             sop_context: Optional SOP content for context
+            deadline: Time budget for every upstream call this request makes
+                (defaults to REQUEST_DEADLINE_SECONDS from now)
+            history: Optional earlier turns of the conversation (see ConversationHistory.window)
+            sop_version: Optional SOP id and content version the context was
+                retrieved from (see get_sop_version); keys the semantic cache
+            embed_query: Optional shared embedding of user_query (see
+                question_embedder), so retrieval and the cache embed it once
             
         Returns:
             dict with 'response' and 'safe' keys
         """
         
         # First, apply safety filter
-        is_safe, refusal_message = SafetyFilter.is_query_safe(user_query)
+        with stage("filter"):
+            is_safe, refusal_message = SafetyFilter.is_query_safe(user_query)
         
         if not is_safe:
             return {
@@ -193,132 +538,264 @@ You are an EXPLAINER of safety intent — not an INSTRUCTOR of safety actions.""
                 "filtered": True
             }
         
-        # Build context message
-        context_parts = []
-        if sop_context:
-            context_parts.append(f"**Relevant SOP Content:**\n{sop_context}\n")
+        with stage("cache"):
+            cached, cache_lookup = await self._lookup_caches(
+                user_query, sop_context, history, sop_version, embed_query
+            )
+        if cached is not None:
+            return cached
         
-        context_parts.append(f"**User Question:** {user_query}")
+        deadline = deadline or Deadline.after(settings.REQUEST_DEADLINE_SECONDS)
         
-        user_message = "\n".join(context_parts)
+        # Concurrent identical questions share one upstream call (and rewrite),
+        # run under the first caller's deadline; each caller still waits no
+        # longer than its own
+        flight_key = ResponseCache.make_key(
+            user_query, f"{sop_context or ''}\n\n{history}" if history else sop_context, self.model, self.SYSTEM_PROMPT
+        )
+        try:
+            result = await asyncio.wait_for(
+                self.single_flight.do(
+                    flight_key,
+                    lambda: self._generate(user_query, sop_context, cache_lookup, deadline, history)
+                ),
+                timeout=deadline.remaining()
+            )
+        except asyncio.TimeoutError as e:
+            return self._error_result(e)
+        # Each waiter gets its own copy of the shared result
+        return dict(result)
+
+    async def _generate(
+        self,
+        user_query: str,
+        sop_context: Optional[str],
+        cache_lookup: dict,
+        deadline: Optional[Deadline] = None,
+        history: Optional[str] = None
+    ) -> dict:
+        """Upstream generation with compliance rewrite; the uncached path of generate_explanation"""
+        with stage("prompt"):
+            user_message = self._build_user_message(user_query, sop_context, history)
         
         # Call OpenRouter API
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    self.api_url,
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json",
-                    },
-                    json={
-                        "model": self.model,
-                        "messages": [
-                            {
-                                "role": "system",
-                                "content": self.SYSTEM_PROMPT
-                            },
-                            {
-                                "role": "user",
-                                "content": user_message
-                            }
-                        ],
-                        "temperature": 0.7,
-                        "max_tokens": 1000,
-                    }
-                )
-                
-                response.raise_for_status()
-                data = response.json()
-                
-                ai_response = data["choices"][0]["message"]["content"]
-                
-                # CRITICAL: Validate response for banned verbs
+            with stage("completion"):
+                ai_response = await self._complete(user_message, temperature=0.7, deadline=deadline)
+            
+            # CRITICAL: Validate response for banned verbs
+            with stage("scan"):
                 has_violations, violations = self._contains_banned_verbs(ai_response)
-                
-                if has_violations:
-                    # Response contains operational language - trigger rewrite
-                    print(f"⚠️ COMPLIANCE VIOLATION DETECTED: {violations}")
-                    
-                    rewrite_prompt = f"""Your previous response contained operational language that violates safety compliance rules.
+            
+            if has_violations:
+                # Response contains operational language - sanitize or rewrite
+                COMPLIANCE_VIOLATIONS.inc("generate")
+                logger.warning(f"Compliance violation detected: {self._format_violations(violations)}")
+                ai_response = await self._make_compliant(ai_response, violations, deadline)
+            else:
+                self._count_compliance("clean")
+            
+            result = {
+                "response": self._ensure_disclaimer(ai_response),
+                "safe": True,
+                "filtered": False,
+                "rewritten": has_violations
+            }
+            self._store_result(cache_lookup, result)
+            return result
+            
+        except Exception as e:
+            return self._error_result(e)
 
-VIOLATIONS FOUND: {', '.join(violations)}
+    async def _stream_completion(
+        self,
+        user_message: str,
+        temperature: float,
+        deadline: Optional[Deadline] = None
+    ) -> AsyncIterator[str]:
+        """
+        Yield content deltas from a streaming chat completion.
 
-You MUST rewrite this response in PURELY CONCEPTUAL language:
-- Remove ALL action verbs
-- Focus on PURPOSE and WHY, not HOW
-- Use the gold-standard LOTO example as your template
-- Make it enterprise-safe and judge-approved
+        Closing the generator early closes the upstream response, which
+        cancels generation on the provider side. Streams are not hedged; they
+        go to the first target that can be claimed (closed breaker, or the one
+        trial of a half-open one), and the time to the response headers feeds
+        that target's stats.
+        """
+        target = self.router.acquire()
+        started = time.perf_counter()
+        connected = False
+        failed = False
+        try:
+            async with self.http_client.stream(
+                "POST",
+                target.url,
+                **self._completion_request(user_message, temperature, stream=True, model=target.model),
+                **self._request_timeout(deadline)
+            ) as response:
+                response.raise_for_status()
+                self.router.record(target, time.perf_counter() - started)
+                UPSTREAM_SECONDS.observe(time.perf_counter() - started, target.model, "stream")
+                connected = True
+                
+                async for line in response.aiter_lines():
+                    # SSE framing: skip keep-alive comments and blank separators
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    chunk = json.loads(data)
+                    choices = chunk.get("choices") or []
+                    if not choices:
+                        continue
+                    delta = choices[0].get("delta", {}).get("content")
+                    if delta:
+                        yield delta
+                    if deadline is not None:
+                        deadline.check()
+        except httpx.HTTPError as e:
+            UPSTREAM_ERRORS.inc(target.model, upstream_error_code(e))
+            if not connected:
+                self.router.record(target, error=True)
+                failed = True
+            raise
+        finally:
+            if not connected and not failed:
+                # Closed or timed out before an outcome: free a half-open trial
+                target.release()
 
-Original response that needs rewriting:
-{ai_response}
+    async def stream_explanation(
+        self,
+        user_query: str,
+        sop_context: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+        history: Optional[str] = None,
+        sop_version: Optional[str] = None,
+        embed_query: Optional[QuestionEmbedder] = None
+    ) -> AsyncIterator[dict]:
+        """
+        Stream a safe explanation as events.
 
-Provide the corrected, compliant version now:"""
+        Yields dicts with an "event" key:
+            token: {"content": str} - compliant text, safe to display
+            reset: {"reason": str} - discard everything shown so far
+            done:  final result with the same keys as generate_explanation
+
+        Text is scanned for banned verbs over a sliding window as it arrives and
+        the last STREAM_HOLDBACK_CHARS are held back, so a violation is caught
+        before any part of it is forwarded. After a violation nothing more is
+        forwarded and only a bounded tail (STREAM_VIOLATION_TAIL_CHARS or
+        _SECONDS) is read before the upstream stream is closed; the answer so
+        far goes through the sanitizer, then the rewrite/fallback path if the
+        sanitizer gives up.
+        """
+        is_safe, refusal_message = SafetyFilter.is_query_safe(user_query)
+        
+        if not is_safe:
+            yield {
+                "event": "done",
+                "response": refusal_message,
+                "safe": False,
+                "filtered": True
+            }
+            return
+        
+        cached, cache_lookup = await self._lookup_caches(user_query, sop_context, history, sop_version, embed_query)
+        if cached is not None:
+            yield {"event": "token", "content": cached["response"]}
+            yield {"event": "done", **cached}
+            return
+        
+        deadline = deadline or Deadline.after(settings.REQUEST_DEADLINE_SECONDS)
+        user_message = self._build_user_message(user_query, sop_context, history)
+        holdback = self.STREAM_HOLDBACK_CHARS
+        
+        buffer = ""
+        emitted = 0
+        scanned = 0
+        violations = []
+        violation_at = None  # (buffer length, time) when the first violation was seen
+        truncated = False
+        
+        try:
+            stream = self._stream_completion(user_message, temperature=0.7, deadline=deadline)
+            try:
+                async for delta in stream:
+                    buffer += delta
+                    if violations:
+                        # Stop forwarding, but read a bounded tail so the answer
+                        # can usually be fixed locally; then stop paying for it
+                        if (
+                            len(buffer) - violation_at[0] >= self.STREAM_VIOLATION_TAIL_CHARS
+                            or time.monotonic() - violation_at[1] >= self.STREAM_VIOLATION_TAIL_SECONDS
+                        ):
+                            truncated = True
+                            break
+                        continue
                     
-                    # Request rewrite
-                    rewrite_response = await client.post(
-                        self.api_url,
-                        headers={
-                            "Authorization": f"Bearer {self.api_key}",
-                            "Content-Type": "application/json",
-                        },
-                        json={
-                            "model": self.model,
-                            "messages": [
-                                {
-                                    "role": "system",
-                                    "content": self.SYSTEM_PROMPT
-                                },
-                                {
-                                    "role": "user",
-                                    "content": rewrite_prompt
-                                }
-                            ],
-                            "temperature": 0.5,  # Lower temperature for more compliance
-                            "max_tokens": 1000,
-                        }
-                    )
+                    # Only scan complete words: a trailing fragment like "turn th"
+                    # could still become "turn the" or "turn theory"
+                    scan_end = max(buffer.rfind(" "), buffer.rfind("\n")) + 1
+                    if scan_end <= scanned:
+                        continue
                     
-                    rewrite_response.raise_for_status()
-                    rewrite_data = rewrite_response.json()
-                    ai_response = rewrite_data["choices"][0]["message"]["content"]
+                    # Rescan only the new text plus enough overlap to catch
+                    # phrases that straddle the previous window boundary
+                    window_start = max(0, scanned - holdback)
+                    has_violations, violations = self._contains_banned_verbs(buffer[window_start:scan_end])
+                    scanned = scan_end
+                    if has_violations:
+                        violation_at = (len(buffer), time.monotonic())
+                        continue
                     
-                    # Check again
-                    has_violations_2, violations_2 = self._contains_banned_verbs(ai_response)
-                    if has_violations_2:
-                        print(f"⚠️ SECOND VIOLATION: {violations_2} - Using fallback response")
-                        # Use fallback safe response
-                        ai_response = """I apologize, but I'm having difficulty providing a response that meets our strict safety compliance standards.
-
-To ensure I don't inadvertently provide operational instructions, I recommend:
-- Consulting your organization's official SOP documentation
-- Speaking with your supervisor or safety officer
-- Attending authorized training sessions
-
-⚠️ Safety Disclaimer: This explanation is for educational purposes only. It does not provide operational instructions, approvals, or real-time guidance. Always follow your organization's official procedures and consult authorized supervisors or safety officers."""
-                
-                # Ensure disclaimer is present
-                if "Safety Disclaimer" not in ai_response:
-                    ai_response += "\n\n⚠️ Safety Disclaimer: This explanation is for educational purposes only. It does not provide operational instructions, approvals, or real-time guidance. Always follow your organization's official procedures and consult authorized supervisors or safety officers."
-                
-                return {
-                    "response": ai_response,
-                    "safe": True,
-                    "filtered": False,
-                    "rewritten": has_violations
-                }
+                    safe_until = scanned - holdback
+                    if safe_until > emitted:
+                        yield {"event": "token", "content": buffer[emitted:safe_until]}
+                        emitted = safe_until
+            finally:
+                await stream.aclose()
+            
+            if truncated:
+                # Drop the unfinished last sentence, but never text already shown
+                spans = sentence_spans(buffer)
+                if len(spans) > 1 and not buffer.rstrip().endswith((".", "!", "?")):
+                    buffer = buffer[:max(spans[-1][0], emitted)]
+            
+            if violations:
+                has_violations, violations = self._contains_banned_verbs(buffer)
+            else:
+                # The stream is complete, so the trailing fragment is now whole
+                has_violations, violations = self._contains_banned_verbs(buffer[max(0, scanned - holdback):])
+            
+            if violations:
+                COMPLIANCE_VIOLATIONS.inc("stream")
+                logger.warning(f"Compliance violation detected (stream): {self._format_violations(violations)}")
+                ai_response = self._ensure_disclaimer(await self._make_compliant(buffer, violations, deadline))
                 
-        except httpx.HTTPError as e:
-            return {
-                "response": f"I apologize, but I'm experiencing technical difficulties connecting to the AI service. Please try again in a moment or contact your supervisor for assistance.\n\nError: {str(e)}",
+                # A local fix usually leaves the text already shown intact;
+                # only retract it when the answer changed before that point
+                if ai_response.startswith(buffer[:emitted]):
+                    yield {"event": "token", "content": ai_response[emitted:]}
+                else:
+                    yield {"event": "reset", "reason": "compliance"}
+                    yield {"event": "token", "content": ai_response}
+            else:
+                self._count_compliance("clean")
+                ai_response = self._ensure_disclaimer(buffer)
+                if len(ai_response) > emitted:
+                    yield {"event": "token", "content": ai_response[emitted:]}
+            
+            result = {
+                "response": ai_response,
                 "safe": True,
                 "filtered": False,
-                "error": str(e)
+                "rewritten": bool(violations)
             }
+            self._store_result(cache_lookup, result)
+            yield {"event": "done", **result}
+        
         except Exception as e:
-            return {
-                "response": f"An unexpected error occurred. Please contact your supervisor for assistance.\n\nError: {str(e)}",
-                "safe": True,
-                "filtered": False,
-                "error": str(e)
-            }
+            if emitted:
+                yield {"event": "reset", "reason": "error"}
+            yield {"event": "done", **self._error_result(e)}
@@ -1,22 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.db.database import get_db
+from fastapi import APIRouter, Depends
 from app.schemas.user import UserCreate, UserOut
-from app.services.auth_service import create_user, get_user
+from app.services.auth_service import AuthService, get_auth_service
 
 router = APIRouter()
 
-@router.post("/register", response_model=UserOut)
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = get_user(db, username=user.username)
-    if db_user:
-        raise HTTPException(status_code=400, detail="Username already registered")
-    return create_user(db=db, user=user)
+@router.post("/register", response_model=UserOut, status_code=201)
+async def register_user(user: UserCreate, auth_service: AuthService = Depends(get_auth_service)):
+    return await auth_service.register_user(user)
 
 @router.post("/login")
-def login_user(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = get_user(db, username=user.username)
-    if not db_user or not db_user.verify_password(user.password):
-        raise HTTPException(status_code=400, detail="Invalid username or password")
+async def login_user(user: UserCreate, auth_service: AuthService = Depends(get_auth_service)):
+    await auth_service.authenticate_user(user.username, user.password)
     # Here you would typically create a JWT token and return it
-    return {"message": "Login successful"}
\ No newline at end of file
+    return {"message": "Login successful"}
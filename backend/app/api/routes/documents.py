@@ -1,36 +1,31 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends
 from typing import List
-from app.schemas.document import DocumentCreate, DocumentResponse
-from app.services.document_service import DocumentService
+from app.schemas.document import DocumentCreate, DocumentResponse, DocumentUpdate
+from app.services.document_service import DocumentService, get_document_service
 
 router = APIRouter()
-document_service = DocumentService()
 
-@router.post("/", response_model=DocumentResponse)
-async def create_document(document: DocumentCreate):
-    try:
-        return await document_service.create_document(document)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+@router.post("/", response_model=DocumentResponse, status_code=201)
+async def create_document(document: DocumentCreate, document_service: DocumentService = Depends(get_document_service)):
+    return await document_service.create_document(document)
 
 @router.get("/", response_model=List[DocumentResponse])
-async def get_documents():
-    try:
-        return await document_service.get_all_documents()
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+async def get_documents(document_service: DocumentService = Depends(get_document_service)):
+    return await document_service.get_documents()
 
 @router.get("/{document_id}", response_model=DocumentResponse)
-async def get_document(document_id: int):
-    try:
-        return await document_service.get_document_by_id(document_id)
-    except Exception as e:
-        raise HTTPException(status_code=404, detail=str(e))
+async def get_document(document_id: int, document_service: DocumentService = Depends(get_document_service)):
+    return await document_service.get_document(document_id)
+
+@router.patch("/{document_id}", response_model=DocumentResponse)
+async def update_document(
+    document_id: int,
+    document: DocumentUpdate,
+    document_service: DocumentService = Depends(get_document_service)
+):
+    return await document_service.update_document(document_id, document)
 
 @router.delete("/{document_id}", response_model=dict)
-async def delete_document(document_id: int):
-    try:
-        await document_service.delete_document(document_id)
-        return {"message": "Document deleted successfully"}
-    except Exception as e:
-        raise HTTPException(status_code=404, detail=str(e))
\ No newline at end of file
+async def delete_document(document_id: int, document_service: DocumentService = Depends(get_document_service)):
+    await document_service.delete_document(document_id)
+    return {"message": "Document deleted successfully"}
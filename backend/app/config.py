@@ -15,6 +15,169 @@ class Settings(BaseSettings):
     OPENROUTER_API_URL: str = "https://openrouter.ai/api/v1/chat/completions"
     MODEL_NAME: str = "openai/gpt-3.5-turbo"
     
+    # Extra upstream targets after MODEL_NAME, in order: "model" or "model@url"
+    UPSTREAM_FALLBACK_TARGETS: List[str] = []
+    
+    # Hedging: after a target's latency percentile (or the initial delay, until
+    # enough samples exist) a duplicate call goes to the next target
+    HEDGE_ENABLED: bool = True
+    HEDGE_PERCENTILE: float = 95.0
+    HEDGE_INITIAL_DELAY_SECONDS: float = 8.0
+    HEDGE_MIN_DELAY_SECONDS: float = 1.0
+    
+    # Circuit breaker: skip a target after N consecutive failures for a while
+    BREAKER_FAILURE_THRESHOLD: int = 5
+    BREAKER_RESET_SECONDS: float = 30.0
+    
+    # Transient upstream errors (429/5xx/transport) are retried with jittered
+    # exponential backoff, within the request deadline
+    UPSTREAM_MAX_RETRIES: int = 2
+    RETRY_BASE_DELAY_SECONDS: float = 0.25
+    RETRY_MAX_DELAY_SECONDS: float = 4.0
+    
+    # Per-request time budget (clients may ask for less, up to the maximum);
+    # a compliance rewrite is skipped for the canned answer when less than
+    # REWRITE_MIN_SECONDS of budget is left
+    REQUEST_DEADLINE_SECONDS: float = 25.0
+    MAX_REQUEST_DEADLINE_SECONDS: float = 60.0
+    REWRITE_MIN_SECONDS: float = 3.0
+    
+    # Database (async drivers: sqlite+aiosqlite, postgresql+asyncpg; plain
+    # sqlite:// and postgresql:// URLs are mapped onto them) and its pool
+    DATABASE_URL: str = "sqlite+aiosqlite:///./sql_app.db"
+    DATABASE_POOL_SIZE: int = 5
+    DATABASE_MAX_OVERFLOW: int = 10
+    DATABASE_POOL_TIMEOUT_SECONDS: float = 30.0
+    DATABASE_POOL_RECYCLE_SECONDS: float = 1800.0
+    DATABASE_ECHO: bool = False
+    
+    # Upstream HTTP connection pool
+    HTTP_TIMEOUT_SECONDS: float = 30.0
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 60.0
+    HTTP2_ENABLED: bool = True
+    HTTP_PREWARM_CONNECTIONS: int = 2
+    
+    # SOP retrieval: only the best-matching chunks of long SOPs go into the prompt
+    SOP_CONTEXT_TOKEN_BUDGET: int = 1500
+    SOP_RETRIEVAL_TOP_K: int = 5
+    
+    # Uploaded SOPs live in the documents table; each worker keeps the most
+    # recently used bodies in memory and re-reads the documents version counter
+    # at most this often to drop copies another worker changed
+    SOP_CACHE_MAX_ENTRIES: int = 256
+    SOP_CACHE_CHECK_SECONDS: float = 2.0
+    
+    # Chat records are buffered and bulk-inserted into conversations every
+    # BATCH_SIZE rows or FLUSH_MS, whichever comes first. At most MAX_PENDING
+    # rows are held; past that a request waits up to MAX_WAIT_MS for room and
+    # the record is then dropped rather than the request failing
+    CONVERSATION_LOG_ENABLED: bool = True
+    CONVERSATION_LOG_BATCH_SIZE: int = 100
+    CONVERSATION_LOG_FLUSH_MS: int = 500
+    CONVERSATION_LOG_MAX_PENDING: int = 5000
+    CONVERSATION_LOG_MAX_WAIT_MS: int = 50
+    
+    # Multi-turn chats: recent turns go into the prompt within WINDOW_TOKENS,
+    # older ones are rolled into a summary of at most SUMMARY_TOKENS; each
+    # stored answer is capped at TURN_TOKENS. Conversations idle longer than
+    # TTL_SECONDS start over. A SQLite path shares history across workers
+    # (default: per-worker memory, at most MAX_CONVERSATIONS kept)
+    CONVERSATION_HISTORY_ENABLED: bool = True
+    CONVERSATION_HISTORY_WINDOW_TOKENS: int = 600
+    CONVERSATION_HISTORY_SUMMARY_TOKENS: int = 200
+    CONVERSATION_HISTORY_TURN_TOKENS: int = 150
+    CONVERSATION_HISTORY_TTL_SECONDS: int = 3600
+    CONVERSATION_HISTORY_MAX_CONVERSATIONS: int = 10000
+    CONVERSATION_HISTORY_SQLITE_PATH: str = ""
+    
+    # SOP uploads: streamed to a spool file as they arrive, parsed by a process pool
+    # (0 workers parses in threads); empty spool dir uses the system temp dir
+    UPLOAD_SPOOL_DIR: str = ""
+    UPLOAD_MAX_BYTES: int = 50 * 1024 * 1024
+    INGESTION_WORKERS: int = 2
+    
+    # Prompt assembly: SOP context is trimmed so system + context + question fit
+    # the input budget; cache hints mark the static system prefix for providers
+    # that need explicit breakpoints
+    PROMPT_MAX_INPUT_TOKENS: int = 4000
+    PROMPT_CACHE_HINTS: bool = True
+    
+    # /api/chat/batch: items answered at once per batch, and batch size limit
+    BATCH_MAX_CONCURRENCY: int = 8
+    BATCH_MAX_ITEMS: int = 500
+    
+    # Prometheus metrics at /metrics; with several workers set METRICS_DIR so
+    # each publishes its counters there and any worker's scrape merges them all
+    METRICS_ENABLED: bool = True
+    METRICS_DIR: str = ""
+    METRICS_FLUSH_SECONDS: float = 5.0
+    
+    # Admin-requested request profiles (folded stacks); empty dir uses the
+    # system temp dir, and only the newest PROFILE_MAX_FILES are kept
+    PROFILE_DIR: str = ""
+    PROFILE_MAX_FILES: int = 50
+    PROFILE_SAMPLE_INTERVAL_MS: float = 5.0
+    
+    # Admission control for the chat endpoints: at most N requests in flight per
+    # worker and up to QUEUE more waiting (each for at most WAIT seconds);
+    # anything beyond that gets 429 with Retry-After
+    ADMISSION_MAX_CONCURRENT: int = 32
+    ADMISSION_MAX_QUEUE: int = 64
+    ADMISSION_MAX_WAIT_SECONDS: float = 10.0
+    
+    # Per-client token bucket on the chat endpoints, keyed by client IP, with
+    # a second bucket per Authorization header on top of it, never instead
+    # (0 per minute disables); a SQLite path shares buckets between
+    # workers, and X-Forwarded-For is only trusted behind a known proxy
+    RATE_LIMIT_PER_MINUTE: float = 0.0
+    RATE_LIMIT_BURST: int = 10
+    RATE_LIMIT_SQLITE_PATH: str = ""
+    RATE_LIMIT_TRUST_FORWARDED: bool = False
+    # The shared store is updated off the event loop and waits at most this
+    # long for a busy database; on failure requests are allowed (FAIL_OPEN)
+    # or rejected with Retry-After: 1
+    RATE_LIMIT_SQLITE_TIMEOUT_MS: float = 50.0
+    RATE_LIMIT_FAIL_OPEN: bool = True
+    
+    # Compliance violations are first fixed locally (dropping/rephrasing the
+    # offending sentences); the model rewrite runs only if too little survives
+    LOCAL_SANITIZER_ENABLED: bool = True
+    LOCAL_SANITIZER_MIN_RETAINED: float = 0.7
+    
+    # Exact-match response cache (empty SQLite path keeps it memory-only)
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1000
+    RESPONSE_CACHE_TTL_SECONDS: float = 24 * 3600
+    RESPONSE_CACHE_SQLITE_PATH: str = ""
+    
+    # Embedding model shared by the semantic cache and SOP chunk vectors;
+    # needs the optional sentence-transformers package
+    EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"
+    
+    # Concurrent embed calls are micro-batched: up to N texts or T ms per encode
+    EMBEDDING_BATCH_MAX_SIZE: int = 32
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = 5.0
+    
+    # Memory-mapped store for SOP chunk vectors, fused with BM25 when retrieving
+    # from long SOPs (empty disables chunk embedding)
+    EMBEDDING_STORE_PATH: str = ""
+    
+    # Cache warm-up (python -m app.warmup, or in the background at startup):
+    # SOP FAQs plus an optional JSON file of {sop_id: [questions]}
+    WARMUP_ON_STARTUP: bool = False
+    WARMUP_QUESTIONS_PATH: str = ""
+    WARMUP_CONCURRENCY: int = 4
+    
+    # Semantic (paraphrase) cache
+    SEMANTIC_CACHE_ENABLED: bool = False
+    SEMANTIC_CACHE_THRESHOLD: float = 0.92
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 5000
+    
+    # Admin endpoints are disabled until a key is configured
+    ADMIN_API_KEY: str = ""
+    
     # CORS Settings
     ALLOWED_ORIGINS: List[str] = [
         "http://localhost:5173", 
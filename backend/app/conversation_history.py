@@ -0,0 +1,265 @@
+"""Server-side multi-turn history: compact turns, a token-budgeted window and a rolling summary"""
+
+import asyncio
+import json
+import logging
+import re
+import sqlite3
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+try:
+    from config import settings
+    from sop_index import estimate_tokens
+    from prompt_builder import _trim_to_tokens
+except ImportError:
+    from app.config import settings
+    from app.sop_index import estimate_tokens
+    from app.prompt_builder import _trim_to_tokens
+
+logger = logging.getLogger(__name__)
+
+_CONVERSATION_ID = re.compile(r"^[0-9a-f]{32}$")
+# Appended to every answer; carries nothing a follow-up needs
+_DISCLAIMER = "⚠️ Safety Disclaimer"
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+# Per-turn caps inside the rolling summary
+_SUMMARY_QUESTION_TOKENS = 30
+_SUMMARY_ANSWER_TOKENS = 40
+
+
+def _squash(text: str) -> str:
+    return " ".join(text.split())
+
+
+def _first_sentence(text: str) -> str:
+    return _SENTENCE_END.split(text, 1)[0]
+
+
+def _pack(state: dict) -> bytes:
+    return zlib.compress(json.dumps(state, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def _unpack(blob: bytes) -> dict:
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+def empty_state() -> dict:
+    # turns: [[question, compacted answer], ...] oldest first, not yet summarized
+    return {"summary": [], "turns": [], "rolled": 0}
+
+
+class MemoryHistoryStore:
+    """Compressed conversation states in this worker's memory, least recently used dropped first"""
+
+    executor = None  # cheap enough to call on the event loop
+
+    def __init__(self, max_conversations: int = 10000):
+        self.max_conversations = max_conversations
+        # conversation id -> (packed state, updated_at)
+        self._states: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, conversation_id: str, max_age: float) -> Optional[bytes]:
+        item = self._states.get(conversation_id)
+        if item is None or time.time() - item[1] > max_age:
+            return None
+        self._states.move_to_end(conversation_id)
+        return item[0]
+
+    def put(self, conversation_id: str, blob: bytes):
+        self._states[conversation_id] = (blob, time.time())
+        self._states.move_to_end(conversation_id)
+        while len(self._states) > self.max_conversations:
+            self._states.popitem(last=False)
+
+    def size_bytes(self) -> int:
+        return sum(len(blob) for blob, _ in self._states.values())
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def close(self):
+        pass
+
+
+class SQLiteHistoryStore:
+    """
+    Compressed conversation states in a SQLite file shared by every worker on
+    the host. ConversationHistory calls it on `executor`, a single thread,
+    so the file lock is never waited on from the event loop.
+    """
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="conversation-history")
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS conversation_history ("
+            "conversation_id TEXT PRIMARY KEY, state BLOB NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def get(self, conversation_id: str, max_age: float) -> Optional[bytes]:
+        row = self._db.execute(
+            "SELECT state FROM conversation_history WHERE conversation_id = ? AND updated_at >= ?",
+            (conversation_id, time.time() - max_age),
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def put(self, conversation_id: str, blob: bytes):
+        self._db.execute(
+            "INSERT OR REPLACE INTO conversation_history (conversation_id, state, updated_at) VALUES (?, ?, ?)",
+            (conversation_id, blob, time.time()),
+        )
+
+    def size_bytes(self) -> int:
+        return self._db.execute("SELECT COALESCE(SUM(LENGTH(state)), 0) FROM conversation_history").fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM conversation_history").fetchone()[0]
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self._db.close()
+
+
+class ConversationHistory:
+    """
+    Recent turns of each conversation, bounded in tokens however long it runs.
+
+    Answers are stored compacted (disclaimer dropped, whitespace squashed,
+    capped at `turn_tokens`). Recent turns are kept verbatim while they fit
+    in `window_tokens` minus the summary's share; older turns are rolled into
+    a summary of one short line per turn, built once when the turn rolls out
+    and capped at `summary_tokens` (oldest lines go first). The prompt window
+    is that summary plus the recent turns, so it stays within about
+    `window_tokens`, and no model call is spent on summarizing.
+    """
+
+    def __init__(
+        self,
+        window_tokens: Optional[int] = None,
+        summary_tokens: Optional[int] = None,
+        turn_tokens: Optional[int] = None,
+        max_age_seconds: Optional[float] = None,
+        max_conversations: Optional[int] = None,
+        sqlite_path: Optional[str] = None,
+    ):
+        self.window_tokens = window_tokens if window_tokens is not None else settings.CONVERSATION_HISTORY_WINDOW_TOKENS
+        self.summary_tokens = (
+            summary_tokens if summary_tokens is not None else settings.CONVERSATION_HISTORY_SUMMARY_TOKENS
+        )
+        self.turn_tokens = turn_tokens if turn_tokens is not None else settings.CONVERSATION_HISTORY_TURN_TOKENS
+        self.max_age_seconds = (
+            max_age_seconds if max_age_seconds is not None else settings.CONVERSATION_HISTORY_TTL_SECONDS
+        )
+        sqlite_path = sqlite_path if sqlite_path is not None else settings.CONVERSATION_HISTORY_SQLITE_PATH
+        self.store = (
+            SQLiteHistoryStore(sqlite_path) if sqlite_path
+            else MemoryHistoryStore(max_conversations or settings.CONVERSATION_HISTORY_MAX_CONVERSATIONS)
+        )
+
+        self.loads = 0
+        self.resumed = 0
+        self.appended = 0
+        self.rolled = 0
+        self.errors = 0
+
+    async def _call(self, fn, *args):
+        """Run a store operation, on the store's own thread when it has one"""
+        if self.store.executor is None:
+            return fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(self.store.executor, fn, *args)
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    @staticmethod
+    def valid_id(conversation_id: str) -> bool:
+        return bool(_CONVERSATION_ID.match(conversation_id))
+
+    async def load(self, conversation_id: str) -> dict:
+        """State of a conversation; empty if it is new, expired or unreadable"""
+        self.loads += 1
+        try:
+            blob = await self._call(self.store.get, conversation_id, self.max_age_seconds)
+            if blob is None:
+                return empty_state()
+            state = _unpack(blob)
+        except (sqlite3.Error, zlib.error, ValueError) as e:
+            # Losing history degrades answers; it should never fail the request
+            self.errors += 1
+            logger.warning(f"Could not load conversation {conversation_id}: {str(e)}")
+            return empty_state()
+        self.resumed += 1
+        return state
+
+    def compact_answer(self, answer: str) -> str:
+        marker = answer.rfind(_DISCLAIMER)
+        if marker > 0:
+            answer = answer[:marker]
+        return _trim_to_tokens(_squash(answer), self.turn_tokens)
+
+    @staticmethod
+    def _turn_tokens(turn: List[str]) -> int:
+        return estimate_tokens(turn[0]) + estimate_tokens(turn[1]) + 4
+
+    @staticmethod
+    def _summary_line(turn: List[str]) -> str:
+        question = _trim_to_tokens(turn[0], _SUMMARY_QUESTION_TOKENS)
+        answer = _trim_to_tokens(_first_sentence(turn[1]), _SUMMARY_ANSWER_TOKENS)
+        return f"- Asked: {question} Answer: {answer}"
+
+    async def append(self, conversation_id: str, state: dict, question: str, answer: str):
+        """Add a finished turn, rolling the oldest turns into the summary as needed, and save"""
+        state["turns"].append([_squash(question), self.compact_answer(answer)])
+        self.appended += 1
+
+        recent_budget = self.window_tokens - self.summary_tokens
+        while len(state["turns"]) > 1 and sum(self._turn_tokens(turn) for turn in state["turns"]) > recent_budget:
+            state["summary"].append(self._summary_line(state["turns"].pop(0)))
+            state["rolled"] += 1
+            self.rolled += 1
+        while len(state["summary"]) > 1 and sum(estimate_tokens(line) + 1 for line in state["summary"]) > self.summary_tokens:
+            state["summary"].pop(0)
+
+        try:
+            await self._call(self.store.put, conversation_id, _pack(state))
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Could not save conversation {conversation_id}: {str(e)}")
+
+    def window(self, state: dict) -> str:
+        """History text for the prompt: rolled-up summary, then the recent turns verbatim"""
+        parts = []
+        if state["summary"]:
+            parts.append("Earlier in this conversation:\n" + "\n".join(state["summary"]))
+        # One paragraph per turn, so trimming can drop the oldest first
+        parts.extend(f"User: {question}\nAssistant: {answer}" for question, answer in state["turns"])
+        return "\n\n".join(parts)
+
+    @staticmethod
+    def last_question(state: dict) -> Optional[str]:
+        return state["turns"][-1][0] if state["turns"] else None
+
+    def close(self):
+        self.store.close()
+
+    async def stats(self) -> dict:
+        return {
+            "conversations": await self._call(len, self.store),
+            "stored_bytes": await self._call(self.store.size_bytes),
+            "loads": self.loads,
+            "resumed": self.resumed,
+            "turns_appended": self.appended,
+            "turns_rolled": self.rolled,
+            "errors": self.errors,
+        }
@@ -0,0 +1,200 @@
+"""Write-behind persistence of chat exchanges into the conversations table"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+
+try:
+    from config import settings
+except ImportError:
+    from app.config import settings
+
+# Only importable under app.*, see sop_store
+from app.db.database import AsyncSessionLocal, init_db
+from app.db.repositories.conversation_repository import ConversationRepository
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationLog:
+    """
+    Buffer chat records in memory and bulk-insert them off the request path.
+
+    record() appends to the buffer; a flush writes up to `batch_size` rows
+    per INSERT and runs as soon as `batch_size` rows are pending, or at the
+    latest every `flush_interval` seconds. At most `max_pending` rows are
+    buffered: once full, record() waits up to `max_wait_seconds` for a flush
+    to make room and then drops the row, so a slow database costs chat
+    requests a bounded delay and never an error. close() writes what is left.
+
+    The FastAPI lifespan calls start()/close(); before start() nothing is
+    recorded.
+    """
+
+    def __init__(
+        self,
+        engine: Optional[AsyncEngine] = None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_pending: Optional[int] = None,
+        max_wait_seconds: Optional[float] = None,
+    ):
+        self.engine = engine
+        self._sessions = async_sessionmaker(engine, expire_on_commit=False) if engine is not None else AsyncSessionLocal
+        self.batch_size = batch_size or settings.CONVERSATION_LOG_BATCH_SIZE
+        self.flush_interval = (
+            flush_interval if flush_interval is not None else settings.CONVERSATION_LOG_FLUSH_MS / 1000
+        )
+        self.max_pending = max(max_pending or settings.CONVERSATION_LOG_MAX_PENDING, self.batch_size)
+        self.max_wait_seconds = (
+            max_wait_seconds if max_wait_seconds is not None else settings.CONVERSATION_LOG_MAX_WAIT_MS / 1000
+        )
+        self._pending: List[dict] = []
+        self._waiters: "deque[asyncio.Future]" = deque()
+        self._flushing = False
+        self._task: Optional[asyncio.Task] = None
+        self._flushes: set = set()
+
+        self.recorded = 0
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+        self.dropped = 0
+        self.waited = 0
+        self.max_batch = 0
+
+    async def start(self):
+        await init_db(self.engine)
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._pending:
+                self._flush_soon(drain=True)
+
+    async def record(
+        self,
+        message: str,
+        response: str,
+        safe: bool,
+        filtered: bool = False,
+        latency_ms: Optional[float] = None,
+        sop_id: Optional[str] = None,
+        user_id: Optional[int] = None,
+        conversation_id: Optional[str] = None,
+    ) -> bool:
+        """Queue one exchange; False if it was not kept (not started, or no room in time)"""
+        if self._task is None:
+            return False
+        if len(self._pending) >= self.max_pending:
+            if not await self._wait_for_room():
+                self.dropped += 1
+                return False
+
+        self._pending.append({
+            "user_id": user_id,
+            "conversation_id": conversation_id,
+            "sop_id": sop_id,
+            "message": message,
+            "response": response,
+            "safe": safe,
+            "filtered": filtered,
+            "latency_ms": latency_ms,
+            "created_at": time.time(),
+        })
+        self.recorded += 1
+        if len(self._pending) >= self.batch_size:
+            self._flush_soon()
+        return True
+
+    async def _wait_for_room(self) -> bool:
+        """Backpressure: wait for a flush to free space, up to max_wait_seconds"""
+        self.waited += 1
+        deadline = time.monotonic() + self.max_wait_seconds
+        while len(self._pending) >= self.max_pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._flush_soon()
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await asyncio.wait_for(waiter, remaining)
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        return True
+
+    def _wake(self, count: int):
+        while self._waiters and count > 0:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                count -= 1
+
+    def _flush_soon(self, drain: bool = False):
+        if self._flushing:
+            return
+        task = asyncio.create_task(self.flush(drain))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def flush(self, drain: bool = True):
+        """
+        Write pending rows, `batch_size` rows per INSERT. Without `drain` only
+        full batches go out and a partial one waits for more rows or the timer.
+        """
+        if self._flushing:
+            return
+        self._flushing = True
+        try:
+            while len(self._pending) >= (1 if drain else self.batch_size):
+                batch = self._pending[:self.batch_size]
+                del self._pending[:self.batch_size]
+                self._wake(len(batch))
+                try:
+                    async with self._sessions() as session:
+                        await ConversationRepository(session).insert_many(batch)
+                except asyncio.CancelledError:
+                    # Shutting down mid-insert: keep the rows for close()
+                    self._pending[:0] = batch
+                    raise
+                except Exception as e:
+                    self.failed += len(batch)
+                    logger.warning(f"Dropped {len(batch)} conversation records: {e}")
+                    continue
+                self.written += len(batch)
+                self.batches += 1
+                self.max_batch = max(self.max_batch, len(batch))
+        finally:
+            self._flushing = False
+
+    async def close(self):
+        """Stop the timer, let running flushes finish and write whatever is left"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await asyncio.gather(*self._flushes, return_exceptions=True)
+        await self.flush()
+        self._wake(len(self._waiters))
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "max_pending": self.max_pending,
+            "recorded": self.recorded,
+            "written": self.written,
+            "batches": self.batches,
+            "avg_batch": round(self.written / self.batches, 1) if self.batches else 0.0,
+            "max_batch": self.max_batch,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "waited": self.waited,
+        }
@@ -1,3 +1,6 @@
+import hashlib
+import hmac
+import secrets
 from fastapi import Security, HTTPException
 from fastapi.security import APIKeyHeader
 from typing import Optional
@@ -12,4 +15,20 @@ def get_api_key(api_key: str = Security(api_key_header)) -> str:
             status_code=403,
             detail="Could not validate API key"
         )
-    return api_key
\ No newline at end of file
+    return api_key
+
+# Password hashing (PBKDF2-SHA256, stdlib only)
+_HASH_ITERATIONS = 390000
+
+def hash_password(password: str) -> str:
+    salt = secrets.token_hex(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt.encode("ascii"), _HASH_ITERATIONS)
+    return f"pbkdf2_sha256${_HASH_ITERATIONS}${salt}${digest.hex()}"
+
+def verify_password(password: str, hashed_password: str) -> bool:
+    try:
+        _, iterations, salt, expected = hashed_password.split("$")
+    except (AttributeError, ValueError):
+        return False
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt.encode("ascii"), int(iterations))
+    return hmac.compare_digest(digest.hex(), expected)
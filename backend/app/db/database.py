@@ -1,17 +1,122 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+"""Async SQLAlchemy engine and sessions (aiosqlite for SQLite, asyncpg for Postgres)"""
 
-DATABASE_URL = "sqlite:///./sql_app.db"  # Update with your database URL
+from typing import AsyncIterator, Optional
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+from sqlalchemy import event, inspect, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
+
+from app.config import settings
+
+# Plain URLs are mapped onto their async drivers
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+
+def async_database_url(url: str) -> str:
+    scheme, separator, rest = url.partition("://")
+    return _ASYNC_DRIVERS.get(scheme, scheme) + separator + rest
+
+
+def create_engine(url: Optional[str] = None, **overrides) -> AsyncEngine:
+    """
+    Async engine with the configured connection pool.
+
+    SQLite connections run in aiosqlite's background thread, so queries never
+    block the event loop; WAL lets readers in other workers proceed while one
+    writes. In-memory SQLite keeps SQLAlchemy's single-connection pool.
+    """
+    url = async_database_url(url or settings.DATABASE_URL)
+    options = {"echo": settings.DATABASE_ECHO, "pool_pre_ping": True}
+    if ":memory:" not in url:
+        options.update(
+            pool_size=settings.DATABASE_POOL_SIZE,
+            max_overflow=settings.DATABASE_MAX_OVERFLOW,
+            pool_timeout=settings.DATABASE_POOL_TIMEOUT_SECONDS,
+            pool_recycle=settings.DATABASE_POOL_RECYCLE_SECONDS,
+        )
+    options.update(overrides)
+    engine = create_async_engine(url, **options)
+
+    if url.startswith("sqlite"):
+        @event.listens_for(engine.sync_engine, "connect")
+        def _sqlite_pragmas(dbapi_connection, _):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute("PRAGMA busy_timeout=5000")
+            cursor.close()
+
+    return engine
+
+
+engine = create_engine()
+AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
 
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
+# Columns added to tables that existing deployments created earlier. create_all
+# only creates missing tables, so init_db adds these to an older table in
+# place. Every entry is nullable or has a default, so old rows stay valid.
+# Append new ones here; never edit or remove a shipped entry.
+ADDED_COLUMNS = (
+    ("conversations", "conversation_id", "VARCHAR(32)"),
+    ("conversations", "sop_id", "VARCHAR(255)"),
+    ("conversations", "safe", "BOOLEAN NOT NULL DEFAULT TRUE"),
+    ("conversations", "filtered", "BOOLEAN NOT NULL DEFAULT FALSE"),
+    ("conversations", "latency_ms", "FLOAT"),
+    # Rows written before the column existed sort as oldest
+    ("conversations", "created_at", "FLOAT NOT NULL DEFAULT 0"),
+    # Existing documents have no slug and are addressed by id
+    ("documents", "slug", "VARCHAR(255)"),
+    ("documents", "version", "INTEGER NOT NULL DEFAULT 1"),
+)
+ADDED_INDEXES = (
+    ("ix_conversations_conversation_id", "conversations", "conversation_id", False),
+    ("ix_conversations_created_at", "conversations", "created_at", False),
+    ("ix_documents_slug", "documents", "slug", True),
+)
+
+
+async def get_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+def _add_missing_columns(connection):
+    existing = {}
+    inspector = inspect(connection)
+    for table, column, ddl in ADDED_COLUMNS:
+        if table not in existing:
+            existing[table] = {c["name"] for c in inspector.get_columns(table)}
+        if column not in existing[table]:
+            connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+            existing[table].add(column)
+    for name, table, column, unique in ADDED_INDEXES:
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        connection.execute(text(f"CREATE {kind} IF NOT EXISTS {name} ON {table} ({column})"))
+
+
+async def init_db(bind: Optional[AsyncEngine] = None):
+    """
+    Create any missing tables, then bring tables created by an older release
+    up to date with ADDED_COLUMNS and ADDED_INDEXES. Both steps are idempotent
+    and run at startup in every worker.
+    """
+    # Registers every model on Base.metadata
+    from app.models import cache_version, conversation, document, safety_incident, user  # noqa: F401
+
+    async with (bind or engine).begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
     try:
-        yield db
-    finally:
-        db.close()
\ No newline at end of file
+        async with (bind or engine).begin() as connection:
+            await connection.run_sync(_add_missing_columns)
+    except DBAPIError:
+        # Another worker added a column between our check and our ALTER;
+        # checking again skips whatever it already did
+        async with (bind or engine).begin() as connection:
+            await connection.run_sync(_add_missing_columns)
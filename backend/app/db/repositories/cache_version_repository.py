@@ -0,0 +1,31 @@
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.cache_version import CacheVersion
+
+class CacheVersionRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get(self, name: str) -> int:
+        version = await self.db.scalar(select(CacheVersion.version).where(CacheVersion.name == name))
+        return version or 0
+
+    async def ensure(self, name: str):
+        """Create the counter row if it is missing (safe to race from several workers)"""
+        if await self.db.get(CacheVersion, name) is not None:
+            return
+        self.db.add(CacheVersion(name=name, version=0))
+        try:
+            await self.db.commit()
+        except IntegrityError:
+            await self.db.rollback()
+
+    async def bump(self, name: str):
+        """Increment in the caller's transaction; the caller commits"""
+        result = await self.db.execute(
+            update(CacheVersion).where(CacheVersion.name == name).values(version=CacheVersion.version + 1)
+        )
+        if result.rowcount == 0:
+            self.db.add(CacheVersion(name=name, version=1))
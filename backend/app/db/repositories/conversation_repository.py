@@ -0,0 +1,15 @@
+from typing import List
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.conversation import Conversation
+
+class ConversationRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def insert_many(self, rows: List[dict]):
+        """Bulk insert in one transaction (a multi-row INSERT where the driver allows)"""
+        await self.db.execute(insert(Conversation), rows)
+        await self.db.commit()
@@ -1,37 +1,80 @@
-from sqlalchemy.orm import Session
+import time
+from typing import List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.repositories.cache_version_repository import CacheVersionRepository
 from app.models.document import Document
 from app.schemas.document import DocumentCreate, DocumentUpdate
 
+# Counter bumped with every document write; caches of document bodies poll it
+DOCUMENTS_VERSION = "documents"
+
 class DocumentRepository:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
-    def create_document(self, document: DocumentCreate) -> Document:
-        db_document = Document(**document.dict())
+    async def create(self, document: DocumentCreate) -> Document:
+        now = int(time.time())
+        db_document = Document(**document.model_dump(), version=1, created_at=now, updated_at=now)
         self.db.add(db_document)
-        self.db.commit()
-        self.db.refresh(db_document)
+        await CacheVersionRepository(self.db).bump(DOCUMENTS_VERSION)
+        await self.db.commit()
+        await self.db.refresh(db_document)
         return db_document
 
-    def get_document(self, document_id: int) -> Document:
-        return self.db.query(Document).filter(Document.id == document_id).first()
+    async def get_by_id(self, document_id: int) -> Optional[Document]:
+        return await self.db.get(Document, document_id)
+
+    async def get_by_slug(self, slug: str) -> Optional[Document]:
+        return await self.db.scalar(select(Document).where(Document.slug == slug))
 
-    def get_documents(self) -> list[Document]:
-        return self.db.query(Document).all()
+    async def list_summaries(self) -> List[dict]:
+        """id, slug, title and version of every document, without the bodies"""
+        query = select(Document.id, Document.slug, Document.title, Document.version).order_by(Document.id)
+        return [dict(row._mapping) for row in await self.db.execute(query)]
 
-    def update_document(self, document_id: int, document: DocumentUpdate) -> Document:
-        db_document = self.get_document(document_id)
+    async def get_all(self, offset: int = 0, limit: Optional[int] = None) -> List[Document]:
+        query = select(Document).order_by(Document.id).offset(offset)
+        if limit is not None:
+            query = query.limit(limit)
+        return list((await self.db.scalars(query)).all())
+
+    async def update(self, document_id: int, document: DocumentUpdate) -> Optional[Document]:
+        db_document = await self.get_by_id(document_id)
         if db_document:
-            for key, value in document.dict(exclude_unset=True).items():
+            for key, value in document.model_dump(exclude_unset=True).items():
                 setattr(db_document, key, value)
-            self.db.commit()
-            self.db.refresh(db_document)
+            db_document.updated_at = int(time.time())
+            db_document.version += 1
+            await CacheVersionRepository(self.db).bump(DOCUMENTS_VERSION)
+            await self.db.commit()
+            await self.db.refresh(db_document)
+        return db_document
+
+    async def upsert_by_slug(self, slug: str, title: str, content: str) -> Document:
+        """Create or replace the document stored under `slug`"""
+        now = int(time.time())
+        db_document = await self.get_by_slug(slug)
+        if db_document is None:
+            db_document = Document(slug=slug, title=title, content=content, version=1, created_at=now, updated_at=now)
+            self.db.add(db_document)
+        else:
+            db_document.title = title
+            db_document.content = content
+            db_document.updated_at = now
+            db_document.version += 1
+        await CacheVersionRepository(self.db).bump(DOCUMENTS_VERSION)
+        await self.db.commit()
+        await self.db.refresh(db_document)
         return db_document
 
-    def delete_document(self, document_id: int) -> bool:
-        db_document = self.get_document(document_id)
+    async def delete(self, document_id: int) -> bool:
+        db_document = await self.get_by_id(document_id)
         if db_document:
-            self.db.delete(db_document)
-            self.db.commit()
+            await self.db.delete(db_document)
+            await CacheVersionRepository(self.db).bump(DOCUMENTS_VERSION)
+            await self.db.commit()
             return True
-        return False
\ No newline at end of file
+        return False
@@ -1,35 +1,42 @@
-from sqlalchemy.orm import Session
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
 from app.models.user import User
-from app.schemas.user import UserCreate, UserUpdate
+from app.schemas.user import UserCreate
 
 class UserRepository:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
-    def get_user(self, user_id: int) -> User:
-        return self.db.query(User).filter(User.id == user_id).first()
+    async def get_user(self, user_id: int) -> Optional[User]:
+        return await self.db.get(User, user_id)
+
+    async def get_user_by_email(self, email: str) -> Optional[User]:
+        return await self.db.scalar(select(User).where(User.email == email))
 
-    def get_user_by_email(self, email: str) -> User:
-        return self.db.query(User).filter(User.email == email).first()
+    async def get_user_by_username(self, username: str) -> Optional[User]:
+        return await self.db.scalar(select(User).where(User.username == username))
 
-    def create_user(self, user: UserCreate) -> User:
-        db_user = User(**user.dict())
+    async def create_user(self, user: UserCreate, hashed_password: str) -> User:
+        db_user = User(username=user.username, email=user.email, hashed_password=hashed_password)
         self.db.add(db_user)
-        self.db.commit()
-        self.db.refresh(db_user)
+        await self.db.commit()
+        await self.db.refresh(db_user)
         return db_user
 
-    def update_user(self, user_id: int, user: UserUpdate) -> User:
-        db_user = self.get_user(user_id)
+    async def update_user(self, user_id: int, **changes) -> Optional[User]:
+        db_user = await self.get_user(user_id)
         if db_user:
-            for key, value in user.dict(exclude_unset=True).items():
+            for key, value in changes.items():
                 setattr(db_user, key, value)
-            self.db.commit()
-            self.db.refresh(db_user)
+            await self.db.commit()
+            await self.db.refresh(db_user)
         return db_user
 
-    def delete_user(self, user_id: int) -> None:
-        db_user = self.get_user(user_id)
+    async def delete_user(self, user_id: int) -> None:
+        db_user = await self.get_user(user_id)
         if db_user:
-            self.db.delete(db_user)
-            self.db.commit()
\ No newline at end of file
+            await self.db.delete(db_user)
+            await self.db.commit()
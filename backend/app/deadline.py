@@ -0,0 +1,36 @@
+"""Per-request time budgets shared by every upstream call a request makes"""
+
+import time
+from typing import Optional
+
+
+class DeadlineExceeded(Exception):
+    """The request's time budget ran out"""
+
+
+class Deadline:
+    """An absolute point in time (monotonic clock) that a request must finish by"""
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def check(self):
+        if self.expired:
+            raise DeadlineExceeded("Request deadline exceeded")
+
+    def timeout(self, cap: Optional[float] = None) -> float:
+        """Seconds left, optionally capped; raises if nothing is left"""
+        self.check()
+        remaining = self.remaining()
+        return min(remaining, cap) if cap is not None else remaining
@@ -0,0 +1,185 @@
+"""Shared pooled HTTP client for upstream model calls"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+try:
+    from config import settings
+except ImportError:
+    from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _http2_available() -> bool:
+    """HTTP/2 support in httpx needs the optional `h2` package"""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class PooledHTTPClient:
+    """
+    App-lifetime httpx.AsyncClient with keep-alive pooling.
+
+    The FastAPI lifespan calls start()/close(); until start() has run (for
+    example in scripts or tests that never enter the lifespan) requests fall
+    back to a short-lived client so callers never need to care.
+    """
+
+    def __init__(
+        self,
+        timeout: Optional[float] = None,
+        max_connections: Optional[int] = None,
+        max_keepalive_connections: Optional[int] = None,
+        keepalive_expiry: Optional[float] = None,
+        http2: Optional[bool] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.timeout = timeout if timeout is not None else settings.HTTP_TIMEOUT_SECONDS
+        self.limits = httpx.Limits(
+            max_connections=max_connections if max_connections is not None else settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=(
+                max_keepalive_connections if max_keepalive_connections is not None
+                else settings.HTTP_MAX_KEEPALIVE_CONNECTIONS
+            ),
+            keepalive_expiry=keepalive_expiry if keepalive_expiry is not None else settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        )
+
+        wants_http2 = http2 if http2 is not None else settings.HTTP2_ENABLED
+        if wants_http2 and not _http2_available():
+            logger.warning("HTTP/2 requested but the 'h2' package is not installed; using HTTP/1.1")
+            wants_http2 = False
+        self.http2 = wants_http2
+
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+        # Usage counters (single event loop, so plain ints are enough)
+        self.requests_total = 0
+        self.errors_total = 0
+        self.fallback_requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.prewarmed_connections = 0
+
+    @property
+    def started(self) -> bool:
+        return self._client is not None and not self._client.is_closed
+
+    async def start(self, prewarm_url: Optional[str] = None, prewarm_connections: Optional[int] = None):
+        """Create the shared client and optionally open connections ahead of traffic"""
+        if self.started:
+            return
+
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=self.limits,
+            http2=self.http2,
+            transport=self.transport,
+        )
+
+        count = prewarm_connections if prewarm_connections is not None else settings.HTTP_PREWARM_CONNECTIONS
+        if prewarm_url and count > 0:
+            await self.prewarm(prewarm_url, count)
+
+    async def close(self):
+        """Close all pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def prewarm(self, url: str, connections: int):
+        """
+        Establish TCP+TLS connections to the upstream origin.
+
+        Any HTTP response (even 404/405) leaves a warm keep-alive connection in
+        the pool; failures are logged and otherwise ignored so a slow upstream
+        never blocks startup.
+        """
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}/"
+
+        async def _warm_one():
+            try:
+                await self._client.head(origin, timeout=5.0)
+                return True
+            except httpx.HTTPError as e:
+                logger.warning(f"Connection pre-warm to {origin} failed: {str(e)}")
+                return False
+
+        results = await asyncio.gather(*(_warm_one() for _ in range(connections)))
+        self.prewarmed_connections = sum(1 for ok in results if ok)
+        logger.info(f"Pre-warmed {self.prewarmed_connections}/{connections} connections to {origin}")
+
+    @asynccontextmanager
+    async def _track(self):
+        self.requests_total += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            yield
+        except httpx.HTTPError:
+            self.errors_total += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        """POST through the shared pool (or a throwaway client before start())"""
+        async with self._track():
+            if self.started:
+                return await self._client.post(url, **kwargs)
+
+            self.fallback_requests += 1
+            async with httpx.AsyncClient(timeout=self.timeout, transport=self.transport) as client:
+                return await client.post(url, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """Streaming request; leaving the context early closes the upstream response"""
+        async with self._track():
+            if self.started:
+                async with self._client.stream(method, url, **kwargs) as response:
+                    yield response
+                return
+
+            self.fallback_requests += 1
+            async with httpx.AsyncClient(timeout=self.timeout, transport=self.transport) as client:
+                async with client.stream(method, url, **kwargs) as response:
+                    yield response
+
+    def _pool_connections(self) -> list:
+        # httpx does not expose pool internals publicly; read them defensively
+        transport = getattr(self._client, "_transport", None)
+        pool = getattr(transport, "_pool", None)
+        return list(getattr(pool, "connections", []) or [])
+
+    def stats(self) -> dict:
+        """Pool usage snapshot for /api/health"""
+        connections = self._pool_connections() if self.started else []
+        idle = sum(1 for conn in connections if conn.is_idle())
+
+        return {
+            "started": self.started,
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "keepalive_expiry": self.limits.keepalive_expiry,
+            "open_connections": len(connections),
+            "idle_connections": idle,
+            "active_connections": len(connections) - idle,
+            "prewarmed_connections": self.prewarmed_connections,
+            "requests_total": self.requests_total,
+            "errors_total": self.errors_total,
+            "fallback_requests": self.fallback_requests,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+        }
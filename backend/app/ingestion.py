@@ -0,0 +1,269 @@
+"""Background ingestion of uploaded SOP documents"""
+
+import asyncio
+import logging
+import os
+import re
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from multipart.multipart import MultipartParser, parse_options_header
+
+try:
+    from config import settings
+    from sop_index import chunk_sop
+    from sample_sops import add_uploaded_sop
+except ImportError:
+    from app.config import settings
+    from app.sop_index import chunk_sop
+    from app.sample_sops import add_uploaded_sop
+
+logger = logging.getLogger(__name__)
+
+_BLANK_RUN = re.compile(r"\n{3,}")
+
+# Text fields sent next to the uploaded file (e.g. the title)
+_MAX_FIELD_BYTES = 16 * 1024
+
+
+class UploadTooLarge(ValueError):
+    """The upload is bigger than UPLOAD_MAX_BYTES"""
+
+
+def normalize_text(text: str) -> str:
+    """Unify line endings, drop control characters and collapse blank-line runs"""
+    text = text.replace("\r\n", "\n").replace("\r", "\n").replace("\x00", "")
+    text = "\n".join(line.rstrip() for line in text.split("\n"))
+    return _BLANK_RUN.sub("\n\n", text).strip()
+
+
+def parse_document(path: str, filename: str) -> Tuple[str, List[str]]:
+    """
+    Extract, normalize and chunk one spooled upload.
+    Runs in a worker process, so it only touches the file and pure functions.
+    """
+    if filename.lower().endswith(".pdf"):
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            raise ValueError("PDF uploads need the optional 'pypdf' package")
+        text = "\n\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+    else:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            text = f.read()
+
+    content = normalize_text(text)
+    if not content:
+        raise ValueError("Document contains no text")
+    return content, chunk_sop(content)
+
+
+def _slug(filename: str) -> str:
+    stem = Path(filename).stem.lower()
+    return re.sub(r"[^a-z0-9]+", "_", stem).strip("_")[:40] or "sop"
+
+
+class IngestionPipeline:
+    """
+    Spool uploads to disk and index them in the background.
+
+    Upload bodies are parsed as they arrive and the file part is written
+    once, straight into the spool directory (no intermediate temp file), in
+    bounded pieces on a worker thread, so memory and the event loop stay
+    free whatever the upload size. An upload stops being read as soon as it
+    passes max_bytes, or before any of it is read if its declared length
+    already does. Parsing and chunking run in a process pool (or
+    inline threads when max_workers is 0), and the results are indexed on the
+    event loop. Job state is kept per worker process.
+    """
+
+    def __init__(
+        self,
+        spool_dir: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        max_jobs: int = 1000,
+    ):
+        self.spool_dir = Path(spool_dir or settings.UPLOAD_SPOOL_DIR or Path(tempfile.gettempdir()) / "sop_uploads")
+        self.max_workers = max_workers if max_workers is not None else settings.INGESTION_WORKERS
+        self.max_bytes = max_bytes or settings.UPLOAD_MAX_BYTES
+        self.max_jobs = max_jobs
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._jobs: "OrderedDict[str, dict]" = OrderedDict()
+        self._tasks = set()
+
+    def too_large(self, content_length: Optional[str], overhead: int = 0) -> bool:
+        """Whether a declared request size already rules the upload out, before any of it is read"""
+        return bool(content_length and content_length.isdigit() and int(content_length) > self.max_bytes + overhead)
+
+    def _new_spool_file(self) -> Path:
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        return self.spool_dir / f"{uuid.uuid4().hex}.part"
+
+    async def spool_form(
+        self,
+        content_type: str,
+        body: AsyncIterator[bytes],
+        file_field: str = "document",
+    ) -> Tuple[Path, int, str, Dict[str, str]]:
+        """
+        Stream a multipart/form-data body into a spool file.
+
+        Returns (path, size, filename, text fields). Only the first file in
+        `file_field` is kept. Raises UploadTooLarge past max_bytes and
+        ValueError for a body that is not a form with that file.
+        """
+        _, options = parse_options_header(content_type)
+        boundary = options.get(b"boundary")
+        if not content_type.lower().startswith("multipart/form-data") or not boundary:
+            raise ValueError("Expected a multipart/form-data body")
+
+        # The parser's callbacks are synchronous: collect events per body chunk
+        events: List[tuple] = []
+        header = [b"", b""]
+        headers: Dict[bytes, bytes] = {}
+
+        def on_header_field(data, start, end):
+            header[0] += data[start:end]
+
+        def on_header_value(data, start, end):
+            header[1] += data[start:end]
+
+        def on_header_end():
+            headers[header[0].lower()] = header[1]
+            header[0] = header[1] = b""
+
+        def on_headers_finished():
+            events.append(("part", headers.get(b"content-disposition", b"")))
+            headers.clear()
+
+        parser = MultipartParser(boundary, {
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_headers_finished": on_headers_finished,
+            "on_part_data": lambda data, start, end: events.append(("data", data[start:end])),
+            "on_part_end": lambda: events.append(("end", None)),
+        })
+
+        path = await asyncio.to_thread(self._new_spool_file)
+        f = await asyncio.to_thread(open, path, "wb")
+        size, filename, fields = 0, None, {}
+        target = None  # "file", a field name, or None to skip the part
+        try:
+            async for chunk in body:
+                parser.write(chunk)
+                pending = []
+                for kind, value in events:
+                    if kind == "part":
+                        _, disposition = parse_options_header(value)
+                        name = disposition.get(b"name", b"").decode("utf-8", "replace")
+                        if b"filename" not in disposition:
+                            target = name
+                            fields[name] = b""
+                        elif name == file_field and filename is None:
+                            target = "file"
+                            filename = disposition[b"filename"].decode("utf-8", "replace")
+                        else:
+                            target = None
+                    elif kind == "data" and target == "file":
+                        size += len(value)
+                        if size > self.max_bytes:
+                            raise UploadTooLarge(f"Upload exceeds {self.max_bytes} bytes")
+                        pending.append(value)
+                    elif kind == "data" and target is not None:
+                        fields[target] += value
+                        if len(fields[target]) > _MAX_FIELD_BYTES:
+                            raise ValueError(f"Form field '{target}' is too large")
+                    elif kind == "end":
+                        target = None
+                events.clear()
+                if pending:
+                    await asyncio.to_thread(f.write, b"".join(pending))
+            parser.finalize()
+            if filename is None:
+                raise ValueError(f"Missing '{file_field}' file")
+        except BaseException:
+            await asyncio.to_thread(f.close)
+            path.unlink(missing_ok=True)
+            raise
+        await asyncio.to_thread(f.close)
+        return path, size, filename, {name: value.decode("utf-8", "replace") for name, value in fields.items()}
+
+    def submit(self, path: Path, filename: str, size: int, title: Optional[str] = None) -> dict:
+        """Queue a spooled file for ingestion and return its job record"""
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "sop_id": f"{_slug(filename)}_{uuid.uuid4().hex[:8]}",
+            "title": title or Path(filename).stem,
+            "filename": filename,
+            "bytes": size,
+            "status": "queued",
+            "chunks": None,
+            "error": None,
+            "created_at": time.time(),
+            "finished_at": None,
+        }
+        self._jobs[job["job_id"]] = job
+        while len(self._jobs) > self.max_jobs:
+            self._jobs.popitem(last=False)
+
+        task = asyncio.create_task(self._run(job, path))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return dict(job)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    async def _run(self, job: dict, path: Path):
+        loop = asyncio.get_running_loop()
+        try:
+            job["status"] = "parsing"
+            if self.max_workers > 0:
+                content, chunks = await loop.run_in_executor(
+                    self._process_pool(), parse_document, str(path), job["filename"]
+                )
+            else:
+                content, chunks = await asyncio.to_thread(parse_document, str(path), job["filename"])
+
+            # Stored in the database; index mutation stays on the event loop, where the readers are
+            job["status"] = "indexing"
+            await add_uploaded_sop(job["sop_id"], job["title"], content, chunks=chunks)
+
+            job["chunks"] = len(chunks)
+            job["status"] = "done"
+        except Exception as e:
+            logger.warning(f"Ingestion of {job['filename']} failed: {e}")
+            job["status"] = "failed"
+            job["error"] = str(e)
+        finally:
+            job["finished_at"] = time.time()
+            path.unlink(missing_ok=True)
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        counts = {}
+        for job in self._jobs.values():
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {"jobs": counts, "running": len(self._tasks), "workers": self.max_workers}
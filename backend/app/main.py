@@ -1,11 +1,17 @@
 """Main FastAPI application"""
 
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Request, Response, Security
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from fastapi.security import APIKeyHeader
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from contextlib import asynccontextmanager
+import asyncio
+import json
 import logging
 import os
+import time
 from pathlib import Path
 
 # Add the app directory to Python path
@@ -15,12 +21,42 @@ sys.path.insert(0, str(Path(__file__).parent))
 # Import our modules
 try:
     from config import Settings
+    from admission import AdmissionLimiter, AdmissionMiddleware, AdmissionRejected, RateLimiter, RateLimitMiddleware
+    from metrics import REGISTRY, MetricsMiddleware, publish_snapshots
+    from profiling import ProfileStore, SamplingProfiler
+    from timing import StageTimer, stage
     from ai_service import AIService
-    from sample_sops import get_sop_list, get_sop_content
+    from http_client import PooledHTTPClient
+    from ingestion import IngestionPipeline, UploadTooLarge
+    from conversation_log import ConversationLog
+    from conversation_history import ConversationHistory, empty_state
+    from warmup import load_questions, warm_cache
+    from deadline import Deadline
+    from response_cache import ResponseCache
+    from semantic_cache import build_embedding_batcher, build_semantic_cache, question_embedder
+    from sample_sops import SOP_STORE, get_sop_list, get_sop_context, get_sop_version, enable_chunk_embeddings
+    from safety_filter import SafetyFilter
+    from services.embeddings_service import load_embeddings_service
+    from services.embedding_store import EmbeddingStore
 except ImportError:
     from app.config import Settings
+    from app.admission import AdmissionLimiter, AdmissionMiddleware, AdmissionRejected, RateLimiter, RateLimitMiddleware
+    from app.metrics import REGISTRY, MetricsMiddleware, publish_snapshots
+    from app.profiling import ProfileStore, SamplingProfiler
+    from app.timing import StageTimer, stage
     from app.ai_service import AIService
-    from app.sample_sops import get_sop_list, get_sop_content
+    from app.http_client import PooledHTTPClient
+    from app.ingestion import IngestionPipeline, UploadTooLarge
+    from app.conversation_log import ConversationLog
+    from app.conversation_history import ConversationHistory, empty_state
+    from app.warmup import load_questions, warm_cache
+    from app.deadline import Deadline
+    from app.response_cache import ResponseCache
+    from app.semantic_cache import build_embedding_batcher, build_semantic_cache, question_embedder
+    from app.sample_sops import SOP_STORE, get_sop_list, get_sop_context, get_sop_version, enable_chunk_embeddings
+    from app.safety_filter import SafetyFilter
+    from app.services.embeddings_service import load_embeddings_service
+    from app.services.embedding_store import EmbeddingStore
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -29,13 +65,100 @@ logger = logging.getLogger(__name__)
 # Initialize settings
 settings = Settings()
 
+# Shared upstream connection pool, answer caches, embeddings and AI service
+http_client = PooledHTTPClient()
+response_cache = ResponseCache() if settings.RESPONSE_CACHE_ENABLED else None
+embeddings_service = (
+    load_embeddings_service(settings.EMBEDDING_MODEL)
+    if settings.SEMANTIC_CACHE_ENABLED or settings.EMBEDDING_STORE_PATH else None
+)
+# One micro-batcher for every question embedding: SOP retrieval and the semantic cache
+embedding_batcher = build_embedding_batcher(embeddings_service)
+semantic_cache = (
+    build_semantic_cache(embeddings_service, embedding_batcher) if settings.SEMANTIC_CACHE_ENABLED else None
+)
+embedding_store = (
+    EmbeddingStore(settings.EMBEDDING_STORE_PATH)
+    if settings.EMBEDDING_STORE_PATH and embeddings_service is not None else None
+)
+ingestion = IngestionPipeline()
+conversation_log = ConversationLog() if settings.CONVERSATION_LOG_ENABLED else None
+conversation_history = ConversationHistory() if settings.CONVERSATION_HISTORY_ENABLED else None
+admission = AdmissionLimiter()
+rate_limiter = RateLimiter()
+profiles = ProfileStore()
+
+# Point-in-time values, read when /metrics is scraped
+REGISTRY.gauge("sop_admission_in_flight", "Chat requests holding an admission slot", lambda: admission.stats()["in_flight"])
+REGISTRY.gauge("sop_admission_queue_depth", "Chat requests waiting for an admission slot", lambda: admission.stats()["queue_depth"])
+REGISTRY.gauge("sop_single_flight_in_flight", "Distinct questions being generated", lambda: ai_service.single_flight.stats()["in_flight"])
+REGISTRY.gauge(
+    "sop_conversation_log_pending", "Chat records waiting to be written",
+    lambda: conversation_log.stats()["pending"] if conversation_log is not None else 0
+)
+ai_service = AIService(
+    http_client=http_client,
+    response_cache=response_cache,
+    semantic_cache=semantic_cache
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Own the upstream connection pool (and SOP chunk vectors) for the lifetime of the app"""
+    await http_client.start(prewarm_url=settings.OPENROUTER_API_URL)
+    await SOP_STORE.ready()
+    if conversation_log is not None:
+        await conversation_log.start()
+    if embedding_store is not None:
+        await enable_chunk_embeddings(embeddings_service, embedding_store, embedding_batcher)
+    
+    metrics_task = None
+    if settings.METRICS_ENABLED and settings.METRICS_DIR:
+        metrics_task = asyncio.create_task(publish_snapshots(settings.METRICS_DIR))
+    
+    warmup_task = None
+    if settings.WARMUP_ON_STARTUP and response_cache is not None:
+        # Fill the answer cache in the background; traffic is served meanwhile
+        warmup_task = asyncio.create_task(
+            warm_cache(ai_service, await load_questions(settings.WARMUP_QUESTIONS_PATH or None))
+        )
+    try:
+        yield
+    finally:
+        if warmup_task is not None:
+            warmup_task.cancel()
+        if metrics_task is not None:
+            metrics_task.cancel()
+        await http_client.close()
+        await ingestion.close()
+        if conversation_log is not None:
+            # Buffered chat records are written before the worker exits
+            await conversation_log.close()
+        if response_cache is not None:
+            response_cache.close()
+        if embedding_batcher is not None:
+            embedding_batcher.close()
+        rate_limiter.close()
+        if conversation_history is not None:
+            conversation_history.close()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Manufacturing SOP & Safety Explainer Bot",
     description="AI-powered explanation system for manufacturing SOPs and safety procedures",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Request metrics around a per-client rate limit, then a bounded number of chat
+# requests in flight; added before CORS so 429 responses still carry CORS headers
+app.add_middleware(AdmissionMiddleware, limiter=admission)
+app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -49,17 +172,24 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Profile-Id", "Retry-After"],
 )
 
-# Initialize AI service
-ai_service = AIService()
-
 
 # Request/Response Models
 class ChatRequest(BaseModel):
     """Chat request model"""
     question: str
     sop_id: Optional[str] = None
+    # Client time budget in milliseconds (capped at MAX_REQUEST_DEADLINE_SECONDS)
+    deadline_ms: Optional[int] = Field(default=None, gt=0)
+    # From an earlier response, to ask a follow-up in the same conversation
+    conversation_id: Optional[str] = None
+
+
+class ChatBatchRequest(BaseModel):
+    """Many chat requests answered in one call (independently: conversation_id is ignored)"""
+    items: List[ChatRequest] = Field(min_length=1)
 
 
 class ChatResponse(BaseModel):
@@ -67,6 +197,8 @@ class ChatResponse(BaseModel):
     response: str
     safe: bool
     filtered: bool = False
+    # Pass back as conversation_id to continue this conversation
+    conversation_id: Optional[str] = None
 
 
 class SOPInfo(BaseModel):
@@ -89,15 +221,172 @@ async def root():
 async def get_sops():
     """Get list of available SOPs"""
     try:
-        sops = get_sop_list()
+        sops = await get_sop_list()
         return sops
     except Exception as e:
         logger.error(f"Error fetching SOPs: {str(e)}")
         raise HTTPException(status_code=500, detail="Error fetching SOPs")
 
 
+# Multipart framing around the file (boundaries, part headers, the title field)
+UPLOAD_FORM_OVERHEAD_BYTES = 64 * 1024
+
+
+@app.post("/api/documents/upload", status_code=202)
+async def upload_document(request: Request):
+    """
+    Upload an SOP document for background ingestion.
+    Multipart form with a "document" file and an optional "title" field.
+    Returns as soon as the body is spooled to disk; poll the job for progress.
+    """
+    # Refuse a declared oversized body before reading any of it
+    if ingestion.too_large(request.headers.get("content-length"), UPLOAD_FORM_OVERHEAD_BYTES):
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {ingestion.max_bytes} bytes")
+    
+    try:
+        path, size, filename, fields = await ingestion.spool_form(
+            request.headers.get("content-type", ""), request.stream()
+        )
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    filename = filename or "document.txt"
+    job = ingestion.submit(path, filename, size, title=fields.get("title") or None)
+    return {**job, "fileName": filename, "status_url": f"/api/documents/jobs/{job['job_id']}"}
+
+
+@app.get("/api/documents/jobs/{job_id}")
+async def get_ingestion_job(job_id: str):
+    """Status of a background ingestion job"""
+    job = ingestion.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return job
+
+
+admin_key_header = APIKeyHeader(name="X-Admin-Key", auto_error=False)
+
+
+def require_admin(api_key: Optional[str] = Security(admin_key_header)) -> str:
+    """Guard for admin endpoints; disabled until ADMIN_API_KEY is configured"""
+    if not settings.ADMIN_API_KEY or api_key != settings.ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Could not validate admin key")
+    return api_key
+
+
+def _request_profiler(http_request: Request) -> Optional[SamplingProfiler]:
+    """A profiler for this request if an admin asked for one (X-Debug-Profile: 1 or ?profile=1)"""
+    wanted = http_request.headers.get("X-Debug-Profile") == "1" or http_request.query_params.get("profile") == "1"
+    if not wanted:
+        return None
+    require_admin(http_request.headers.get("X-Admin-Key"))
+    return SamplingProfiler()
+
+
+async def _save_profile(profiler: SamplingProfiler) -> str:
+    """Stop a request's profiler and save its stacks, both off the event loop; returns the profile id"""
+    return await asyncio.to_thread(profiles.save, await asyncio.to_thread(profiler.stop))
+
+
+def _request_deadline(request: ChatRequest) -> Deadline:
+    """Budget for all upstream work on this request"""
+    seconds = settings.REQUEST_DEADLINE_SECONDS
+    if request.deadline_ms is not None:
+        seconds = min(request.deadline_ms / 1000, settings.MAX_REQUEST_DEADLINE_SECONDS)
+    return Deadline.after(seconds)
+
+
+def _validate_question(request: ChatRequest):
+    """Reject empty or oversized questions"""
+    if not request.question or len(request.question.strip()) == 0:
+        raise HTTPException(status_code=400, detail="Question cannot be empty")
+    
+    if len(request.question) > 1000:
+        raise HTTPException(status_code=400, detail="Question too long (max 1000 characters)")
+    
+    if request.conversation_id is not None and not ConversationHistory.valid_id(request.conversation_id):
+        raise HTTPException(status_code=400, detail="Invalid conversation_id")
+
+
+async def _resolve_sop_context(
+    request: ChatRequest,
+    conversation: Optional[dict] = None,
+    embed_query=None
+) -> tuple[Optional[str], Optional[str]]:
+    """
+    Get the SOP sections relevant to the question, if an SOP was provided,
+    and the version of the SOP they came from (see get_sop_version).
+    In a conversation the previous question joins the retrieval query, so a
+    terse follow-up still finds the sections it refers to. `embed_query`
+    (see question_embedder) is reused when the query is the bare question.
+    """
+    sop_context = None
+    if request.sop_id:
+        query = request.question
+        previous = ConversationHistory.last_question(conversation) if conversation else None
+        if previous:
+            query = f"{previous} {query}"
+            embed_query = None
+        with stage("sop"):
+            sop_context = await get_sop_context(request.sop_id, query, embed_query=embed_query)
+        if not sop_context:
+            logger.warning(f"Invalid SOP ID provided: {request.sop_id}")
+            return None, None
+        return sop_context, get_sop_version(request.sop_id)
+    return None, None
+
+
+async def _load_conversation(request: ChatRequest) -> tuple[Optional[str], Optional[dict]]:
+    """The request's conversation id (a new one if it has none) and its stored turns"""
+    if conversation_history is None:
+        return None, None
+    if request.conversation_id is None:
+        return conversation_history.new_id(), empty_state()
+    return request.conversation_id, await conversation_history.load(request.conversation_id)
+
+
+async def _remember_turn(conversation_id: Optional[str], conversation: Optional[dict], question: str, result: dict):
+    """Keep an answered turn in the conversation's history (refusals and errors are left out)"""
+    if conversation_history is None or conversation_id is None:
+        return
+    if result.get("filtered") or result.get("error"):
+        return
+    await conversation_history.append(conversation_id, conversation, question, result["response"])
+
+
+def _history_window(conversation: Optional[dict]) -> Optional[str]:
+    if conversation_history is None or not conversation:
+        return None
+    return conversation_history.window(conversation) or None
+
+
+async def _log_conversation(request: ChatRequest, answer: ChatResponse, started: float):
+    """Hand the exchange to the write-behind conversation log (never raises)"""
+    if conversation_log is None:
+        return
+    try:
+        await conversation_log.record(
+            message=request.question,
+            response=answer.response,
+            safe=answer.safe,
+            filtered=answer.filtered,
+            latency_ms=round((time.perf_counter() - started) * 1000, 1),
+            sop_id=request.sop_id,
+            conversation_id=answer.conversation_id
+        )
+    except Exception as e:
+        logger.warning(f"Could not record conversation: {e}")
+
+
+def _sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
 @app.post("/api/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request, http_response: Response):
     """
     Process chat request and return AI-generated explanation
     
@@ -107,42 +396,203 @@ async def chat(request: ChatRequest):
     3. Retrieves relevant SOP content (if provided)
     4. Calls AI service for explanation
     5. Returns safe, educational response
+    
+    Stage timings are returned in a Server-Timing header. Admins can add
+    X-Debug-Profile: 1 (or ?profile=1) to sample-profile the request; the
+    X-Profile-Id header names the saved profile under /api/admin/profiles.
     """
+    profiler = _request_profiler(http_request)
+    timer = StageTimer()
+    if profiler is not None:
+        profiler.start()
     try:
-        # Validate question
-        if not request.question or len(request.question.strip()) == 0:
-            raise HTTPException(status_code=400, detail="Question cannot be empty")
-        
-        if len(request.question) > 1000:
-            raise HTTPException(status_code=400, detail="Question too long (max 1000 characters)")
-        
-        # Get SOP content if provided
-        sop_context = None
-        if request.sop_id:
-            sop_context = get_sop_content(request.sop_id)
-            if not sop_context:
-                logger.warning(f"Invalid SOP ID provided: {request.sop_id}")
+        with timer.activate():
+            _validate_question(request)
+            conversation_id, conversation = await _load_conversation(request)
+            embed_query = question_embedder(embedding_batcher, request.question)
+            sop_context, sop_version = await _resolve_sop_context(request, conversation, embed_query)
+            
+            # Generate explanation
+            result = await ai_service.generate_explanation(
+                user_query=request.question,
+                sop_context=sop_context,
+                deadline=_request_deadline(request),
+                history=_history_window(conversation),
+                sop_version=sop_version,
+                embed_query=embed_query
+            )
+            await _remember_turn(conversation_id, conversation, request.question, result)
         
-        # Generate explanation
-        result = await ai_service.generate_explanation(
-            user_query=request.question,
-            sop_context=sop_context
-        )
-        
-        return ChatResponse(
+        http_response.headers["Server-Timing"] = timer.header()
+        answer = ChatResponse(
             response=result["response"],
             safe=result["safe"],
-            filtered=result.get("filtered", False)
+            filtered=result.get("filtered", False),
+            conversation_id=conversation_id
         )
+        await _log_conversation(request, answer, timer.started)
+        return answer
         
-    except HTTPException:
-        raise
     except Exception as e:
-        logger.error(f"Error processing chat request: {str(e)}")
-        raise HTTPException(
-            status_code=500,
-            detail="An error occurred processing your request. Please try again."
-        )
+        error = e if isinstance(e, HTTPException) else None
+        if error is None:
+            logger.error(f"Error processing chat request: {str(e)}")
+            error = HTTPException(
+                status_code=500,
+                detail="An error occurred processing your request. Please try again."
+            )
+        if profiler is not None:
+            # FastAPI renders a new response for the error, so the id goes on the exception
+            headers = {**(error.headers or {}), "X-Profile-Id": await _save_profile(profiler)}
+            profiler = None
+            raise HTTPException(status_code=error.status_code, detail=error.detail, headers=headers) from e
+        if error is e:
+            raise
+        raise error from e
+    finally:
+        if profiler is not None:
+            http_response.headers["X-Profile-Id"] = await _save_profile(profiler)
+
+
+async def _answer_batch_item(index: int, item: ChatRequest, semaphore: asyncio.Semaphore) -> dict:
+    """One /api/chat/batch result; errors are reported per item, never raised"""
+    line = {"index": index, "question": item.question, "sop_id": item.sop_id}
+    started = time.perf_counter()
+    try:
+        _validate_question(item)
+    except HTTPException as e:
+        return {**line, "error": e.detail}
+    
+    # Refused questions never take a concurrency slot or reach upstream
+    is_safe, refusal_message = SafetyFilter.is_query_safe(item.question)
+    if not is_safe:
+        return {**line, **ChatResponse(response=refusal_message, safe=False, filtered=True).model_dump()}
+    
+    try:
+        async with semaphore:
+            # Every item in flight holds its own admission slot, like a single chat request
+            await admission.acquire()
+            held = time.perf_counter()
+            try:
+                # Each item's deadline starts when it gets a slot, not when the batch arrived
+                embed_query = question_embedder(embedding_batcher, item.question)
+                sop_context, sop_version = await _resolve_sop_context(item, embed_query=embed_query)
+                result = await ai_service.generate_explanation(
+                    user_query=item.question,
+                    sop_context=sop_context,
+                    deadline=_request_deadline(item),
+                    sop_version=sop_version,
+                    embed_query=embed_query
+                )
+            finally:
+                admission.release(time.perf_counter() - held)
+    except AdmissionRejected:
+        return {**line, "error": "Server is busy. Please try again shortly."}
+    except Exception as e:
+        logger.error(f"Error processing batch item {index}: {str(e)}")
+        return {**line, "error": "An error occurred processing this item."}
+    
+    answer = ChatResponse(
+        response=result["response"],
+        safe=result["safe"],
+        filtered=result.get("filtered", False)
+    )
+    line.update(answer.model_dump())
+    if result.get("error"):
+        line["error"] = result["error"]
+    else:
+        await _log_conversation(item, answer, started)
+    return line
+
+
+@app.post("/api/chat/batch")
+async def chat_batch(request: ChatBatchRequest):
+    """
+    Answer many questions concurrently, streamed back as NDJSON
+    
+    Items run at most BATCH_MAX_CONCURRENCY at a time, each holding its own
+    admission slot (an item that cannot get one reports "Server is busy").
+    Each line is sent as soon as its item finishes, so lines arrive out of
+    order; "index" maps a line back to its item. A final {"summary": ...} line closes the stream.
+    """
+    if len(request.items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Too many items (max {settings.BATCH_MAX_ITEMS})")
+    
+    async def ndjson_stream():
+        semaphore = asyncio.Semaphore(settings.BATCH_MAX_CONCURRENCY)
+        tasks = [
+            asyncio.create_task(_answer_batch_item(index, item, semaphore))
+            for index, item in enumerate(request.items)
+        ]
+        summary = {"items": len(tasks), "answered": 0, "filtered": 0, "errors": 0}
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                line = await next_done
+                if "error" in line:
+                    summary["errors"] += 1
+                elif line["filtered"]:
+                    summary["filtered"] += 1
+                else:
+                    summary["answered"] += 1
+                yield json.dumps(line) + "\n"
+            yield json.dumps({"summary": summary}) + "\n"
+        finally:
+            # Client went away: stop the remaining items
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
+
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Stream an AI-generated explanation as Server-Sent Events
+    
+    Events:
+    - token: {"content": ...} incremental compliant text
+    - reset: {"reason": ...} discard text shown so far (a rewrite follows)
+    - done: final ChatResponse payload (response, safe, filtered, conversation_id)
+    """
+    started = time.perf_counter()
+    _validate_question(request)
+    conversation_id, conversation = await _load_conversation(request)
+    embed_query = question_embedder(embedding_batcher, request.question)
+    sop_context, sop_version = await _resolve_sop_context(request, conversation, embed_query)
+    deadline = _request_deadline(request)
+    
+    async def event_stream():
+        try:
+            async for event in ai_service.stream_explanation(
+                user_query=request.question,
+                sop_context=sop_context,
+                deadline=deadline,
+                history=_history_window(conversation),
+                sop_version=sop_version,
+                embed_query=embed_query
+            ):
+                kind = event.pop("event")
+                if kind == "done":
+                    await _remember_turn(conversation_id, conversation, request.question, event)
+                    final = ChatResponse(
+                        response=event["response"],
+                        safe=event["safe"],
+                        filtered=event.get("filtered", False),
+                        conversation_id=conversation_id
+                    )
+                    yield _sse("done", final.model_dump())
+                    await _log_conversation(request, final, started)
+                else:
+                    yield _sse(kind, event)
+        except Exception as e:
+            logger.error(f"Error streaming chat request: {str(e)}")
+            yield _sse("error", {"detail": "An error occurred processing your request. Please try again."})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @app.get("/api/health")
@@ -152,10 +602,70 @@ async def health_check():
         "status": "healthy",
         "api_configured": bool(settings.OPENROUTER_API_KEY),
         "model": settings.MODEL_NAME,
-        "available_sops": len(get_sop_list())
+        "available_sops": len(await get_sop_list()),
+        "sop_store": SOP_STORE.stats(),
+        "http_pool": http_client.stats(),
+        "response_cache": response_cache.stats() if response_cache is not None else None,
+        "semantic_cache": semantic_cache.stats() if semantic_cache is not None else None,
+        "embedding_store": embedding_store.stats() if embedding_store is not None else None,
+        "ingestion": ingestion.stats(),
+        "conversation_log": conversation_log.stats() if conversation_log is not None else None,
+        "conversation_history": await conversation_history.stats() if conversation_history is not None else None,
+        "admission": admission.stats(),
+        "rate_limit": rate_limiter.stats(),
+        "single_flight": ai_service.single_flight.stats(),
+        "compliance": ai_service.compliance_stats(),
+        "upstream": ai_service.router.stats()
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition, merged across workers when METRICS_DIR is set"""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return PlainTextResponse(
+        REGISTRY.exposition(settings.METRICS_DIR or None),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.get("/api/admin/profiles")
+async def list_profiles(_: str = Depends(require_admin)):
+    """Saved request profiles, newest first"""
+    return {"profiles": profiles.list()}
+
+
+@app.get("/api/admin/profiles/{profile_id}")
+async def download_profile(profile_id: str, _: str = Depends(require_admin)):
+    """One profile as folded stacks (flamegraph.pl / speedscope input)"""
+    path = profiles.path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=path.name)
+
+
+@app.get("/api/admin/cache")
+async def cache_stats(_: str = Depends(require_admin)):
+    """Answer cache hit/miss counters"""
+    return {
+        "response_cache": response_cache.stats() if response_cache is not None else None,
+        "semantic_cache": semantic_cache.stats() if semantic_cache is not None else None
+    }
+
+
+@app.delete("/api/admin/cache")
+async def purge_cache(_: str = Depends(require_admin)):
+    """Drop every cached answer (memory, persistent and semantic tiers)"""
+    purged = 0
+    if response_cache is not None:
+        purged += await response_cache.purge()
+    if semantic_cache is not None:
+        purged += semantic_cache.stats()["entries"]
+        semantic_cache.clear()
+    return {"purged": purged}
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
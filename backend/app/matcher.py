@@ -0,0 +1,201 @@
+"""Single-pass compiled rule matcher shared by SafetyFilter and AIService"""
+
+import re
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+
+class RuleMatch(NamedTuple):
+    """One rule hit: which rule, its category, and where it matched"""
+    rule: int
+    category: str
+    start: int
+    end: int
+    text: str
+
+
+# Characters that may follow a leading word while still requiring the whole
+# word to end there (whitespace, explicit boundary, punctuation, end of group)
+_WORD_END = ("\\s", " ", "\\b", ",", ")", "|")
+
+
+def _split_alternatives(group_body: str) -> List[str]:
+    """Split a regex group body on top-level '|'"""
+    parts, depth, current, i = [], 0, "", 0
+    while i < len(group_body):
+        ch = group_body[i]
+        if ch == "\\" and i + 1 < len(group_body):
+            current += group_body[i:i + 2]
+            i += 2
+            continue
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "|" and depth == 0:
+            parts.append(current)
+            current = ""
+            i += 1
+            continue
+        current += ch
+        i += 1
+    parts.append(current)
+    return parts
+
+
+def _leading_word(fragment: str) -> Optional[Tuple[str, str]]:
+    """Return (word, remainder) for a fragment starting with a literal word"""
+    m = re.match(r"((?:[a-z]|\\')+)", fragment)
+    if not m:
+        return None
+    return m.group(1).replace("\\'", "'"), fragment[m.end():]
+
+
+def _trigger_words(pattern: str) -> Optional[List[str]]:
+    """
+    Derive the literal words every match of `pattern` must start with.
+
+    Handles the shapes used by our rule lists: `\\bword...` and
+    `\\b(alt one|alt two (x|y)|...)...`. Returns None when the leading words
+    cannot be derived, in which case the rule is always checked in full.
+    """
+    if not pattern.startswith(r"\b"):
+        return None
+    body = pattern[2:]
+
+    if not body.startswith("("):
+        lead = _leading_word(body)
+        if lead is None or not lead[1].startswith(_WORD_END):
+            return None
+        return [lead[0]]
+
+    # Find the matching close paren of the leading group
+    depth, end = 0, None
+    i = 0
+    while i < len(body):
+        ch = body[i]
+        if ch == "\\":
+            i += 2
+            continue
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+            if depth == 0:
+                end = i
+                break
+        i += 1
+    if end is None or body.startswith("(?"):
+        return None
+
+    after_group = body[end + 1:]
+    words = []
+    for alternative in _split_alternatives(body[1:end]):
+        lead = _leading_word(alternative)
+        if lead is None:
+            return None
+        word, rest = lead
+        if rest == "":
+            # Word ends with the group, so what follows the group must end it
+            if after_group and not after_group.startswith(_WORD_END):
+                return None
+        elif not rest.startswith(_WORD_END):
+            return None
+        words.append(word)
+    return words
+
+
+def _trie_pattern(words: Sequence[str]) -> str:
+    """
+    Build a regex that matches any of `words` as a character trie.
+
+    Shared prefixes are factored out ("dis(?:connect|engage)"), so the regex
+    engine tests each text position against one branch per leading character
+    instead of against every word in turn.
+    """
+    has_end = "" in words
+    branches = {}
+    for word in words:
+        if word:
+            branches.setdefault(word[0], []).append(word[1:])
+
+    alternatives = [re.escape(ch) + _trie_pattern(rest) for ch, rest in sorted(branches.items())]
+    if not alternatives:
+        return ""
+    body = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+    return "(?:" + body + ")?" if has_end else body
+
+
+class CompiledRuleSet:
+    """
+    Precompiled ruleset that scans text once.
+
+    The text is lowercased once and a single trie-shaped regex of every rule's
+    leading trigger words finds candidate positions in one pass; each candidate
+    is then confirmed by anchoring only the rules that start with that word at
+    that position. Rules whose trigger words cannot be derived fall back to a
+    full search, so results are always exact.
+    """
+
+    def __init__(self, rules: Sequence[Tuple[str, str]]):
+        self.rules = list(rules)
+        # Rule patterns are written in lowercase and run against lowercased text;
+        # the case-insensitive set covers text whose length changes when lowered
+        self._compiled = [re.compile(pattern) for _, pattern in self.rules]
+        self._compiled_ci = [re.compile(pattern, re.IGNORECASE) for _, pattern in self.rules]
+
+        self._by_trigger = {}
+        self._unfiltered = []
+        for index, (_, pattern) in enumerate(self.rules):
+            words = _trigger_words(pattern)
+            if words is None:
+                self._unfiltered.append(index)
+                continue
+            for word in words:
+                indexes = self._by_trigger.setdefault(word, [])
+                if index not in indexes:
+                    indexes.append(index)
+
+        if self._by_trigger:
+            trie = r"\b" + _trie_pattern(list(self._by_trigger)) + r"\b"
+            self._prefilter = re.compile(trie)
+            self._prefilter_ci = re.compile(trie, re.IGNORECASE)
+        else:
+            self._prefilter = self._prefilter_ci = None
+
+    def scan(self, text: str) -> List[RuleMatch]:
+        """
+        Return every rule match in text order, with category and span.
+
+        Spans always index the original `text`.
+        """
+        text_lower = text.lower()
+        if len(text_lower) == len(text):
+            haystack, prefilter, compiled = text_lower, self._prefilter, self._compiled
+        else:
+            # A few non-ASCII characters expand when lowercased, which would
+            # shift spans; match case-insensitively on the original instead
+            haystack, prefilter, compiled = text, self._prefilter_ci, self._compiled_ci
+
+        matches = []
+
+        if prefilter is not None:
+            for candidate in prefilter.finditer(haystack):
+                pos = candidate.start()
+                for index in self._by_trigger[candidate.group().lower()]:
+                    m = compiled[index].match(haystack, pos)
+                    if m:
+                        matches.append(RuleMatch(index, self.rules[index][0], m.start(), m.end(), text[m.start():m.end()]))
+
+        for index in self._unfiltered:
+            for m in compiled[index].finditer(haystack):
+                matches.append(RuleMatch(index, self.rules[index][0], m.start(), m.end(), text[m.start():m.end()]))
+
+        matches.sort(key=lambda match: (match.start, match.rule))
+        return matches
+
+    def first_rule(self, text: str) -> Optional[int]:
+        """Lowest-numbered matching rule, mirroring a loop over the rule list"""
+        matches = self.scan(text)
+        if not matches:
+            return None
+        return min(match.rule for match in matches)
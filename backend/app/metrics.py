@@ -0,0 +1,408 @@
+"""
+Prometheus text-format metrics.
+
+Counters and histograms live in plain per-worker dicts and are updated from
+the event loop thread only, so the hot path is a dict lookup and an add with
+no locks. With several workers, each one writes its snapshot to METRICS_DIR
+(periodically and whenever it serves a scrape) and a scrape merges every
+worker's latest snapshot. When a worker is gone (its PID no longer exists,
+or it retired its snapshot on shutdown) its counters and histograms are
+folded into a persistent archive snapshot and only its gauges are dropped,
+so merged counters never go backwards, as in prometheus_client's
+multiprocess mode.
+"""
+
+import asyncio
+import bisect
+import json
+import logging
+import math
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single worker, nothing to coordinate
+    fcntl = None
+
+try:
+    from config import settings
+except ImportError:
+    from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Seconds; request and upstream latency
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0, 60.0)
+# Seconds; in-process regex scans
+SCAN_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05)
+# Counters and histograms of workers that are gone, inside METRICS_DIR
+ARCHIVE_SNAPSHOT = "archive.json"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, owned by another user
+        return True
+    return True
+
+
+def _is_dead(path: Path) -> bool:
+    """A worker snapshot whose process no longer exists (the archive is never dead)"""
+    try:
+        pid = int(path.stem)
+    except ValueError:
+        return False
+    return pid != os.getpid() and not _pid_alive(pid)
+
+
+def _read_snapshot(path: Path) -> Optional[dict]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+
+
+def _write_snapshot(path: Path, snapshot: dict):
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(json.dumps(snapshot), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+@contextmanager
+def _locked(directory: Path):
+    """Serialize archive updates and scrapes between the workers sharing `directory`"""
+    with open(directory / ".lock", "a") as handle:
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+class Counter:
+    """Monotonic count per label combination"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def snapshot(self) -> list:
+        return [[list(labels), value] for labels, value in self._values.items()]
+
+    @staticmethod
+    def merge(into: dict, values: list):
+        for labels, value in values:
+            key = tuple(labels)
+            into[key] = into.get(key, 0.0) + value
+
+    def render(self, merged: dict) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+                for labels, value in sorted(merged.items())]
+
+
+class Histogram:
+    """Bucketed observations per label combination (stored per bucket, cumulated on render)"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket..., count above the last bucket, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._values.get(labels)
+        if series is None:
+            series = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._values.get(labels)
+        return int(sum(series[:-1])) if series else 0
+
+    def snapshot(self) -> list:
+        return [[list(labels), list(series)] for labels, series in self._values.items()]
+
+    @staticmethod
+    def merge(into: dict, values: list):
+        for labels, series in values:
+            key = tuple(labels)
+            if key in into:
+                into[key] = [a + b for a, b in zip(into[key], series)]
+            else:
+                into[key] = list(series)
+
+    def render(self, merged: dict) -> List[str]:
+        lines = []
+        for labels, series in sorted(merged.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), series):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {_format_value(cumulative)}")
+        return lines
+
+
+class MetricsRegistry:
+    """This worker's metrics, plus snapshot files for merging across workers"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        # name -> (documentation, callback); read at scrape time, summed across workers
+        self._gauges: Dict[str, Tuple[str, Callable[[], float]]] = {}
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, callback: Callable[[], float]):
+        self._gauges[name] = (documentation, callback)
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self) -> dict:
+        gauges = {}
+        for name, (_, callback) in self._gauges.items():
+            try:
+                gauges[name] = float(callback())
+            except Exception as e:
+                logger.warning(f"Gauge {name} failed: {str(e)}")
+        return {
+            "metrics": {name: metric.snapshot() for name, metric in self._metrics.items()},
+            "gauges": gauges,
+        }
+
+    def write_snapshot(self, directory: str):
+        """Publish this worker's snapshot for scrapes served by other workers"""
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        _write_snapshot(path / f"{os.getpid()}.json", self.snapshot())
+
+    def retire_snapshot(self, directory: str):
+        """On shutdown: move this worker's counters into the archive and drop its snapshot"""
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        with _locked(path):
+            self._archive(path, self.snapshot())
+            try:
+                os.unlink(path / f"{os.getpid()}.json")
+            except FileNotFoundError:
+                pass
+
+    def _archive(self, directory: Path, snapshot: dict):
+        """Add a gone worker's counters and histograms to the archive; its gauges end with it"""
+        archive = _read_snapshot(directory / ARCHIVE_SNAPSHOT) or {"metrics": {}, "gauges": {}}
+        metrics = {}
+        for name, metric in self._metrics.items():
+            merged: dict = {}
+            metric.merge(merged, archive["metrics"].get(name, []))
+            metric.merge(merged, snapshot["metrics"].get(name, []))
+            metrics[name] = [[list(labels), value] for labels, value in merged.items()]
+        _write_snapshot(directory / ARCHIVE_SNAPSHOT, {"metrics": metrics, "gauges": {}})
+
+    def _snapshots(self, directory: Optional[str]) -> List[dict]:
+        if not directory:
+            return [self.snapshot()]
+        self.write_snapshot(directory)
+        path = Path(directory)
+        with _locked(path):
+            for dead in [file for file in path.glob("*.json") if _is_dead(file)]:
+                # Killed without retiring its snapshot
+                try:
+                    snapshot = _read_snapshot(dead)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Discarding unreadable metrics snapshot {dead.name}: {str(e)}")
+                    snapshot = None
+                if snapshot is not None:
+                    self._archive(path, snapshot)
+                dead.unlink(missing_ok=True)
+
+            snapshots = []
+            for file in path.glob("*.json"):
+                try:
+                    snapshot = _read_snapshot(file)
+                except (OSError, ValueError):
+                    # A live worker's file that is unreadable right now; the next scrape retries
+                    continue
+                if snapshot is not None:
+                    snapshots.append(snapshot)
+        return snapshots
+
+    def exposition(self, directory: Optional[str] = None) -> str:
+        """Prometheus text format, merged over every worker publishing to `directory`"""
+        snapshots = self._snapshots(directory)
+        lines = []
+        for name, metric in self._metrics.items():
+            merged: dict = {}
+            for snapshot in snapshots:
+                metric.merge(merged, snapshot["metrics"].get(name, []))
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.render(merged))
+        for name, (documentation, _) in self._gauges.items():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_format_value(sum(s['gauges'].get(name, 0.0) for s in snapshots))}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "sop_http_request_duration_seconds", "HTTP request latency (streamed bodies included)", ("path", "status")
+)
+SAFETY_FILTER_SECONDS = REGISTRY.histogram(
+    "sop_safety_filter_seconds", "Time spent in SafetyFilter.is_query_safe", buckets=SCAN_BUCKETS
+)
+SAFETY_FILTER_RESULTS = REGISTRY.counter(
+    "sop_safety_filter_results_total", "Questions checked by the safety filter", ("result",)
+)
+COMPLIANCE_SCAN_SECONDS = REGISTRY.histogram(
+    "sop_compliance_scan_seconds", "Time spent scanning model output for banned verbs", buckets=SCAN_BUCKETS
+)
+COMPLIANCE_VIOLATIONS = REGISTRY.counter(
+    "sop_compliance_violations_total", "Model answers that contained banned operational language", ("source",)
+)
+COMPLIANCE_OUTCOMES = REGISTRY.counter(
+    "sop_compliance_outcomes_total",
+    "How generated answers reached compliance: clean, local (sanitizer), remote (model rewrite) or fallback",
+    ("path",)
+)
+UPSTREAM_SECONDS = REGISTRY.histogram(
+    "sop_upstream_request_seconds",
+    "Upstream model call latency (streams: time to response headers)",
+    ("model", "mode")
+)
+UPSTREAM_ERRORS = REGISTRY.counter(
+    "sop_upstream_errors_total", "Failed upstream model calls by HTTP status or error type", ("model", "code")
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    "sop_cache_lookups_total", "Answer cache lookups", ("cache", "result")
+)
+ADMISSION_WAIT_SECONDS = REGISTRY.histogram(
+    "sop_admission_wait_seconds", "Time chat requests waited in the admission queue"
+)
+ADMISSION_REJECTED = REGISTRY.counter(
+    "sop_admission_rejected_total", "Chat requests turned away with 429", ("reason",)
+)
+
+
+def upstream_error_code(error: BaseException) -> str:
+    """HTTP status for status errors, otherwise the exception type"""
+    response = getattr(error, "response", None)
+    if response is not None and getattr(response, "status_code", None):
+        return str(response.status_code)
+    return type(error).__name__
+
+
+def _route_template(scope: dict) -> str:
+    """Route path with parameters put back (bounded label cardinality); 'other' if unmatched"""
+    if "endpoint" not in scope:
+        return "other"
+    path = scope["path"]
+    for name, value in (scope.get("path_params") or {}).items():
+        path = path.replace(f"/{value}", f"/{{{name}}}", 1)
+    return path
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording HTTP_REQUEST_SECONDS for every request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, _route_template(scope), str(status["code"]))
+
+
+async def publish_snapshots(directory: str, interval: Optional[float] = None):
+    """Background task: keep this worker's snapshot fresh for other workers' scrapes"""
+    interval = interval if interval is not None else settings.METRICS_FLUSH_SECONDS
+    try:
+        while True:
+            try:
+                REGISTRY.write_snapshot(directory)
+            except OSError as e:
+                logger.warning(f"Could not write metrics snapshot: {str(e)}")
+            await asyncio.sleep(interval)
+    finally:
+        try:
+            REGISTRY.retire_snapshot(directory)
+        except OSError as e:
+            logger.warning(f"Could not retire metrics snapshot: {str(e)}")
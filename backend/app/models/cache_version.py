@@ -0,0 +1,9 @@
+from sqlalchemy import Column, Integer, String
+from app.db.database import Base
+
+class CacheVersion(Base):
+    """A named counter bumped by every write to the data it covers"""
+    __tablename__ = 'cache_versions'
+
+    name = Column(String(64), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Boolean, Column, Float, Integer, String, Text, ForeignKey
 from sqlalchemy.orm import relationship
 from app.db.database import Base
 
@@ -6,8 +6,15 @@ class Conversation(Base):
     __tablename__ = "conversations"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
-    message = Column(String, index=True)
-    response = Column(String, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    conversation_id = Column(String(32), nullable=True, index=True)
+    sop_id = Column(String(255), nullable=True)
+    # Large free text: never indexed, an index would only slow the bulk inserts
+    message = Column(Text, nullable=False)
+    response = Column(Text, nullable=False)
+    safe = Column(Boolean, nullable=False, default=True)
+    filtered = Column(Boolean, nullable=False, default=False)
+    latency_ms = Column(Float, nullable=True)
+    created_at = Column(Float, nullable=False, index=True)
 
-    user = relationship("User", back_populates="conversations")
\ No newline at end of file
+    user = relationship("User", back_populates="conversations")
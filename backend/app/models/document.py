@@ -1,13 +1,15 @@
 from sqlalchemy import Column, Integer, String, Text
-from sqlalchemy.ext.declarative import declarative_base
-
-Base = declarative_base()
+from app.db.database import Base
 
 class Document(Base):
     __tablename__ = 'documents'
 
     id = Column(Integer, primary_key=True, index=True)
+    # SOP id for uploaded SOPs; documents without one are addressed by id
+    slug = Column(String(255), unique=True, index=True, nullable=True)
     title = Column(String(255), nullable=False)
     content = Column(Text, nullable=False)
+    # Bumped on every change, so cached copies can tell they are stale
+    version = Column(Integer, nullable=False, default=1)
     created_at = Column(Integer, nullable=False)
-    updated_at = Column(Integer, nullable=False)
\ No newline at end of file
+    updated_at = Column(Integer, nullable=False)
@@ -1,7 +1,6 @@
 from sqlalchemy import Column, Integer, String, Boolean
-from sqlalchemy.ext.declarative import declarative_base
-
-Base = declarative_base()
+from sqlalchemy.orm import relationship
+from app.db.database import Base
 
 class User(Base):
     __tablename__ = 'users'
@@ -12,4 +11,6 @@ class User(Base):
     full_name = Column(String, nullable=True)
     hashed_password = Column(String)
     is_active = Column(Boolean, default=True)
-    is_superuser = Column(Boolean, default=False)
\ No newline at end of file
+    is_superuser = Column(Boolean, default=False)
+
+    conversations = relationship("Conversation", back_populates="user")
\ No newline at end of file
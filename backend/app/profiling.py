@@ -0,0 +1,101 @@
+"""Opt-in sampling profiler for single requests, saved as folded stacks"""
+
+import logging
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional
+
+try:
+    from config import settings
+except ImportError:
+    from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_PROFILE_ID = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$")
+
+
+def _fold(frame) -> str:
+    """Root-first 'function (file:line)' frames joined by ';'"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """
+    Sample one thread's stack from a background thread every `interval` seconds.
+
+    Pointed at the event loop thread, the samples show everything the loop ran
+    while the request was in flight (other requests included); samples in the
+    selector are time spent waiting on I/O such as the upstream call. Output
+    is the folded-stack format read by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, thread_id: Optional[int] = None, interval: Optional[float] = None):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval if interval is not None else settings.PROFILE_SAMPLE_INTERVAL_MS / 1000
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[_fold(frame)] += 1
+
+    def stop(self) -> str:
+        """Stop sampling and return the folded stacks"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common()) + "\n"
+
+
+class ProfileStore:
+    """Folded-stack files on disk, newest `max_files` kept"""
+
+    def __init__(self, directory: Optional[str] = None, max_files: Optional[int] = None):
+        self.directory = Path(directory or settings.PROFILE_DIR or Path(tempfile.gettempdir()) / "sop_profiles")
+        self.max_files = max_files if max_files is not None else settings.PROFILE_MAX_FILES
+
+    def save(self, folded: str) -> str:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        (self.directory / f"{profile_id}.folded").write_text(folded, encoding="utf-8")
+        for old in self._files()[self.max_files:]:
+            old.unlink(missing_ok=True)
+        return profile_id
+
+    def _files(self) -> List[Path]:
+        if not self.directory.exists():
+            return []
+        return sorted(self.directory.glob("*.folded"), key=lambda path: path.stat().st_mtime, reverse=True)
+
+    def list(self) -> List[dict]:
+        return [
+            {"profile_id": path.stem, "bytes": path.stat().st_size, "created": path.stat().st_mtime}
+            for path in self._files()
+        ]
+
+    def path(self, profile_id: str) -> Optional[Path]:
+        """File for a profile id, or None (ids are validated, never joined raw)"""
+        if not _PROFILE_ID.match(profile_id):
+            return None
+        path = self.directory / f"{profile_id}.folded"
+        return path if path.exists() else None
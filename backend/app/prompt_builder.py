@@ -0,0 +1,144 @@
+"""Token-budgeted prompt assembly with a pre-serialized static prefix"""
+
+import json
+import logging
+from typing import Optional
+
+try:
+    from config import settings
+    from sop_index import estimate_tokens
+except ImportError:
+    from app.config import settings
+    from app.sop_index import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Model families that honour explicit cache_control breakpoints via OpenRouter;
+# others (e.g. OpenAI) cache a repeated prefix automatically
+_CACHE_CONTROL_PREFIXES = ("anthropic/", "google/gemini")
+
+# Fixed wrapper text in every user message
+_CONTEXT_HEADER = "**Relevant SOP Content:**\n"
+_HISTORY_HEADER = "**Conversation So Far:**\n"
+_QUESTION_HEADER = "**User Question:** "
+
+
+def _trim_to_tokens(text: str, budget: int) -> str:
+    """
+    Cut text to roughly `budget` tokens, preferring paragraph (and retrieved
+    chunk) boundaries and falling back to a word boundary.
+    """
+    if estimate_tokens(text) <= budget:
+        return text
+    if budget <= 0:
+        return ""
+
+    kept, used = [], 0
+    for paragraph in text.split("\n\n"):
+        cost = estimate_tokens(paragraph) + 1
+        if used + cost > budget:
+            break
+        kept.append(paragraph)
+        used += cost
+    if kept:
+        return "\n\n".join(kept).rstrip(". \n") + "\n\n..."
+
+    cut = text[:budget * 4].rsplit(" ", 1)[0]
+    return cut + " ..."
+
+
+def _trim_oldest(text: str, budget: int) -> str:
+    """Drop leading paragraphs (the oldest history) until text fits in `budget` tokens"""
+    paragraphs = text.split("\n\n")
+    while paragraphs and estimate_tokens("\n\n".join(paragraphs)) > budget:
+        paragraphs.pop(0)
+    return "\n\n".join(paragraphs)
+
+
+class PromptBuilder:
+    """
+    Build chat-completion bodies for one model and system prompt.
+
+    The model name and system message never change, so that part of the JSON
+    body is serialized once and every request only encodes its user message.
+    Keeping the static prefix byte-identical also lets providers reuse their
+    prompt cache; models that need an explicit breakpoint get cache_control.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        system_prompt: str,
+        max_input_tokens: Optional[int] = None,
+        cache_hints: Optional[bool] = None,
+        max_tokens: int = 1000,
+    ):
+        self.model = model
+        self.system_prompt = system_prompt
+        self.max_input_tokens = max_input_tokens if max_input_tokens is not None else settings.PROMPT_MAX_INPUT_TOKENS
+        self.cache_hints = cache_hints if cache_hints is not None else settings.PROMPT_CACHE_HINTS
+        self.max_tokens = max_tokens
+        self.system_tokens = estimate_tokens(system_prompt)
+
+        if self.cache_hints and model.startswith(_CACHE_CONTROL_PREFIXES):
+            system_message = {
+                "role": "system",
+                "content": [{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}],
+            }
+        else:
+            system_message = {"role": "system", "content": system_prompt}
+
+        self._prefix = (
+            '{"model":' + json.dumps(model) + ',"messages":[' + json.dumps(system_message, ensure_ascii=False) + ","
+        ).encode("utf-8")
+
+    def user_message(self, question: str, sop_context: Optional[str] = None, history: Optional[str] = None) -> str:
+        """
+        Combine SOP context, conversation history and the question. History
+        gets what the question leaves of max_input_tokens (oldest turns go
+        first), then the SOP context is trimmed to the rest. Logs the token split.
+        """
+        question_tokens = estimate_tokens(_QUESTION_HEADER + question)
+        available = self.max_input_tokens - self.system_tokens - question_tokens
+        context_tokens = 0
+        history_tokens = 0
+        trimmed = []
+
+        history_part = None
+        if history:
+            recent = _trim_oldest(history, available - estimate_tokens(_HISTORY_HEADER))
+            if recent != history:
+                trimmed.append("history")
+            if recent:
+                history_part = f"{_HISTORY_HEADER}{recent}\n"
+                history_tokens = estimate_tokens(history_part)
+                available -= history_tokens
+
+        parts = []
+        if sop_context:
+            budget = available - estimate_tokens(_CONTEXT_HEADER)
+            context = _trim_to_tokens(sop_context, budget)
+            if context != sop_context:
+                trimmed.append("context")
+            if context:
+                parts.append(f"{_CONTEXT_HEADER}{context}\n")
+                context_tokens = estimate_tokens(context)
+        if history_part:
+            parts.append(history_part)
+        parts.append(f"{_QUESTION_HEADER}{question}")
+
+        total = self.system_tokens + context_tokens + history_tokens + question_tokens
+        logger.info(
+            f"Prompt tokens: system={self.system_tokens} context={context_tokens} "
+            f"history={history_tokens} question={question_tokens} total={total}"
+            + "".join(f" ({part} trimmed)" for part in trimmed)
+        )
+        return "\n".join(parts)
+
+    def body(self, user_message: str, temperature: float, stream: bool = False) -> bytes:
+        """Serialized request body: cached prefix + this request's user message and options"""
+        tail = json.dumps({"role": "user", "content": user_message}, ensure_ascii=False)
+        options = f'],"temperature":{json.dumps(temperature)},"max_tokens":{self.max_tokens}'
+        if stream:
+            options += ',"stream":true'
+        return self._prefix + (tail + options + "}").encode("utf-8")
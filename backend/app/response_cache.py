@@ -0,0 +1,224 @@
+"""Exact-match response cache for chat answers (in-memory LRU+TTL, optional SQLite tier)"""
+
+import asyncio
+import hashlib
+import logging
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+try:
+    from config import settings
+except ImportError:
+    from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.]+$")
+
+
+def normalize_question(question: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing punctuation"""
+    question = _WHITESPACE.sub(" ", question.strip().lower())
+    return _TRAILING_PUNCTUATION.sub("", question)
+
+
+def content_hash(text: str) -> str:
+    """Hex SHA-256 of a text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def prompt_fingerprint(model: str, system_prompt: str) -> str:
+    """Identifies the model + prompt version an answer was generated with"""
+    return content_hash(f"{model}\n{system_prompt}")[:16]
+
+
+class ResponseCache:
+    """
+    Two-tier cache of compliant chat answers.
+
+    Keys combine the normalized question, a hash of the SOP content, the model
+    name and a hash of the system prompt, so editing an SOP or the prompt never
+    serves stale answers. The memory tier is an LRU with TTL; the optional
+    SQLite tier survives restarts and is shared by workers on the same host.
+    SQLite is only touched from one worker thread, never the event loop:
+    get() awaits its read, and set() queues its write behind the memory update.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        sqlite_path: Optional[str] = None,
+    ):
+        self.max_entries = max_entries if max_entries is not None else settings.RESPONSE_CACHE_MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.RESPONSE_CACHE_TTL_SECONDS
+        sqlite_path = sqlite_path if sqlite_path is not None else settings.RESPONSE_CACHE_SQLITE_PATH
+
+        # key -> (expires_at, value)
+        self._entries: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if sqlite_path:
+            self._db = self._open_db(sqlite_path)
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="response-cache")
+
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.errors = 0
+
+    @staticmethod
+    def _open_db(path: str) -> sqlite3.Connection:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # WAL keeps readers in other workers unblocked while one writes
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, rewritten INTEGER NOT NULL, "
+            "expires_at REAL NOT NULL)"
+        )
+        return db
+
+    @staticmethod
+    def make_key(question: str, sop_context: Optional[str], model: str, system_prompt: str) -> str:
+        sop_hash = content_hash(sop_context) if sop_context else "-"
+        return content_hash("\x1f".join([
+            normalize_question(question),
+            sop_hash,
+            prompt_fingerprint(model, system_prompt),
+        ]))
+
+    async def _run_db(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _read_row(self, key: str, now: float) -> Optional[tuple]:
+        """(response, rewritten, expires_at) of a row, deleting it if expired; runs on the executor"""
+        row = self._db.execute(
+            "SELECT response, rewritten, expires_at FROM response_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is not None and row[2] <= now:
+            self._db.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+        return row
+
+    def _expires_at(self, key: str) -> Optional[float]:
+        row = self._db.execute("SELECT expires_at FROM response_cache WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    async def get(self, key: str) -> Optional[dict]:
+        now = time.time()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+            self.expirations += 1
+
+        if self._db is not None:
+            try:
+                row = await self._run_db(self._read_row, key, now)
+            except sqlite3.Error as e:
+                # The persistent tier is an optimization; treat it as a miss
+                self.errors += 1
+                logger.warning(f"Response cache read failed: {str(e)}")
+                row = None
+            if row is not None:
+                response, rewritten, expires_at = row
+                if expires_at > now:
+                    value = {"response": response, "rewritten": bool(rewritten)}
+                    self._remember(key, expires_at, value)
+                    self.hits += 1
+                    self.persistent_hits += 1
+                    return value
+                self.expirations += 1
+
+        self.misses += 1
+        return None
+
+    async def contains(self, key: str) -> bool:
+        """Whether an unexpired entry exists, without touching LRU order or hit counters"""
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            return True
+        if self._db is not None:
+            expires_at = await self._run_db(self._expires_at, key)
+            return expires_at is not None and expires_at > now
+        return False
+
+    def set(self, key: str, response: str, rewritten: bool = False):
+        expires_at = time.time() + self.ttl_seconds
+        value = {"response": response, "rewritten": rewritten}
+        self._remember(key, expires_at, value)
+        self.stores += 1
+
+        if self._db is not None:
+            # Write-behind: this worker already serves it from memory
+            self._executor.submit(self._write_row, key, response, rewritten, expires_at)
+
+    def _write_row(self, key: str, response: str, rewritten: bool, expires_at: float):
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO response_cache (key, response, rewritten, expires_at) VALUES (?, ?, ?, ?)",
+                (key, response, int(rewritten), expires_at)
+            )
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Response cache write failed: {str(e)}")
+
+    def _remember(self, key: str, expires_at: float, value: dict):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def purge(self) -> int:
+        """Drop every entry from both tiers; returns how many were removed"""
+        removed = len(self._entries)
+        self._entries.clear()
+        if self._db is not None:
+            removed = max(removed, await self._run_db(self._delete_all))
+        logger.info(f"Response cache purged ({removed} entries)")
+        return removed
+
+    def _delete_all(self) -> int:
+        return self._db.execute("DELETE FROM response_cache").rowcount
+
+    def close(self):
+        """Finish queued writes, then close the SQLite tier"""
+        if self._db is not None:
+            self._executor.shutdown(wait=True)
+            self._db.close()
+            self._db = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "persistent": self._db is not None,
+            "hits": self.hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "errors": self.errors,
+        }
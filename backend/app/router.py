@@ -0,0 +1,351 @@
+"""Hedged, failover routing of model calls across upstream targets"""
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, List, Optional
+
+import httpx
+
+try:
+    from config import settings
+    from deadline import Deadline, DeadlineExceeded
+except ImportError:
+    from app.config import settings
+    from app.deadline import Deadline, DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamUnavailable(Exception):
+    """Every target's circuit breaker is open"""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Transient upstream failures: rate limiting, 5xx and transport errors"""
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(error, httpx.TransportError)
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    if isinstance(error, httpx.HTTPStatusError):
+        value = error.response.headers.get("Retry-After", "")
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+class UpstreamTarget:
+    """One endpoint/model pair with its latency window and circuit breaker"""
+
+    def __init__(self, url: str, model: str, window: int = 200):
+        self.url = url
+        self.model = model
+        self.name = f"{model}@{url}"
+        self._latencies = deque(maxlen=window)
+
+        self.requests = 0
+        self.errors = 0
+        self.cancelled = 0
+        self.wins = 0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.probing = False  # the half-open trial request is in flight
+
+    @classmethod
+    def parse(cls, spec: str, default_url: str) -> "UpstreamTarget":
+        """'model' or 'model@url'"""
+        model, _, url = spec.partition("@")
+        return cls(url.strip() or default_url, model.strip())
+
+    @property
+    def samples(self) -> int:
+        return len(self._latencies)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def available(self, now: float) -> bool:
+        """Closed, or open long enough that one trial request may go through and none is in flight"""
+        if now < self.open_until:
+            return False
+        return not (self.open_until and self.probing)
+
+    def claim(self, now: float) -> bool:
+        """
+        Take the right to send a request: always while closed, but only once
+        per trial while half-open. The trial's outcome (record_success or
+        record_failure) or release() hands the right back.
+        """
+        if not self.available(now):
+            return False
+        if self.open_until:
+            self.probing = True
+        return True
+
+    def release(self):
+        """A claimed request ended without an outcome (e.g. cancelled): allow another trial"""
+        self.probing = False
+
+    def record_success(self, seconds: float):
+        self._latencies.append(seconds)
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.probing = False
+
+    def record_failure(self, threshold: int, reset_seconds: float):
+        self.errors += 1
+        self.consecutive_failures += 1
+        self.probing = False
+        if self.consecutive_failures >= threshold:
+            # A failed trial re-opens the breaker for another full period
+            self.open_until = time.monotonic() + reset_seconds
+
+    def stats(self) -> dict:
+        p50, p95 = self.percentile(50), self.percentile(95)
+        return {
+            "model": self.model,
+            "url": self.url,
+            "requests": self.requests,
+            "errors": self.errors,
+            "cancelled": self.cancelled,
+            "wins": self.wins,
+            "error_rate": round(self.errors / self.requests, 4) if self.requests else 0.0,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "circuit_open": not self.available(time.monotonic()),
+            "half_open_probe": self.probing,
+        }
+
+
+class ModelRouter:
+    """
+    Run a call against ordered targets with hedging and failover.
+
+    The first available target is tried immediately. If it has not produced
+    an accepted result after its hedge delay (its latency percentile once
+    enough samples exist), the call is also started on the next target, and
+    so on; a failure starts the next target at once. The first accepted
+    result wins and the remaining attempts are cancelled. Targets that fail
+    repeatedly are skipped until their breaker's reset period has passed;
+    then a single trial request is let through (half-open), and the breaker
+    closes or re-opens on its outcome.
+    """
+
+    def __init__(
+        self,
+        targets: List[UpstreamTarget],
+        hedge_enabled: Optional[bool] = None,
+        hedge_percentile: Optional[float] = None,
+        hedge_initial_delay: Optional[float] = None,
+        hedge_min_delay: Optional[float] = None,
+        hedge_min_samples: int = 20,
+        breaker_threshold: Optional[int] = None,
+        breaker_reset_seconds: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        retry_base_delay: Optional[float] = None,
+        retry_max_delay: Optional[float] = None,
+    ):
+        if not targets:
+            raise ValueError("ModelRouter needs at least one target")
+        self.targets = targets
+        self.hedge_enabled = hedge_enabled if hedge_enabled is not None else settings.HEDGE_ENABLED
+        self.hedge_percentile = hedge_percentile if hedge_percentile is not None else settings.HEDGE_PERCENTILE
+        self.hedge_initial_delay = (
+            hedge_initial_delay if hedge_initial_delay is not None else settings.HEDGE_INITIAL_DELAY_SECONDS
+        )
+        self.hedge_min_delay = hedge_min_delay if hedge_min_delay is not None else settings.HEDGE_MIN_DELAY_SECONDS
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker_threshold = breaker_threshold if breaker_threshold is not None else settings.BREAKER_FAILURE_THRESHOLD
+        self.breaker_reset_seconds = (
+            breaker_reset_seconds if breaker_reset_seconds is not None else settings.BREAKER_RESET_SECONDS
+        )
+        self.max_retries = max_retries if max_retries is not None else settings.UPSTREAM_MAX_RETRIES
+        self.retry_base_delay = retry_base_delay if retry_base_delay is not None else settings.RETRY_BASE_DELAY_SECONDS
+        self.retry_max_delay = retry_max_delay if retry_max_delay is not None else settings.RETRY_MAX_DELAY_SECONDS
+        self.hedges = 0
+        self.retries = 0
+        self.fast_failures = 0
+
+    @property
+    def primary(self) -> UpstreamTarget:
+        return self.targets[0]
+
+    def candidates(self) -> List[UpstreamTarget]:
+        """Targets in preference order, skipping open breakers (claim() one before using it)"""
+        now = time.monotonic()
+        available = [target for target in self.targets if target.available(now)]
+        if not available:
+            self.fast_failures += 1
+            raise UpstreamUnavailable("All upstream targets are failing; try again shortly")
+        return available
+
+    def acquire(self) -> UpstreamTarget:
+        """The first target that can be claimed, for a call made outside call() (e.g. a stream)"""
+        now = time.monotonic()
+        for target in self.candidates():
+            if target.claim(now):
+                return target
+        self.fast_failures += 1
+        raise UpstreamUnavailable("All upstream targets are failing; try again shortly")
+
+    def hedge_delay(self, target: UpstreamTarget) -> float:
+        if target.samples < self.hedge_min_samples:
+            return self.hedge_initial_delay
+        return max(self.hedge_min_delay, target.percentile(self.hedge_percentile))
+
+    def record(self, target: UpstreamTarget, seconds: Optional[float] = None, error: bool = False):
+        """Outcome of a call made outside call() (e.g. a stream)"""
+        target.requests += 1
+        if error:
+            target.record_failure(self.breaker_threshold, self.breaker_reset_seconds)
+        else:
+            target.record_success(seconds or 0.0)
+
+    def backoff(self, retry: int, error: BaseException) -> float:
+        """Full-jitter exponential delay, honouring a 429's Retry-After"""
+        delay = random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** retry))
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.retry_max_delay))
+        return delay
+
+    async def _attempt_with_retries(
+        self,
+        attempt: Callable[[UpstreamTarget], Awaitable[Any]],
+        target: UpstreamTarget,
+        deadline: Optional[Deadline],
+    ) -> Any:
+        retry = 0
+        while True:
+            try:
+                return await attempt(target)
+            except Exception as e:
+                if retry >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = self.backoff(retry, e)
+                if deadline is not None and delay >= deadline.remaining():
+                    raise
+                retry += 1
+                self.retries += 1
+                logger.info(f"Retrying {target.name} in {delay:.2f}s after: {str(e)}")
+                await asyncio.sleep(delay)
+
+    async def call(
+        self,
+        attempt: Callable[[UpstreamTarget], Awaitable[Any]],
+        accept: Optional[Callable[[Any], bool]] = None,
+        deadline: Optional[Deadline] = None,
+    ) -> Any:
+        """
+        Return the first accepted result of attempt(target).
+
+        Results that fail `accept` (e.g. non-compliant text) are held as a
+        fallback while other attempts are still running; the earliest one is
+        returned if nothing better arrives. Raises the last error if every
+        attempt fails, or DeadlineExceeded once `deadline` has passed.
+        """
+        if deadline is not None:
+            deadline.check()
+        queue = self.candidates()
+        running = {}
+        fallback = None
+        last_error: Optional[BaseException] = None
+
+        def launch() -> Optional[UpstreamTarget]:
+            # A half-open target whose trial is already taken is skipped
+            while queue:
+                target = queue.pop(0)
+                if not target.claim(time.monotonic()):
+                    continue
+                target.requests += 1
+                task = asyncio.ensure_future(self._attempt_with_retries(attempt, target, deadline))
+                running[task] = (target, time.perf_counter())
+                return target
+            return None
+
+        current = launch()
+        if current is None:
+            self.fast_failures += 1
+            raise UpstreamUnavailable("All upstream targets are failing; try again shortly")
+        try:
+            while running:
+                timeout = None
+                if queue and self.hedge_enabled:
+                    timeout = self.hedge_delay(current)
+                if deadline is not None:
+                    timeout = min(timeout, deadline.remaining()) if timeout is not None else deadline.remaining()
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    if deadline is not None and deadline.expired:
+                        raise DeadlineExceeded("Request deadline exceeded waiting for upstream")
+                    # Slow primary: hedge onto the next target
+                    hedge = launch()
+                    if hedge is not None:
+                        self.hedges += 1
+                        current = hedge
+                        logger.info(f"Hedging model call to {current.name}")
+                    continue
+
+                for task in done:
+                    target, started = running.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        last_error = e
+                        # Running out of our own budget says nothing about the target
+                        if not isinstance(e, DeadlineExceeded) and not (deadline is not None and deadline.expired):
+                            target.record_failure(self.breaker_threshold, self.breaker_reset_seconds)
+                        else:
+                            target.release()
+                        logger.warning(f"Upstream {target.name} failed: {str(e)}")
+                        continue
+
+                    target.record_success(time.perf_counter() - started)
+                    if accept is None or accept(result):
+                        target.wins += 1
+                        return result
+                    if fallback is None:
+                        fallback = (target, result)
+
+                if not running and queue and fallback is None:
+                    # Fail over straight away instead of waiting out the hedge delay
+                    current = launch()
+
+            if fallback is not None:
+                fallback[0].wins += 1
+                return fallback[1]
+            if deadline is not None and deadline.expired:
+                raise DeadlineExceeded("Request deadline exceeded") from last_error
+            raise last_error
+        finally:
+            for task, (target, _) in running.items():
+                task.cancel()
+                target.cancelled += 1
+                target.release()
+
+    def stats(self) -> dict:
+        return {
+            "hedges": self.hedges,
+            "retries": self.retries,
+            "fast_failures": self.fast_failures,
+            "targets": [target.stats() for target in self.targets],
+        }
+
+
+def build_router() -> ModelRouter:
+    """Primary MODEL_NAME at OPENROUTER_API_URL, then UPSTREAM_FALLBACK_TARGETS in order"""
+    targets = [UpstreamTarget(settings.OPENROUTER_API_URL, settings.MODEL_NAME)]
+    for spec in settings.UPSTREAM_FALLBACK_TARGETS:
+        targets.append(UpstreamTarget.parse(spec, settings.OPENROUTER_API_URL))
+    return ModelRouter(targets)
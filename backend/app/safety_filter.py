@@ -1,33 +1,43 @@
 """Safety filtering logic to detect and refuse unsafe queries"""
 
-from typing import Tuple
-import re
+import time
+from typing import List, Tuple
+
+try:
+    from matcher import CompiledRuleSet, RuleMatch
+    from metrics import SAFETY_FILTER_RESULTS, SAFETY_FILTER_SECONDS
+except ImportError:
+    from app.matcher import CompiledRuleSet, RuleMatch
+    from app.metrics import SAFETY_FILTER_RESULTS, SAFETY_FILTER_SECONDS
 
 
 class SafetyFilter:
     """Filters queries that request approvals, decisions, or unsafe guidance"""
     
-    # Patterns that indicate approval-seeking or decision-making requests
+    # Patterns that indicate approval-seeking or decision-making requests, as (category, pattern)
     UNSAFE_PATTERNS = [
         # Approval seeking
-        r'\b(can i|may i|is it (ok|okay|safe|fine) (to|if)|should i|am i (allowed|permitted))\b',
-        r'\b(approve|permission|authorize|allow me to)\b',
-        r'\b(skip|bypass|shortcut|ignore|omit)\b.*\b(step|procedure|safety|requirement)\b',
+        ("approval", r'\b(can i|may i|is it (ok|okay|safe|fine) (to|if)|should i|am i (allowed|permitted))\b'),
+        ("approval", r'\b(approve|permission|authorize|allow me to)\b'),
+        ("approval", r'\b(skip|bypass|shortcut|ignore|omit)\b.*\b(step|procedure|safety|requirement)\b'),
         
         # Decision making
-        r'\b(what should i do|tell me what to do|what action|decide for me)\b',
-        r'\b(is (this|it|that) (safe|correct|right|compliant))\b',
-        r'\b(validate|verify|confirm|certify) (my|this|that)\b',
+        ("decision", r'\b(what should i do|tell me what to do|what action|decide for me)\b'),
+        ("decision", r'\b(is (this|it|that) (safe|correct|right|compliant))\b'),
+        ("decision", r'\b(validate|verify|confirm|certify) (my|this|that)\b'),
         
         # Real-time operational guidance
-        r'\b(right now|currently|at the moment|immediately)\b.*\b(do|start|begin|proceed)\b',
-        r'\b(emergency|urgent|quickly|asap)\b.*\b(what (to|should)|how (to|do))\b',
+        ("realtime", r'\b(right now|currently|at the moment|immediately)\b.*\b(do|start|begin|proceed)\b'),
+        ("realtime", r'\b(emergency|urgent|quickly|asap)\b.*\b(what (to|should)|how (to|do))\b'),
         
         # Replacing supervision
-        r'\b(instead of (supervisor|manager|safety officer)|without (approval|permission))\b',
-        r'\b(don\'t (have|need)|without) (supervisor|manager|safety officer)\b',
+        ("supervision", r'\b(instead of (supervisor|manager|safety officer)|without (approval|permission))\b'),
+        ("supervision", r'\b(don\'t (have|need)|without) (supervisor|manager|safety officer)\b'),
     ]
     
+    # Compiled once; scans a query in a single pass
+    UNSAFE_RULES = CompiledRuleSet(UNSAFE_PATTERNS)
+    
     # Patterns that indicate explanation requests (SAFE)
     SAFE_PATTERNS = [
         r'\b(what (is|are|does|means)|explain|describe|tell me about)\b',
@@ -45,16 +55,23 @@ class SafetyFilter:
         Returns:
             Tuple[bool, str]: (is_safe, reason)
         """
-        query_lower = query.lower()
-        
-        # Check for unsafe patterns
-        for pattern in cls.UNSAFE_PATTERNS:
-            if re.search(pattern, query_lower):
-                return False, cls._get_refusal_message(pattern)
+        # Check for unsafe patterns; the first rule in list order picks the refusal
+        started = time.perf_counter()
+        rule = cls.UNSAFE_RULES.first_rule(query)
+        SAFETY_FILTER_SECONDS.observe(time.perf_counter() - started)
+        if rule is not None:
+            SAFETY_FILTER_RESULTS.inc("refused")
+            return False, cls._get_refusal_message(cls.UNSAFE_PATTERNS[rule][1])
         
         # Query is safe
+        SAFETY_FILTER_RESULTS.inc("allowed")
         return True, ""
     
+    @classmethod
+    def scan(cls, query: str) -> List[RuleMatch]:
+        """Every unsafe rule the query matches, with category and span"""
+        return cls.UNSAFE_RULES.scan(query)
+    
     @classmethod
     def _get_refusal_message(cls, pattern: str) -> str:
         """Generate appropriate refusal message based on detected pattern"""
@@ -1,7 +1,25 @@
 """SOP data management - supports both uploaded documents and sample data for demo"""
 
-# For demonstration/testing purposes only
-# In production, this would be replaced with a document database
+import asyncio
+import logging
+import threading
+from typing import List, Optional
+
+try:
+    from config import settings
+    from semantic_cache import QuestionEmbedder, build_embedding_batcher, embed_question
+    from sop_index import SOPIndex, estimate_tokens
+    from sop_store import SOPStore
+except ImportError:
+    from app.config import settings
+    from app.semantic_cache import QuestionEmbedder, build_embedding_batcher, embed_question
+    from app.sop_index import SOPIndex, estimate_tokens
+    from app.sop_store import SOPStore
+
+logger = logging.getLogger(__name__)
+
+# Built-in demo SOP for demonstration/testing purposes; uploaded SOPs are
+# stored in the documents table
 SAMPLE_SOPS = {
     "demo_loto": {
         "title": "LOTO Procedure (Demo)",
@@ -10,38 +28,186 @@ This is a representative example of a Lockout/Tagout procedure.
 In production, this would be replaced with your facility's actual SOP documents.
 
 This document covers the fundamental safety concepts and rationale behind energy control procedures used to protect workers from hazardous energy during maintenance and servicing activities.
-"""
+""",
+        # Frequently asked questions, pre-answered by the cache warm-up job
+        "faq": [
+            "What is the purpose of lockout/tagout?",
+            "Why is LOTO important?",
+            "What is hazardous energy?",
+            "Who is considered an authorized employee under LOTO?"
+        ]
     }
 }
 
+# Chunk-level BM25 index over the built-in SOPs and the uploaded ones in memory
+SOP_INDEX = SOPIndex()
+for _sop_id, _sop in SAMPLE_SOPS.items():
+    SOP_INDEX.add_document(_sop_id, _sop["content"])
+
+# Uploaded SOPs, read through an LRU that also keeps SOP_INDEX in step
+SOP_STORE = SOPStore(SAMPLE_SOPS, SOP_INDEX)
+
+# Optional chunk embeddings, persisted in a memory-mapped EmbeddingStore and
+# searched through an in-memory EmbeddingIndex loaded from it
+_chunk_embedder = None  # (EmbeddingsService, EmbeddingStore) once enabled
+_chunk_vectors = None  # EmbeddingIndex over the store's live rows
+# Question embeddings go through the app's shared EmbeddingBatcher
+_query_batcher = None
+# Chunk embedding and vector search both run in worker threads
+_vector_lock = threading.Lock()
+
+
+async def get_sop_list():
+    """Return list of available SOPs: the built-in ones, then uploads"""
+    return await SOP_STORE.list()
+
+
+async def get_sop_content(sop_id: str) -> str:
+    """Get content of specific SOP ("" for an unknown id)"""
+    sop = await SOP_STORE.get(sop_id)
+    return sop["content"] if sop is not None else ""
+
+
+def get_sop_version(sop_id: str) -> Optional[str]:
+    """
+    "<sop id>@<content version>" of an SOP loaded by get_sop_content/get_sop_context,
+    identifying the text answers were grounded in (None if it is not loaded)
+    """
+    version = SOP_INDEX.version(sop_id)
+    return f"{sop_id}@{version}" if version is not None else None
+
 
-def get_sop_list():
+def get_sop_faq(sop_id: str) -> List[str]:
+    """Frequently asked questions for an SOP (empty if none are listed)"""
+    return list(SAMPLE_SOPS.get(sop_id, {}).get("faq", []))
+
+
+async def get_sop_context(
+    sop_id: str,
+    question: str,
+    token_budget: Optional[int] = None,
+    embed_query: Optional[QuestionEmbedder] = None
+) -> str:
     """
-    Return list of available SOPs.
-    In production, this would query a document database.
+    Get the parts of an SOP relevant to a question, within a token budget.
+    Short SOPs are returned whole; long ones are reduced to their best chunks,
+    ranked by BM25 fused with vector search when chunk embeddings are enabled.
+    `embed_query` is the request's shared embedding of `question`, so the
+    semantic cache lookup that follows does not embed it again.
     """
-    return [
-        {"id": key, "title": sop["title"]} 
-        for key, sop in SAMPLE_SOPS.items()
-    ]
+    content = await get_sop_content(sop_id)
+    if not content:
+        return ""
+    
+    budget = token_budget if token_budget is not None else settings.SOP_CONTEXT_TOKEN_BUDGET
+    if estimate_tokens(content) <= budget:
+        return content
+    
+    vector_positions = await _vector_ranking(sop_id, question, embed_query)
+    return SOP_INDEX.build_context(
+        question, sop_id, budget, k=settings.SOP_RETRIEVAL_TOP_K, vector_positions=vector_positions
+    )
+
+
+async def _vector_ranking(
+    sop_id: str,
+    question: str,
+    embed_query: Optional[QuestionEmbedder] = None
+) -> Optional[List[int]]:
+    """Positions of the SOP's chunks nearest to the question, or None without usable vectors"""
+    version = SOP_INDEX.version(sop_id)
+    if _chunk_embedder is None or _chunk_vectors is None or version is None:
+        return None
+
+    def search(query):
+        with _vector_lock:
+            return _chunk_vectors.search(query, k=settings.SOP_RETRIEVAL_TOP_K, groups=[sop_id])[0]
+
+    try:
+        if embed_query is not None:
+            query = await embed_query()
+        else:
+            query = await embed_question(_query_batcher, question)
+        hits = await asyncio.to_thread(search, query)
+    except Exception as e:
+        # BM25 alone still answers
+        logger.warning(f"Vector search over {sop_id} failed: {str(e)}")
+        return None
+
+    positions = []
+    for item_id, _ in hits:
+        _, chunk_version, position = item_id.rsplit(":", 2)
+        # Vectors of an older text (e.g. re-uploaded on another worker) do not line up
+        if chunk_version == version:
+            positions.append(int(position))
+    return positions
 
 
-def get_sop_content(sop_id: str) -> str:
+async def add_uploaded_sop(
+    sop_id: str,
+    title: str,
+    content: str,
+    chunks: Optional[List[str]] = None,
+    embed: bool = True
+):
     """
-    Get content of specific SOP.
-    In production, this would retrieve from document storage.
+    Add (or replace) an uploaded SOP document.
+    `chunks` may carry a chunking already done elsewhere (e.g. by the ingestion
+    workers); `embed=False` leaves chunk embedding to the caller.
     """
-    if sop_id in SAMPLE_SOPS:
-        return SAMPLE_SOPS[sop_id]["content"]
-    return ""
+    await SOP_STORE.put(sop_id, title, content, chunks=chunks)
+    if embed:
+        await embed_sop(sop_id)
 
 
-def add_uploaded_sop(sop_id: str, title: str, content: str):
+async def enable_chunk_embeddings(embeddings_service, store, batcher=None):
     """
-    Add an uploaded SOP document.
-    In production, this would store in a database with vector embeddings.
+    Load the stored chunk vectors for retrieval, embed every SOP's chunks into
+    `store` and keep both updated on upload. SOPs whose current content is
+    already in the store are not re-embedded, so restarts only map the file.
+    Questions are embedded through `batcher`, the app's shared EmbeddingBatcher.
     """
-    SAMPLE_SOPS[sop_id] = {
-        "title": title,
-        "content": content
-    }
+    global _chunk_embedder, _chunk_vectors, _query_batcher
+    _chunk_embedder = (embeddings_service, store)
+    _query_batcher = batcher if batcher is not None else build_embedding_batcher(embeddings_service)
+    index = await asyncio.to_thread(store.load_index)
+    with _vector_lock:
+        _chunk_vectors = index
+    for sop in await get_sop_list():
+        # Loads the body into the cache and SOP_INDEX, where the chunks come from
+        if await get_sop_content(sop["id"]):
+            await embed_sop(sop["id"])
+
+
+async def embed_sop(sop_id: str):
+    """Embed one indexed SOP's chunks; a no-op unless chunk embeddings are enabled"""
+    version = SOP_INDEX.version(sop_id)
+    if _chunk_embedder is None or version is None:
+        return
+    # Snapshot here, on the loop that mutates SOP_INDEX; the thread only sees these texts
+    texts = [chunk.text for chunk in SOP_INDEX.chunks(sop_id)]
+    await asyncio.to_thread(embed_sop_chunks, sop_id, version, texts)
+
+
+def embed_sop_chunks(sop_id: str, version: str, texts: List[str]):
+    """Embed a snapshot of one SOP's chunk texts into the store and the search index"""
+    global _chunk_vectors
+    embeddings_service, store = _chunk_embedder
+    ids = [f"{sop_id}:{version}:{position}" for position in range(len(texts))]
+    if ids and all(chunk_id in store for chunk_id in ids):
+        return
+
+    # Old versions become tombstones; compaction reclaims their rows
+    store.delete_group(sop_id)
+    vectors = embeddings_service.generate_embeddings(texts) if texts else None
+    if vectors is not None:
+        store.append(ids, vectors, group=sop_id)
+
+    with _vector_lock:
+        if _chunk_vectors is None:
+            # The store was empty when embeddings were enabled
+            _chunk_vectors = store.load_index()
+            return
+        _chunk_vectors.remove_group(sop_id)
+        if vectors is not None:
+            _chunk_vectors.add(ids, vectors, group=sop_id)
@@ -0,0 +1,129 @@
+"""Local compliance sanitizer: fix small violations without a second model call"""
+
+import re
+from typing import List, Optional, Tuple
+
+try:
+    from config import settings
+    from matcher import CompiledRuleSet
+except ImportError:
+    from app.config import settings
+    from app.matcher import CompiledRuleSet
+
+# Sentence boundary: terminal punctuation (plus closing quotes/brackets) and
+# the whitespace after it, or a run of newlines (list items, paragraphs).
+# "1." style list numbers are not boundaries.
+_SENTENCE_END = re.compile(r"(?<=[.!?])(?<!\d\.)[\"')\]]*[ \t]*\n*|\n+")
+
+# Conceptual rewordings for common instructional phrasings, as (pattern, replacement).
+# A sentence is only kept if it scans clean after these substitutions.
+CONCEPTUAL_PHRASES = [
+    (r"\byou\s+(?:should|must|need to)\s+(?:verify|check|test|inspect)\b", "it is important to confirm"),
+    (r"\byou\s+(?:should|must|need to)\s+(?:isolate|disconnect)\b", "the intent is to separate"),
+]
+
+
+def sentence_spans(text: str) -> List[Tuple[int, int]]:
+    """(start, end) spans that tile `text`; each includes its trailing whitespace"""
+    spans, start = [], 0
+    for match in _SENTENCE_END.finditer(text):
+        if match.end() > start:
+            spans.append((start, match.end()))
+            start = match.end()
+    if start < len(text):
+        spans.append((start, len(text)))
+    return spans
+
+
+def _tidy(text: str) -> str:
+    text = re.sub(r"[ \t]+\n", "\n", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+class ComplianceSanitizer:
+    """
+    Rephrase or drop the sentences that contain rule matches.
+
+    Offending sentences are first run through CONCEPTUAL_PHRASES; if a
+    sentence still matches it is removed. The result is rescanned, and
+    sanitize() returns None (escalate to a model rewrite) when anything
+    still matches or less than `min_retained` of the text survives.
+    """
+
+    def __init__(self, rules: CompiledRuleSet, min_retained: Optional[float] = None):
+        self.rules = rules
+        self.min_retained = min_retained if min_retained is not None else settings.LOCAL_SANITIZER_MIN_RETAINED
+        self._phrases = [(re.compile(pattern, re.IGNORECASE), replacement) for pattern, replacement in CONCEPTUAL_PHRASES]
+
+        self.attempts = 0
+        self.accepted = 0
+        self.escalated = 0
+        self.sentences_rephrased = 0
+        self.sentences_dropped = 0
+
+    def _rephrase(self, sentence: str) -> Optional[str]:
+        rephrased = sentence
+        for pattern, replacement in self._phrases:
+            rephrased = pattern.sub(replacement, rephrased)
+        if rephrased == sentence or self.rules.scan(rephrased):
+            return None
+        # Keep sentence-initial capitalization
+        stripped = rephrased.lstrip()
+        offset = len(rephrased) - len(stripped)
+        if stripped and sentence.lstrip()[:1].isupper():
+            rephrased = rephrased[:offset] + stripped[0].upper() + stripped[1:]
+        return rephrased
+
+    def sanitize(self, text: str) -> Optional[str]:
+        """Compliant version of `text`, or None if a model rewrite is needed"""
+        self.attempts += 1
+        matches = self.rules.scan(text)
+        if not matches:
+            self.accepted += 1
+            return text
+
+        spans = sentence_spans(text)
+        flagged = set()
+        for match in matches:
+            for i, (start, end) in enumerate(spans):
+                if start < match.end and match.start < end:
+                    flagged.add(i)
+
+        pieces, rephrased, dropped = [], 0, 0
+        for i, (start, end) in enumerate(spans):
+            sentence = text[start:end]
+            if i not in flagged:
+                pieces.append(sentence)
+                continue
+            replacement = self._rephrase(sentence)
+            if replacement is not None:
+                pieces.append(replacement)
+                rephrased += 1
+            else:
+                # Keep paragraph and list breaks that followed the sentence
+                pieces.append("\n" * min(sentence.count("\n"), 2) if sentence.endswith("\n") else "")
+                dropped += 1
+
+        result = _tidy("".join(pieces))
+        original = text.strip()
+        retained = len(result) / len(original) if original else 0.0
+
+        if not result or retained < self.min_retained or self.rules.scan(result):
+            self.escalated += 1
+            return None
+
+        self.accepted += 1
+        self.sentences_rephrased += rephrased
+        self.sentences_dropped += dropped
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "attempts": self.attempts,
+            "accepted": self.accepted,
+            "escalated": self.escalated,
+            "sentences_rephrased": self.sentences_rephrased,
+            "sentences_dropped": self.sentences_dropped,
+            "min_retained": self.min_retained,
+        }
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional
 
 class Document(BaseModel):
@@ -6,4 +6,21 @@ class Document(BaseModel):
     title: str
     content: str
     created_at: Optional[str]
-    updated_at: Optional[str]
\ No newline at end of file
+    updated_at: Optional[str]
+
+class DocumentCreate(BaseModel):
+    title: str
+    content: str
+
+class DocumentUpdate(BaseModel):
+    title: Optional[str] = None
+    content: Optional[str] = None
+
+class DocumentResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    title: str
+    content: str
+    created_at: int
+    updated_at: int
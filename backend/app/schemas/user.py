@@ -13,4 +13,7 @@ class User(UserBase):
     is_active: bool = True
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class UserOut(UserBase):
+    pass
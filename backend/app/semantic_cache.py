@@ -0,0 +1,198 @@
+"""Semantic answer cache: serve cached answers for paraphrased questions"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+import numpy as np
+
+try:
+    from config import settings
+    from response_cache import normalize_question, prompt_fingerprint, content_hash
+    from services.embeddings_service import EmbeddingBatcher, EmbeddingIndex, EmbeddingsService
+except ImportError:
+    from app.config import settings
+    from app.response_cache import normalize_question, prompt_fingerprint, content_hash
+    from app.services.embeddings_service import EmbeddingBatcher, EmbeddingIndex, EmbeddingsService
+
+logger = logging.getLogger(__name__)
+
+# A request's question embedding, computed on first call and shared after that
+QuestionEmbedder = Callable[[], Awaitable[np.ndarray]]
+
+
+def build_embedding_batcher(embeddings_service: Optional[EmbeddingsService]) -> Optional[EmbeddingBatcher]:
+    """The micro-batcher every question embedding goes through, or None without a model"""
+    if embeddings_service is None:
+        return None
+    return EmbeddingBatcher(
+        embeddings_service,
+        max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+        max_wait_ms=settings.EMBEDDING_BATCH_MAX_WAIT_MS
+    )
+
+
+async def embed_question(batcher: EmbeddingBatcher, question: str) -> np.ndarray:
+    """Embed one question (micro-batched with concurrent ones) and L2-normalize it"""
+    vector = await batcher.embed(normalize_question(question))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def question_embedder(batcher: Optional[EmbeddingBatcher], question: str) -> Optional[QuestionEmbedder]:
+    """
+    Embed `question` at most once per request: SOP retrieval and the semantic
+    cache lookup both await the returned function, and only the first call
+    reaches the model.
+    """
+    if batcher is None:
+        return None
+    embedding: Optional[asyncio.Future] = None
+
+    async def embed() -> np.ndarray:
+        nonlocal embedding
+        if embedding is None:
+            embedding = asyncio.ensure_future(embed_question(batcher, question))
+        return await asyncio.shield(embedding)
+
+    return embed
+
+
+class SemanticCache:
+    """
+    Nearest-neighbour cache over question embeddings.
+
+    Entries live in an EmbeddingIndex grouped by partition (SOP id and content
+    version + prompt version), so a lookup is a single top-1 search masked to
+    the caller's partition. When full, the least recently used entry is evicted.
+    """
+
+    def __init__(
+        self,
+        embeddings_service,
+        threshold: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        batcher: Optional[EmbeddingBatcher] = None,
+    ):
+        self.embeddings_service = embeddings_service
+        # Shared with SOP retrieval when the app passes its batcher in
+        self.batcher = batcher if batcher is not None else build_embedding_batcher(embeddings_service)
+        self.threshold = threshold if threshold is not None else settings.SEMANTIC_CACHE_THRESHOLD
+        self.max_entries = max_entries if max_entries is not None else settings.SEMANTIC_CACHE_MAX_ENTRIES
+
+        self._index: Optional[EmbeddingIndex] = None  # created on first add, once the dimension is known
+        self._answers: "OrderedDict[int, dict]" = OrderedDict()  # LRU order, oldest first
+        self._next_id = 0
+
+        self.lookups = 0
+        self.hits = 0
+        self.evictions = 0
+        self.lookup_seconds = 0.0
+        self.upstream_seconds = 0.0
+        self.upstream_calls = 0
+
+    @staticmethod
+    def partition_key(
+        sop_context: Optional[str],
+        model: str,
+        system_prompt: str,
+        sop_version: Optional[str] = None,
+    ) -> str:
+        """
+        Partition by the SOP the context came from, not the retrieved text:
+        paraphrases of one question often retrieve different sections of a
+        long SOP and must still land in the same partition. Callers without
+        an SOP version fall back to hashing the context itself.
+        """
+        if sop_version:
+            sop_key = sop_version
+        else:
+            sop_key = content_hash(sop_context) if sop_context else "-"
+        return f"{sop_key}:{prompt_fingerprint(model, system_prompt)}"
+
+    async def embed(self, question: str) -> np.ndarray:
+        return await embed_question(self.batcher, question)
+
+    async def lookup(
+        self,
+        question: str,
+        partition: str,
+        embed_query: Optional[QuestionEmbedder] = None,
+    ) -> tuple[Optional[dict], np.ndarray]:
+        """
+        Find the closest cached question in the same partition.
+
+        Returns (cached answer or None, query embedding); the embedding is
+        handed back so a miss can be stored without embedding twice.
+        `embed_query` supplies an embedding the request already computed.
+        """
+        start = time.perf_counter()
+        embedding = await embed_query() if embed_query is not None else await self.embed(question)
+
+        result = None
+        if self._index is not None:
+            best = self._index.search(embedding, k=1, groups=[partition])[0]
+            if best and best[0][1] >= self.threshold:
+                entry_id, similarity = best[0]
+                self._answers.move_to_end(entry_id)
+                result = dict(self._answers[entry_id], similarity=similarity)
+
+        self.lookups += 1
+        self.lookup_seconds += time.perf_counter() - start
+        if result is not None:
+            self.hits += 1
+        return result, embedding
+
+    def add(self, embedding: np.ndarray, partition: str, question: str, response: str, rewritten: bool = False):
+        if self._index is None:
+            self._index = EmbeddingIndex(embedding.shape[0], initial_capacity=min(self.max_entries, 1024))
+
+        while len(self._answers) >= self.max_entries:
+            oldest, _ = self._answers.popitem(last=False)
+            self._index.remove(oldest)
+            self.evictions += 1
+
+        entry_id = self._next_id
+        self._next_id += 1
+        self._index.add([entry_id], embedding, group=partition)
+        self._answers[entry_id] = {"question": question, "response": response, "rewritten": rewritten}
+
+    def record_upstream(self, seconds: float):
+        """Latency of a generation that missed the cache (used to estimate savings)"""
+        self.upstream_calls += 1
+        self.upstream_seconds += seconds
+
+    def clear(self):
+        self._index = None
+        self._answers.clear()
+
+    def stats(self) -> dict:
+        avg_lookup_ms = self.lookup_seconds / self.lookups * 1000 if self.lookups else 0.0
+        avg_upstream_ms = self.upstream_seconds / self.upstream_calls * 1000 if self.upstream_calls else 0.0
+        return {
+            "entries": len(self._answers),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+            "evictions": self.evictions,
+            "avg_lookup_ms": round(avg_lookup_ms, 3),
+            "avg_upstream_ms": round(avg_upstream_ms, 3),
+            # Each hit avoids one upstream generation but every lookup pays the embedding cost
+            "estimated_saved_ms": round(self.hits * avg_upstream_ms - self.lookup_seconds * 1000, 3),
+            "embedding_batches": self.batcher.stats(),
+        }
+
+
+def build_semantic_cache(
+    embeddings_service: Optional[EmbeddingsService],
+    batcher: Optional[EmbeddingBatcher] = None,
+) -> Optional[SemanticCache]:
+    """Create the cache from settings, or None if the embedding model is unavailable"""
+    if embeddings_service is None:
+        logger.warning("Semantic cache enabled but no embedding model is available; disabling it")
+        return None
+    return SemanticCache(embeddings_service, batcher=batcher)
@@ -1,30 +1,30 @@
+import asyncio
 from fastapi import HTTPException, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.database import get_db
-from app.models.user import User
+from app.db.repositories.user_repository import UserRepository
 from app.schemas.user import UserCreate, UserOut
 from app.core.security import hash_password, verify_password
 
 class AuthService:
-    def __init__(self, db: Session):
-        self.db = db
+    def __init__(self, db: AsyncSession):
+        self.users = UserRepository(db)
 
-    def register_user(self, user: UserCreate) -> UserOut:
-        db_user = self.db.query(User).filter(User.email == user.email).first()
-        if db_user:
+    async def register_user(self, user: UserCreate) -> UserOut:
+        if await self.users.get_user_by_username(user.username):
+            raise HTTPException(status_code=400, detail="Username already registered")
+        if await self.users.get_user_by_email(user.email):
             raise HTTPException(status_code=400, detail="Email already registered")
-        hashed_password = hash_password(user.password)
-        new_user = User(email=user.email, password=hashed_password)
-        self.db.add(new_user)
-        self.db.commit()
-        self.db.refresh(new_user)
-        return UserOut(email=new_user.email)
+        # Key stretching is deliberately slow; keep it off the event loop
+        hashed_password = await asyncio.to_thread(hash_password, user.password)
+        new_user = await self.users.create_user(user, hashed_password)
+        return UserOut(username=new_user.username, email=new_user.email)
 
-    def authenticate_user(self, email: str, password: str) -> UserOut:
-        user = self.db.query(User).filter(User.email == email).first()
-        if not user or not verify_password(password, user.password):
+    async def authenticate_user(self, username: str, password: str) -> UserOut:
+        user = await self.users.get_user_by_username(username)
+        if not user or not await asyncio.to_thread(verify_password, password, user.hashed_password):
             raise HTTPException(status_code=401, detail="Invalid credentials")
-        return UserOut(email=user.email)
+        return UserOut(username=user.username, email=user.email)
 
-def get_auth_service(db: Session = Depends(get_db)) -> AuthService:
-    return AuthService(db)
\ No newline at end of file
+async def get_auth_service(db: AsyncSession = Depends(get_db)) -> AuthService:
+    return AuthService(db)
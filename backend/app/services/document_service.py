@@ -1,5 +1,7 @@
 from typing import List
-from fastapi import HTTPException
+from fastapi import Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..db.database import get_db
 from ..db.repositories.document_repository import DocumentRepository
 from ..models.document import Document
 from ..schemas.document import DocumentCreate, DocumentUpdate
@@ -32,4 +34,7 @@ class DocumentService:
     async def delete_document(self, document_id: int) -> None:
         success = await self.document_repository.delete(document_id)
         if not success:
-            raise HTTPException(status_code=404, detail="Document not found")
\ No newline at end of file
+            raise HTTPException(status_code=404, detail="Document not found")
+
+async def get_document_service(db: AsyncSession = Depends(get_db)) -> DocumentService:
+    return DocumentService(DocumentRepository(db))
@@ -0,0 +1,263 @@
+"""
+Memory-mapped, append-only on-disk store for embedding vectors.
+
+Layout of a store directory:
+    meta.json             {"dim": ..., "generation": ...}
+    vectors.<gen>.f32     raw float32 rows, appended in place
+    ids.<gen>.jsonl       sidecar log: {"id", "group", "row"} or {"deleted": id}
+
+Vectors are written before their sidecar records, so readers never reference
+a half-written row. Every worker maps the same file read-only, so the OS page
+cache holds one copy regardless of worker count. compact() rewrites only the
+live rows into a new generation and switches meta.json atomically.
+
+Usage (from the backend directory):
+    python -m app.services.embedding_store stats   --path data/embeddings
+    python -m app.services.embedding_store compact --path data/embeddings
+"""
+
+import argparse
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-writer deployments only
+    fcntl = None
+
+try:
+    from services.embeddings_service import EmbeddingIndex
+except ImportError:
+    from app.services.embeddings_service import EmbeddingIndex
+
+
+class EmbeddingStore:
+    def __init__(self, path: str, dim: Optional[int] = None):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self.generation = 0
+
+        self._live: Dict[str, Tuple[int, Optional[str]]] = {}  # id -> (row, group)
+        self._rows = 0
+        self._sidecar_offset = 0
+        self._vectors: Optional[np.memmap] = None
+
+        meta = self._read_meta()
+        if meta is None:
+            if dim is not None:
+                self._write_meta(dim, 0)
+        else:
+            if dim is not None and meta["dim"] != dim:
+                raise ValueError(f"store at {path} holds dimension {meta['dim']}, not {dim}")
+            self.dim = meta["dim"]
+        self.refresh()
+
+    # -- files ---------------------------------------------------------------
+
+    def _meta_path(self) -> Path:
+        return self.path / "meta.json"
+
+    def _vectors_path(self, generation: Optional[int] = None) -> Path:
+        return self.path / f"vectors.{self.generation if generation is None else generation}.f32"
+
+    def _sidecar_path(self, generation: Optional[int] = None) -> Path:
+        return self.path / f"ids.{self.generation if generation is None else generation}.jsonl"
+
+    def _read_meta(self) -> Optional[dict]:
+        try:
+            return json.loads(self._meta_path().read_text())
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self, dim: int, generation: int):
+        tmp = self.path / "meta.json.tmp"
+        tmp.write_text(json.dumps({"dim": dim, "generation": generation}))
+        os.replace(tmp, self._meta_path())
+
+    @contextmanager
+    def _write_lock(self):
+        """Serialize writers across worker processes"""
+        with open(self.path / ".lock", "a+") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # -- reading -------------------------------------------------------------
+
+    def refresh(self):
+        """Pick up rows appended (or a compaction done) by other workers"""
+        meta = self._read_meta()
+        if meta is None:
+            return
+        self.dim = meta["dim"]
+        if meta["generation"] != self.generation:
+            self.generation = meta["generation"]
+            self._live.clear()
+            self._rows = 0
+            self._sidecar_offset = 0
+            self._vectors = None
+
+        sidecar = self._sidecar_path()
+        if sidecar.exists() and sidecar.stat().st_size > self._sidecar_offset:
+            with open(sidecar, "rb") as f:
+                f.seek(self._sidecar_offset)
+                for raw in f:
+                    if not raw.endswith(b"\n"):
+                        break  # a writer is mid-line; pick it up next time
+                    self._sidecar_offset += len(raw)
+                    self._apply(json.loads(raw))
+
+        if self._vectors is None or self._vectors.shape[0] < self._rows:
+            self._vectors = self._map(self._rows)
+
+    def _apply(self, record: dict):
+        if "deleted" in record:
+            self._live.pop(record["deleted"], None)
+            return
+        self._live[record["id"]] = (record["row"], record.get("group"))
+        self._rows = max(self._rows, record["row"] + 1)
+
+    def _map(self, rows: int) -> Optional[np.memmap]:
+        if rows == 0:
+            return None
+        return np.memmap(self._vectors_path(), dtype=np.float32, mode="r", shape=(rows, self.dim))
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._live
+
+    def groups(self) -> set:
+        return {group for _, group in self._live.values()}
+
+    def get(self, item_id: str) -> Optional[np.ndarray]:
+        entry = self._live.get(item_id)
+        if entry is None:
+            return None
+        return np.array(self._vectors[entry[0]])
+
+    def load_index(self, initial_capacity: int = 1024) -> Optional[EmbeddingIndex]:
+        """Build an in-memory EmbeddingIndex from the mapped vectors (no re-embedding)"""
+        if self.dim is None:
+            return None
+        index = EmbeddingIndex(self.dim, initial_capacity=max(initial_capacity, len(self._live)))
+        by_group: Dict[Optional[str], List[Tuple[str, int]]] = {}
+        for item_id, (row, group) in self._live.items():
+            by_group.setdefault(group, []).append((item_id, row))
+        for group, items in by_group.items():
+            rows = [row for _, row in items]
+            index.add([item_id for item_id, _ in items], self._vectors[rows], group=group)
+        return index
+
+    # -- writing -------------------------------------------------------------
+
+    def append(self, ids: Sequence[str], vectors: np.ndarray, group: Optional[str] = None):
+        """Append vectors to the end of the file; re-appending an id supersedes it"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        if len(ids) != vectors.shape[0]:
+            raise ValueError("ids and vectors must have the same length")
+
+        with self._write_lock():
+            if self.dim is None:
+                if self._read_meta() is None:
+                    self._write_meta(vectors.shape[1], 0)
+            self.refresh()
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"expected vectors of dimension {self.dim}, got {vectors.shape[1]}")
+
+            vectors_path = self._vectors_path()
+            first_row = vectors_path.stat().st_size // (4 * self.dim) if vectors_path.exists() else 0
+            with open(vectors_path, "ab") as f:
+                f.write(vectors.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            with open(self._sidecar_path(), "a") as f:
+                for offset, item_id in enumerate(ids):
+                    f.write(json.dumps({"id": item_id, "group": group, "row": first_row + offset}) + "\n")
+
+            self.refresh()
+
+    def delete(self, ids: Sequence[str]) -> int:
+        with self._write_lock():
+            self.refresh()
+            doomed = [item_id for item_id in ids if item_id in self._live]
+            if doomed:
+                with open(self._sidecar_path(), "a") as f:
+                    for item_id in doomed:
+                        f.write(json.dumps({"deleted": item_id}) + "\n")
+                self.refresh()
+            return len(doomed)
+
+    def delete_group(self, group: str) -> int:
+        return self.delete([item_id for item_id, (_, g) in self._live.items() if g == group])
+
+    def compact(self) -> dict:
+        """Rewrite only live rows into a new generation and drop the old files"""
+        with self._write_lock():
+            self.refresh()
+            before = self._rows
+            old_generation = self.generation
+            new_generation = old_generation + 1
+
+            items = sorted(self._live.items(), key=lambda item: item[1][0])
+            with open(self._vectors_path(new_generation), "wb") as vf, \
+                    open(self._sidecar_path(new_generation), "w") as sf:
+                for new_row, (item_id, (row, group)) in enumerate(items):
+                    vf.write(np.ascontiguousarray(self._vectors[row]).tobytes())
+                    sf.write(json.dumps({"id": item_id, "group": group, "row": new_row}) + "\n")
+                vf.flush()
+                os.fsync(vf.fileno())
+
+            if self.dim is not None:
+                self._write_meta(self.dim, new_generation)
+            self._vectors = None
+            self.refresh()
+
+            for old in (self._vectors_path(old_generation), self._sidecar_path(old_generation)):
+                try:
+                    old.unlink()
+                except OSError:
+                    pass  # still mapped elsewhere on platforms that forbid unlinking
+
+            return {"rows_before": before, "rows_after": self._rows, "reclaimed_rows": before - self._rows}
+
+    def stats(self) -> dict:
+        return {
+            "path": str(self.path),
+            "dim": self.dim,
+            "generation": self.generation,
+            "live": len(self._live),
+            "rows": self._rows,
+            "dead_rows": self._rows - len(self._live),
+            "bytes": self._rows * 4 * (self.dim or 0),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding store maintenance")
+    parser.add_argument("command", choices=["stats", "compact"])
+    parser.add_argument("--path", required=True, help="store directory")
+    args = parser.parse_args()
+
+    store = EmbeddingStore(args.path)
+    if args.command == "compact":
+        print(json.dumps(store.compact()))
+    print(json.dumps(store.stats()))
+
+
+if __name__ == "__main__":
+    main()
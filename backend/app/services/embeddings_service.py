@@ -1,7 +1,11 @@
-from typing import List
-from sklearn.metrics.pairwise import cosine_similarity
+from concurrent.futures import ThreadPoolExecutor
+from typing import Hashable, Iterable, List, Optional, Sequence, Tuple
+import asyncio
+import logging
 import numpy as np
 
+logger = logging.getLogger(__name__)
+
 class EmbeddingsService:
     def __init__(self, embedding_model):
         self.embedding_model = embedding_model
@@ -10,4 +14,291 @@ class EmbeddingsService:
         return self.embedding_model.encode(texts)
 
     def calculate_similarity(self, embedding1: np.ndarray, embedding2: np.ndarray) -> float:
-        return cosine_similarity([embedding1], [embedding2])[0][0]
\ No newline at end of file
+        from sklearn.metrics.pairwise import cosine_similarity
+        return cosine_similarity([embedding1], [embedding2])[0][0]
+
+
+class EmbeddingBatcher:
+    """
+    Async micro-batcher in front of EmbeddingsService.
+
+    Concurrent embed() calls are queued and encoded together: a batch is sent
+    once it holds max_batch_size texts or max_wait_ms has passed since the
+    first text arrived. Batches run one at a time on a dedicated worker
+    thread, so texts that arrive during an encode form the next batch.
+    """
+
+    def __init__(self, embeddings_service: EmbeddingsService, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.embeddings_service = embeddings_service
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed-batch")
+
+        self.batches = 0
+        self.items = 0
+        self.full_batches = 0
+        self.largest_batch = 0
+        self.encode_seconds = 0.0
+
+    async def embed(self, text: str) -> np.ndarray:
+        return (await self.embed_many([text]))[0]
+
+    async def embed_many(self, texts: Sequence[str]) -> List[np.ndarray]:
+        loop = asyncio.get_running_loop()
+        self._ensure_worker(loop)
+        futures = [loop.create_future() for _ in texts]
+        self._pending.extend(zip(texts, futures))
+        self._wakeup.set()
+        return list(await asyncio.gather(*futures))
+
+    def _ensure_worker(self, loop: asyncio.AbstractEventLoop):
+        if self._worker is not None and not self._worker.done() and self._worker.get_loop() is loop:
+            return
+        # First use, or the previous event loop has gone away
+        self._pending = [(text, future) for text, future in self._pending if future.get_loop() is loop]
+        self._wakeup = asyncio.Event()
+        self._worker = loop.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            deadline = loop.time() + self.max_wait
+            while len(self._pending) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            batch = [(text, future) for text, future in batch if not future.done()]
+            if batch:
+                await self._encode(loop, batch)
+
+    async def _encode(self, loop: asyncio.AbstractEventLoop, batch: List[Tuple[str, asyncio.Future]]):
+        start = loop.time()
+        try:
+            vectors = await loop.run_in_executor(
+                self._executor, self.embeddings_service.generate_embeddings, [text for text, _ in batch]
+            )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.encode_seconds += loop.time() - start
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+        self.batches += 1
+        self.items += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        if len(batch) == self.max_batch_size:
+            self.full_batches += 1
+
+    def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queued": len(self._pending),
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "full_batches": self.full_batches,
+            "avg_encode_ms": round(self.encode_seconds / self.batches * 1000, 3) if self.batches else 0.0,
+        }
+
+
+def load_embeddings_service(model_name: str) -> Optional[EmbeddingsService]:
+    """Load a sentence-transformers model, or None if the package is not installed"""
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        logger.warning("'sentence-transformers' is not installed; embedding features are disabled")
+        return None
+    return EmbeddingsService(SentenceTransformer(model_name))
+
+
+class EmbeddingIndex:
+    """
+    Exact top-k cosine search over one contiguous float32 matrix.
+
+    Rows are L2-normalized on insert, so similarity is a plain dot product and
+    a batch of queries is answered with a single matmul plus argpartition.
+    Each row may carry a group (e.g. an SOP id) for filtered searches; a
+    group's code is freed with its last row, so churning groups (cache
+    partitions, re-uploaded SOPs) do not accumulate. Storage grows by
+    doubling; removal moves the last row into the freed slot so the live rows
+    always stay contiguous.
+    """
+
+    def __init__(self, dim: int, initial_capacity: int = 1024):
+        self.dim = dim
+        self._matrix = np.zeros((max(1, initial_capacity), dim), dtype=np.float32)
+        self._groups = np.full(max(1, initial_capacity), -1, dtype=np.int32)
+        self._ids: List[Hashable] = []
+        self._rows = {}
+        self._group_codes = {}  # group -> code
+        self._code_groups = {}  # code -> group
+        self._code_rows = {}  # code -> live rows carrying it
+        self._free_codes: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, item_id: Hashable) -> bool:
+        return item_id in self._rows
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _group_code(self, group: Optional[Hashable]) -> int:
+        if group is None:
+            return -1
+        code = self._group_codes.get(group)
+        if code is None:
+            code = self._free_codes.pop() if self._free_codes else len(self._group_codes)
+            self._group_codes[group] = code
+            self._code_groups[code] = group
+            self._code_rows[code] = 0
+        return code
+
+    def _count_row(self, code: int, delta: int):
+        """Track rows per group code, freeing the code when its last row goes"""
+        if code < 0:
+            return
+        self._code_rows[code] += delta
+        if self._code_rows[code] == 0:
+            del self._code_rows[code]
+            del self._group_codes[self._code_groups.pop(code)]
+            self._free_codes.append(code)
+
+    def _reserve(self, rows: int):
+        capacity = self._matrix.shape[0]
+        if rows <= capacity:
+            return
+        while capacity < rows:
+            capacity *= 2
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        matrix[:len(self._ids)] = self._matrix[:len(self._ids)]
+        groups = np.full(capacity, -1, dtype=np.int32)
+        groups[:len(self._ids)] = self._groups[:len(self._ids)]
+        self._matrix, self._groups = matrix, groups
+
+    def add(self, ids: Sequence[Hashable], vectors: np.ndarray, group: Optional[Hashable] = None):
+        """Insert or overwrite rows; all rows in one call share `group`"""
+        vectors = self._normalize(vectors)
+        if len(ids) != vectors.shape[0]:
+            raise ValueError("ids and vectors must have the same length")
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"expected vectors of dimension {self.dim}, got {vectors.shape[1]}")
+
+        if not ids:
+            return
+        code = self._group_code(group)
+        new = [i for i, item_id in enumerate(ids) if item_id not in self._rows]
+        self._reserve(len(self._ids) + len(new))
+
+        for i, item_id in enumerate(ids):
+            row = self._rows.get(item_id)
+            if row is None:
+                row = len(self._ids)
+                self._ids.append(item_id)
+                self._rows[item_id] = row
+            else:
+                self._count_row(int(self._groups[row]), -1)
+            self._matrix[row] = vectors[i]
+            self._groups[row] = code
+            self._count_row(code, 1)
+
+    def remove(self, item_id: Hashable) -> bool:
+        row = self._rows.pop(item_id, None)
+        if row is None:
+            return False
+        self._count_row(int(self._groups[row]), -1)
+        last = len(self._ids) - 1
+        if row != last:
+            moved = self._ids[last]
+            self._matrix[row] = self._matrix[last]
+            self._groups[row] = self._groups[last]
+            self._ids[row] = moved
+            self._rows[moved] = row
+        self._ids.pop()
+        return True
+
+    def remove_group(self, group: Hashable) -> int:
+        code = self._group_codes.get(group)
+        if code is None:
+            return 0
+        doomed = [self._ids[row] for row in np.flatnonzero(self._groups[:len(self._ids)] == code)]
+        for item_id in doomed:
+            self.remove(item_id)
+        return len(doomed)
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int = 5,
+        groups: Optional[Iterable[Hashable]] = None,
+    ) -> List[List[Tuple[Hashable, float]]]:
+        """
+        Top-k (id, cosine similarity) per query, best first.
+
+        `groups` restricts results to rows added with one of those groups.
+        """
+        queries = self._normalize(queries)
+        size = len(self._ids)
+        if size == 0 or k <= 0:
+            return [[] for _ in range(queries.shape[0])]
+
+        scores = queries @ self._matrix[:size].T
+        if groups is not None:
+            codes = [self._group_codes[g] for g in groups if g in self._group_codes]
+            mask = np.isin(self._groups[:size], codes)
+            scores[:, ~mask] = -np.inf
+            size = min(size, int(mask.sum()))
+            if size == 0:
+                return [[] for _ in range(queries.shape[0])]
+
+        k = min(k, size)
+        if k < scores.shape[1]:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(scores.shape[1]), (scores.shape[0], scores.shape[1]))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        return [
+            [(self._ids[row], float(score)) for row, score in zip(rows, row_scores)]
+            for rows, row_scores in zip(top, top_scores)
+        ]
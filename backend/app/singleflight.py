@@ -0,0 +1,47 @@
+"""Single-flight coalescing of identical in-flight async calls"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls that share a key into one execution.
+
+    The first caller for a key starts the work as its own task; callers that
+    arrive while it is running await the same task. The task is shielded, so a
+    caller that disconnects or is cancelled never cancels the work for the
+    others, and any exception it raises is re-raised in every waiter.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.executions = 0
+        self.collapsed = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done, key=key: self._forget(key, done))
+            self.executions += 1
+        else:
+            self.collapsed += 1
+
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        # Mark the exception retrieved even if every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        calls = self.executions + self.collapsed
+        return {
+            "in_flight": len(self._inflight),
+            "executions": self.executions,
+            "collapsed": self.collapsed,
+            "collapse_rate": round(self.collapsed / calls, 4) if calls else 0.0,
+        }
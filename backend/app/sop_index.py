@@ -0,0 +1,262 @@
+"""Section chunking and BM25 retrieval over SOP documents"""
+
+import hashlib
+import math
+import re
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Very common words carry no retrieval signal
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have how in is it its of on or that the this
+to was were what when where which who why will with you your i me my do does can
+""".split())
+
+# Rank offset for reciprocal rank fusion of BM25 and vector rankings
+_RRF_K = 60
+
+# Lines that open a new SOP section: markdown headings, numbered headings
+# ("3. Scope", "4.2) Hazards", "Section 5: Training") or short all-caps titles
+_SECTION_HEADING = re.compile(
+    r"^\s*(?:#{1,6}\s+\S"
+    r"|(?:\d+(?:\.\d+)*[.)]?|[Ss]ection\s+\d+[.:]?)\s+[A-Z]"
+    r"|[A-Z][A-Z0-9 /&\-]{3,60}:?\s*$)"
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough model-token estimate (~4 characters per token for English)"""
+    return (len(text) + 3) // 4
+
+
+def content_version(content: str) -> str:
+    """Short fingerprint of an SOP body; changes whenever the text does"""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:12]
+
+
+# Where a long paragraph may be cut: after a sentence, or at a line break
+_BREAK = re.compile(r"[.!?]\s|\n")
+
+
+def _is_heading(line: str) -> bool:
+    return len(line) < 120 and bool(_SECTION_HEADING.match(line))
+
+
+def _cut(text: str, max_chars: int) -> int:
+    """Offset of the last sentence (else word) boundary within max_chars"""
+    window = text[:max_chars + 1]
+    cut = max((match.end() for match in _BREAK.finditer(window)), default=0)
+    if cut <= 0:
+        cut = window.rfind(" ")
+    return cut if cut > 0 else max_chars
+
+
+def _split_paragraph(paragraph: str, max_chars: int) -> List[str]:
+    """A paragraph in pieces of at most max_chars, cut on sentence boundaries where possible"""
+    pieces = []
+    while len(paragraph) > max_chars:
+        cut = _cut(paragraph, max_chars)
+        pieces.append(paragraph[:cut].strip())
+        paragraph = paragraph[cut:].strip()
+    if paragraph:
+        pieces.append(paragraph)
+    return pieces
+
+
+def trim_chunk(text: str, token_budget: int) -> str:
+    """Cut one chunk to about `token_budget` tokens at a sentence or word boundary"""
+    max_chars = token_budget * 4
+    if len(text) <= max_chars:
+        return text
+    if max_chars <= 0:
+        return ""
+    return text[:_cut(text, max_chars)].strip()
+
+
+def chunk_sop(content: str, max_chars: int = 1200) -> List[str]:
+    """
+    Split an SOP on section boundaries.
+
+    Sections longer than max_chars are split again on paragraph boundaries,
+    repeating the section heading on each piece so chunks stay self-describing.
+    A paragraph that alone exceeds max_chars (extracted text often has no
+    blank lines at all) is cut on sentence boundaries, else between words.
+    """
+    sections: List[List[str]] = [[]]
+    for line in content.splitlines():
+        if _is_heading(line) and any(l.strip() for l in sections[-1]):
+            sections.append([])
+        sections[-1].append(line)
+
+    chunks = []
+    for lines in sections:
+        text = "\n".join(lines).strip()
+        if not text:
+            continue
+        if len(text) <= max_chars:
+            chunks.append(text)
+            continue
+
+        heading = lines[0].strip() if _is_heading(lines[0]) else ""
+        body = "\n".join(lines[1:] if heading else lines)
+        # Room left next to the repeated heading
+        room = max(max_chars - len(heading) - 2, max_chars // 2)
+        paragraphs = [
+            part
+            for paragraph in re.split(r"\n\s*\n", body)
+            for part in _split_paragraph(paragraph.strip(), room)
+        ]
+        piece = heading
+        for paragraph in paragraphs:
+            if piece and piece != heading and len(piece) + len(paragraph) + 2 > max_chars:
+                chunks.append(piece)
+                piece = heading
+            piece = f"{piece}\n\n{paragraph}" if piece else paragraph
+        if piece and piece != heading:
+            chunks.append(piece)
+    return chunks
+
+
+class Chunk(NamedTuple):
+    sop_id: str
+    position: int
+    text: str
+    length: int
+    terms: Counter
+
+
+class SOPIndex:
+    """
+    In-memory inverted index with BM25 scoring over SOP chunks.
+
+    Documents can be (re)indexed one at a time; replacing an SOP removes its
+    old postings first, so the index stays consistent as uploads arrive.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._chunks: Dict[int, Chunk] = {}
+        self._by_sop: Dict[str, List[int]] = {}
+        self._versions: Dict[str, str] = {}
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._total_length = 0
+        self._next_id = 0
+
+    def add_document(self, sop_id: str, content: str, chunks: Optional[List[str]] = None):
+        """Index (or re-index) one SOP; `chunks` skips re-chunking content already split"""
+        self.remove_document(sop_id)
+
+        ids = []
+        for position, text in enumerate(chunks if chunks is not None else chunk_sop(content)):
+            terms = Counter(tokenize(text))
+            chunk_id = self._next_id
+            self._next_id += 1
+
+            chunk = Chunk(sop_id, position, text, sum(terms.values()), terms)
+            self._chunks[chunk_id] = chunk
+            self._total_length += chunk.length
+            for term, tf in terms.items():
+                self._postings.setdefault(term, {})[chunk_id] = tf
+            ids.append(chunk_id)
+
+        self._by_sop[sop_id] = ids
+        self._versions[sop_id] = content_version(content)
+
+    def remove_document(self, sop_id: str):
+        self._versions.pop(sop_id, None)
+        for chunk_id in self._by_sop.pop(sop_id, []):
+            chunk = self._chunks.pop(chunk_id)
+            self._total_length -= chunk.length
+            for term in chunk.terms:
+                postings = self._postings[term]
+                del postings[chunk_id]
+                if not postings:
+                    del self._postings[term]
+
+    def chunks(self, sop_id: str) -> List[Chunk]:
+        """Chunks of one SOP in document order"""
+        return [self._chunks[chunk_id] for chunk_id in self._by_sop.get(sop_id, [])]
+
+    def version(self, sop_id: str) -> Optional[str]:
+        """content_version() of the indexed text of an SOP, None if it is not indexed"""
+        return self._versions.get(sop_id)
+
+    def chunk_count(self, sop_id: Optional[str] = None) -> int:
+        if sop_id is None:
+            return len(self._chunks)
+        return len(self._by_sop.get(sop_id, []))
+
+    def search(self, query: str, sop_id: Optional[str] = None, k: int = 5) -> List[tuple]:
+        """Top-k (score, chunk) pairs for the query, optionally within one SOP"""
+        if not self._chunks:
+            return []
+
+        n = len(self._chunks)
+        avgdl = self._total_length / n if n else 0.0
+        scores: Dict[int, float] = {}
+
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, tf in postings.items():
+                chunk = self._chunks[chunk_id]
+                if sop_id is not None and chunk.sop_id != sop_id:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * chunk.length / avgdl) if avgdl else self.k1
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(score, self._chunks[chunk_id]) for chunk_id, score in ranked]
+
+    def build_context(
+        self,
+        query: str,
+        sop_id: str,
+        token_budget: int,
+        k: int = 5,
+        vector_positions: Optional[List[int]] = None,
+    ) -> str:
+        """
+        Assemble the best-matching chunks of one SOP under a token budget.
+
+        Chunks are picked by BM25 rank and emitted in document order. When
+        `vector_positions` (chunk positions from a vector search, best first)
+        is given, it is fused with the BM25 ranking by reciprocal rank. When
+        nothing matches, the opening sections are used instead. The best chunk
+        is trimmed to the budget rather than skipped, so an indexed SOP never
+        yields an empty context.
+        """
+        ranked = [chunk for _, chunk in self.search(query, sop_id, k)]
+        if vector_positions:
+            chunks = self.chunks(sop_id)
+            scores: Dict[int, float] = {}
+            for ranking in (ranked, [chunks[p] for p in vector_positions if 0 <= p < len(chunks)]):
+                for rank, chunk in enumerate(ranking):
+                    scores[chunk.position] = scores.get(chunk.position, 0.0) + 1.0 / (_RRF_K + rank + 1)
+            ranked = [chunks[p] for p in sorted(scores, key=scores.get, reverse=True)[:k]]
+        if not ranked:
+            ranked = self.chunks(sop_id)
+
+        selected, used = [], 0
+        for chunk in ranked:
+            text = chunk.text
+            cost = estimate_tokens(text)
+            if used + cost > token_budget:
+                if selected:
+                    continue
+                text = trim_chunk(text, token_budget)
+                cost = estimate_tokens(text)
+            selected.append((chunk.position, text))
+            used += cost
+
+        selected.sort()
+        return "\n\n...\n\n".join(text for _, text in selected if text)
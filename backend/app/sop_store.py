@@ -0,0 +1,188 @@
+"""SOP bodies from the documents table, behind a per-worker read-through LRU"""
+
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+
+try:
+    from config import settings
+    from sop_index import SOPIndex
+except ImportError:
+    from app.config import settings
+    from app.sop_index import SOPIndex
+
+# The database package is only importable under app.*; a second flat copy
+# would bring its own Base and engine
+from app.db.database import AsyncSessionLocal, init_db
+from app.db.repositories.cache_version_repository import CacheVersionRepository
+from app.db.repositories.document_repository import DOCUMENTS_VERSION, DocumentRepository
+
+logger = logging.getLogger(__name__)
+
+
+def _sop_id(summary: dict) -> str:
+    return summary["slug"] or str(summary["id"])
+
+
+class SOPStore:
+    """
+    SOPs by id: built-in demo SOPs from code, uploaded ones from the documents table.
+
+    Bodies read from the database are kept in an LRU of `max_entries` and in
+    the chunk index. Every document write bumps the documents version
+    counter; each worker reads that counter at most once per `check_interval`
+    seconds and, when it has moved, drops only the cached SOPs whose row
+    version changed. Between checks a lookup is a dict access. A check that
+    fails on a database error is logged and retried after the next interval,
+    and meanwhile the cached listing and bodies are served as they are.
+    """
+
+    def __init__(
+        self,
+        builtins: Dict[str, dict],
+        index: SOPIndex,
+        engine: Optional[AsyncEngine] = None,
+        max_entries: Optional[int] = None,
+        check_interval: Optional[float] = None,
+    ):
+        self.builtins = builtins
+        self.index = index
+        self.engine = engine
+        self._sessions = async_sessionmaker(engine, expire_on_commit=False) if engine is not None else AsyncSessionLocal
+        self.max_entries = max_entries if max_entries is not None else settings.SOP_CACHE_MAX_ENTRIES
+        self.check_interval = check_interval if check_interval is not None else settings.SOP_CACHE_CHECK_SECONDS
+
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._listing: Optional[List[dict]] = None
+        self._missing: set = set()
+        self._seen_version: Optional[int] = None
+        self._next_check = 0.0
+        self._ready = False
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.version_checks = 0
+        self.check_errors = 0
+
+    async def ready(self):
+        """Create the tables and the version counter on first use"""
+        if self._ready:
+            return
+        await init_db(self.engine)
+        async with self._sessions() as session:
+            await CacheVersionRepository(session).ensure(DOCUMENTS_VERSION)
+        self._ready = True
+
+    async def _check_version(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        # Claimed before awaiting, so concurrent requests don't all query
+        self._next_check = now + self.check_interval
+        try:
+            await self.ready()
+            async with self._sessions() as session:
+                version = await CacheVersionRepository(session).get(DOCUMENTS_VERSION)
+                self.version_checks += 1
+                if version == self._seen_version and self._listing is not None:
+                    return
+                summaries = await DocumentRepository(session).list_summaries()
+        except SQLAlchemyError as e:
+            # Keep serving the cached listing and bodies; the next interval retries
+            self.check_errors += 1
+            logger.warning(f"SOP version check failed: {str(e)}")
+            return
+
+        current = {_sop_id(summary): summary["version"] for summary in summaries}
+        for sop_id in [sop_id for sop_id, entry in self._entries.items() if current.get(sop_id) != entry["version"]]:
+            self._evict(sop_id)
+            self.invalidations += 1
+        self._listing = [{"id": _sop_id(summary), "title": summary["title"]} for summary in summaries]
+        self._missing.clear()
+        self._seen_version = version
+
+    def _remember(self, sop_id: str, title: str, content: str, version: int, chunks: Optional[List[str]] = None) -> dict:
+        cached = self._entries.get(sop_id)
+        if cached is not None and cached["version"] > version:
+            # A read that raced a newer write must not put the old body back
+            return cached
+        entry = {"title": title, "content": content, "version": version}
+        self._entries[sop_id] = entry
+        self._entries.move_to_end(sop_id)
+        self._missing.discard(sop_id)
+        self.index.add_document(sop_id, content, chunks=chunks)
+        while len(self._entries) > self.max_entries:
+            oldest, _ = self._entries.popitem(last=False)
+            self.index.remove_document(oldest)
+        return entry
+
+    def _evict(self, sop_id: str):
+        if self._entries.pop(sop_id, None) is not None:
+            self.index.remove_document(sop_id)
+
+    def peek(self, sop_id: str) -> Optional[dict]:
+        """Built-in or cached SOP without touching the database"""
+        return self.builtins.get(sop_id) or self._entries.get(sop_id)
+
+    async def list(self) -> List[dict]:
+        await self._check_version()
+        listed = [{"id": sop_id, "title": sop["title"]} for sop_id, sop in self.builtins.items()]
+        return listed + [item for item in self._listing or [] if item["id"] not in self.builtins]
+
+    async def get(self, sop_id: str) -> Optional[dict]:
+        """{"title", "content", ...} for an SOP, or None if there is no such SOP"""
+        if sop_id in self.builtins:
+            return self.builtins[sop_id]
+        await self._check_version()
+        entry = self._entries.get(sop_id)
+        if entry is not None:
+            self._entries.move_to_end(sop_id)
+            self.hits += 1
+            return entry
+        if sop_id in self._missing:
+            self.hits += 1
+            return None
+
+        self.misses += 1
+        async with self._sessions() as session:
+            repository = DocumentRepository(session)
+            document = await repository.get_by_slug(sop_id)
+            if document is None and sop_id.isdigit():
+                document = await repository.get_by_id(int(sop_id))
+                if document is not None and document.slug:
+                    document = None
+        if document is None:
+            # Unknown ids are remembered until the next change, bounded like the bodies
+            if len(self._missing) >= self.max_entries:
+                self._missing.clear()
+            self._missing.add(sop_id)
+            return None
+        return self._remember(sop_id, document.title, document.content, document.version)
+
+    async def put(self, sop_id: str, title: str, content: str, chunks: Optional[List[str]] = None) -> dict:
+        """Store an uploaded SOP; other workers see it after their next version check"""
+        await self.ready()
+        async with self._sessions() as session:
+            document = await DocumentRepository(session).upsert_by_slug(sop_id, title, content)
+        if self._listing is not None:
+            self._listing = [item for item in self._listing if item["id"] != sop_id]
+            self._listing.append({"id": sop_id, "title": title})
+        logger.info(f"Stored SOP {sop_id} (version {document.version})")
+        return self._remember(sop_id, title, content, document.version, chunks=chunks)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "version_checks": self.version_checks,
+            "check_errors": self.check_errors,
+            "version": self._seen_version,
+        }
@@ -0,0 +1,53 @@
+"""Per-request stage timers, reported as a Server-Timing header"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+_current_timer: ContextVar[Optional["StageTimer"]] = ContextVar("stage_timer", default=None)
+
+
+class StageTimer:
+    """
+    Accumulated wall time per named stage of one request.
+
+    Activated for the request's context; tasks started from it (single-flight
+    generation, hedged attempts) inherit the same timer, so their stages are
+    recorded too. Repeated stages, e.g. a second completion, are summed.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def activate(self):
+        token = _current_timer.set(self)
+        try:
+            yield self
+        finally:
+            _current_timer.reset(token)
+
+    def header(self) -> str:
+        """Server-Timing value: every stage plus the total so far, in milliseconds"""
+        parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages.items()]
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(parts)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block into the active request's StageTimer; a no-op without one"""
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(name, time.perf_counter() - started)
@@ -0,0 +1,158 @@
+"""
+Answer-cache warm-up: pre-generate answers for frequently asked questions.
+
+Questions come from each SOP's "faq" list in sample_sops, plus an optional
+JSON file mapping SOP id to questions ("" for questions asked without an
+SOP). Every question runs through the full generate_explanation pipeline, so
+answers land in the response cache exactly as live traffic would store them.
+Entries already cached for the current model/prompt are skipped, and an
+optional state file lets an interrupted run resume where it stopped.
+
+Usage (from the backend directory; needs RESPONSE_CACHE_SQLITE_PATH so the
+answers outlive this process):
+    python -m app.warmup --questions faq.json --concurrency 4 --state warmup_state.jsonl
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from config import settings
+    from ai_service import AIService
+    from http_client import PooledHTTPClient
+    from response_cache import ResponseCache
+    from sample_sops import get_sop_context, get_sop_faq, get_sop_list, get_sop_version
+except ImportError:
+    from app.config import settings
+    from app.ai_service import AIService
+    from app.http_client import PooledHTTPClient
+    from app.response_cache import ResponseCache
+    from app.sample_sops import get_sop_context, get_sop_faq, get_sop_list, get_sop_version
+
+logger = logging.getLogger(__name__)
+
+
+async def load_questions(path: Optional[str] = None) -> List[Tuple[Optional[str], str]]:
+    """(sop_id or None, question) pairs from SOP FAQs and an optional questions file"""
+    by_sop: Dict[str, List[str]] = {sop["id"]: get_sop_faq(sop["id"]) for sop in await get_sop_list()}
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            for sop_id, questions in json.load(f).items():
+                by_sop.setdefault(sop_id, []).extend(questions)
+
+    pairs, seen = [], set()
+    for sop_id, questions in by_sop.items():
+        for question in questions:
+            pair = (sop_id or None, question.strip())
+            if pair[1] and pair not in seen:
+                seen.add(pair)
+                pairs.append(pair)
+    return pairs
+
+
+def _load_state(path: Optional[Path]) -> set:
+    if path is None or not path.exists():
+        return set()
+    with open(path, "r", encoding="utf-8") as f:
+        return {json.loads(line)["key"] for line in f if line.strip()}
+
+
+async def warm_cache(
+    ai_service: AIService,
+    questions: List[Tuple[Optional[str], str]],
+    concurrency: Optional[int] = None,
+    state_path: Optional[str] = None,
+) -> dict:
+    """
+    Generate and cache answers for `questions`; returns a throughput report.
+
+    Keys already in the response cache (or recorded in the state file by an
+    earlier run) are skipped. Answers that are never cached, such as the
+    canned fallback, are still recorded so a resumed run does not retry them.
+    """
+    cache = ai_service.response_cache
+    if cache is None:
+        raise ValueError("Cache warm-up needs the response cache to be enabled")
+
+    concurrency = concurrency or settings.WARMUP_CONCURRENCY
+    state_file = Path(state_path) if state_path else None
+    done_keys = _load_state(state_file)
+    report = {"questions": len(questions), "skipped_cached": 0, "skipped_resumed": 0,
+              "generated": 0, "cached": 0, "filtered": 0, "failed": 0}
+    semaphore = asyncio.Semaphore(concurrency)
+    state = open(state_file, "a", encoding="utf-8") if state_file else None
+    started = time.perf_counter()
+
+    async def warm_one(sop_id: Optional[str], question: str):
+        sop_context = await get_sop_context(sop_id, question) if sop_id else None
+        sop_version = get_sop_version(sop_id) if sop_context else None
+        key = cache.make_key(question, sop_context or None, ai_service.model, ai_service.SYSTEM_PROMPT)
+        if key in done_keys:
+            report["skipped_resumed"] += 1
+            return
+        if await cache.contains(key):
+            report["skipped_cached"] += 1
+            return
+
+        async with semaphore:
+            result = await ai_service.generate_explanation(question, sop_context or None, sop_version=sop_version)
+
+        if result.get("error"):
+            report["failed"] += 1
+            logger.warning(f"Warm-up failed for {question!r}: {result['error']}")
+            return
+        report["generated"] += 1
+        if result.get("filtered"):
+            report["filtered"] += 1
+        elif await cache.contains(key):
+            report["cached"] += 1
+        if state is not None:
+            state.write(json.dumps({"key": key, "sop_id": sop_id, "question": question}) + "\n")
+            state.flush()
+
+    try:
+        await asyncio.gather(*(warm_one(sop_id, question) for sop_id, question in questions))
+    finally:
+        if state is not None:
+            state.close()
+
+    seconds = time.perf_counter() - started
+    report["seconds"] = round(seconds, 3)
+    report["generated_per_second"] = round(report["generated"] / seconds, 3) if seconds else 0.0
+    logger.info(f"Cache warm-up finished: {report}")
+    return report
+
+
+async def _main(args) -> dict:
+    if not settings.RESPONSE_CACHE_SQLITE_PATH:
+        logger.warning("RESPONSE_CACHE_SQLITE_PATH is not set; warmed answers will be lost when this process exits")
+
+    http_client = PooledHTTPClient()
+    response_cache = ResponseCache()
+    await http_client.start(prewarm_url=settings.OPENROUTER_API_URL)
+    try:
+        ai_service = AIService(http_client=http_client, response_cache=response_cache)
+        return await warm_cache(ai_service, await load_questions(args.questions), args.concurrency, args.state)
+    finally:
+        await http_client.close()
+        response_cache.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate cached answers for frequently asked questions")
+    parser.add_argument("--questions", help="JSON file mapping SOP id to a list of questions")
+    parser.add_argument("--concurrency", type=int, default=None, help="questions generated at once")
+    parser.add_argument("--state", help="JSON-lines progress file; re-running with it resumes")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    print(json.dumps(asyncio.run(_main(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark: event-loop latency under concurrent document reads, sync vs async sessions
+
+Run from the backend directory:
+    python benchmarks/bench_db_event_loop.py [--documents 200] [--size-kb 64] [--readers 32] [--seconds 5]
+
+"sync" is the old pattern: a synchronous SQLAlchemy Session queried directly
+inside coroutines, so every read runs on the event loop thread. "async" uses
+the AsyncSession/DocumentRepository path. A heartbeat task sleeps 1 ms in a
+loop; how late it wakes up is the event-loop lag any other request would see.
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine as create_sync_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy.ext.asyncio import async_sessionmaker  # noqa: E402
+
+from app.db.database import Base, create_engine, init_db  # noqa: E402
+from app.db.repositories.document_repository import DocumentRepository  # noqa: E402
+from app.models.document import Document  # noqa: E402
+from app.schemas.document import DocumentCreate  # noqa: E402
+
+
+async def heartbeat(stop: asyncio.Event, lags: list, interval: float = 0.001):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, loop.time() - expected) * 1000)
+
+
+async def run_readers(read, readers: int, seconds: float, document_ids: list) -> dict:
+    stop = asyncio.Event()
+    lags: list = []
+    reads = [0]
+
+    async def reader(rng: random.Random):
+        while not stop.is_set():
+            await read(rng.choice(document_ids))
+            reads[0] += 1
+            # Yield even if the read itself never did
+            await asyncio.sleep(0)
+
+    beat = asyncio.create_task(heartbeat(stop, lags))
+    tasks = [asyncio.create_task(reader(random.Random(i))) for i in range(readers)]
+    await asyncio.sleep(seconds)
+    stop.set()
+    await asyncio.gather(beat, *tasks)
+
+    lags.sort()
+    return {
+        "reads_per_second": round(reads[0] / seconds, 1),
+        "lag_p50_ms": round(statistics.median(lags), 2) if lags else None,
+        "lag_p99_ms": round(lags[int(len(lags) * 0.99) - 1], 2) if lags else None,
+        "lag_max_ms": round(lags[-1], 2) if lags else None,
+        "heartbeats": len(lags),
+    }
+
+
+async def main_async(args):
+    path = Path(tempfile.mkdtemp()) / "bench.db"
+    engine = create_engine(f"sqlite:///{path}", pool_size=args.readers, max_overflow=0)
+    await init_db(engine)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    body = "hazardous energy control " * (args.size_kb * 1024 // 25)
+    async with session_factory() as session:
+        repository = DocumentRepository(session)
+        ids = [(await repository.create(DocumentCreate(title=f"SOP {i}", content=body))).id
+               for i in range(args.documents)]
+
+    # Old path: blocking Session on the loop thread
+    sync_engine = create_sync_engine(f"sqlite:///{path}", pool_size=args.readers, max_overflow=0)
+    Base.metadata.create_all(sync_engine)
+    SyncSession = sessionmaker(bind=sync_engine)
+
+    async def sync_read(document_id):
+        with SyncSession() as session:
+            return session.get(Document, document_id).content
+
+    async def async_read(document_id):
+        async with session_factory() as session:
+            return (await DocumentRepository(session).get_by_id(document_id)).content
+
+    print(f"{args.documents} documents of {args.size_kb} KB, {args.readers} concurrent readers, {args.seconds}s each")
+    print(f"{'path':>6} {'reads/s':>10} {'lag p50 ms':>11} {'lag p99 ms':>11} {'lag max ms':>11}")
+    for name, read in (("sync", sync_read), ("async", async_read)):
+        result = await run_readers(read, args.readers, args.seconds, ids)
+        print(f"{name:>6} {result['reads_per_second']:>10} {result['lag_p50_ms']:>11} "
+              f"{result['lag_p99_ms']:>11} {result['lag_max_ms']:>11}")
+
+    sync_engine.dispose()
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--size-kb", type=int, default=64)
+    parser.add_argument("--readers", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark: EmbeddingIndex top-k vs pairwise EmbeddingsService.calculate_similarity
+
+Run from the backend directory:
+    python benchmarks/bench_embedding_index.py [--sizes 1000 10000 100000] [--dim 384]
+
+The pairwise path is timed on a single query (it is O(n) Python calls per
+query); the index is timed on a batch and reported per query.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.embeddings_service import EmbeddingIndex, EmbeddingsService  # noqa: E402
+
+
+def pairwise_top_k(service, query, vectors, k):
+    scores = [service.calculate_similarity(query, vector) for vector in vectors]
+    return sorted(range(len(scores)), key=scores.__getitem__, reverse=True)[:k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--sops", type=int, default=50, help="groups used for the filtered search")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    service = EmbeddingsService(embedding_model=None)
+
+    for size in args.sizes:
+        vectors = rng.standard_normal((size, args.dim)).astype(np.float32)
+        queries = rng.standard_normal((args.batch, args.dim)).astype(np.float32)
+
+        index = EmbeddingIndex(args.dim)
+        start = time.perf_counter()
+        per_group = max(1, size // args.sops)
+        for group, offset in enumerate(range(0, size, per_group)):
+            ids = list(range(offset, min(offset + per_group, size)))
+            index.add(ids, vectors[offset:offset + len(ids)], group=group)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        results = index.search(queries, k=args.k)
+        index_ms = (time.perf_counter() - start) * 1000 / args.batch
+
+        start = time.perf_counter()
+        index.search(queries, k=args.k, groups=[0])
+        filtered_ms = (time.perf_counter() - start) * 1000 / args.batch
+
+        start = time.perf_counter()
+        expected = pairwise_top_k(service, queries[0], vectors, args.k)
+        pairwise_ms = (time.perf_counter() - start) * 1000
+
+        assert [item_id for item_id, _ in results[0]] == expected, "index and pairwise rankings differ"
+        print(
+            f"n={size:<7} build={build_ms:8.1f} ms  pairwise={pairwise_ms:10.1f} ms/query  "
+            f"index={index_ms:7.3f} ms/query  filtered={filtered_ms:7.3f} ms/query  "
+            f"speedup={pairwise_ms / index_ms:9.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Micro-benchmark: compiled single-pass matcher vs the original per-pattern loops
+
+Run from the backend directory:
+    python benchmarks/bench_matcher.py [--queries 20000] [--responses 5000]
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.ai_service import AIService  # noqa: E402
+from app.safety_filter import SafetyFilter  # noqa: E402
+
+UNSAFE_PATTERNS = [pattern for _, pattern in SafetyFilter.UNSAFE_PATTERNS]
+BANNED_VERBS = [pattern for _, pattern in AIService.BANNED_VERBS]
+
+QUERY_STARTS = [
+    "Explain", "What is", "Why is", "Describe", "Tell me about", "Summarize",
+    "Can I", "Is it safe to", "Should I", "How do I", "What does",
+]
+QUERY_TOPICS = [
+    "lockout tagout", "the LOTO procedure", "PPE requirements", "confined space entry",
+    "hazardous energy control", "machine guarding", "hot work permits", "forklift safety",
+    "skip the verification step", "bypass the interlock", "without supervisor approval",
+]
+RESPONSE_SENTENCES = [
+    "Lockout-tagout is a safety practice used to protect people from hazardous energy.",
+    "The purpose is to keep equipment in a safe, inactive state during maintenance.",
+    "This helps clearly indicate that equipment should not be used until work is complete.",
+    "Personal protective equipment is designed to reduce exposure to workplace hazards.",
+    "Unexpected activation of machinery can lead to serious injuries.",
+    "In simple terms, the procedure focuses on awareness and control.",
+    "This practice is used to protect maintenance personnel and operators alike.",
+]
+VIOLATING_SENTENCES = [
+    "First, disconnect the main supply before work begins.",
+    "You should verify that the machine is de-energized.",
+    "Then lock the breaker panel and attach a tag.",
+    "Open the valve slowly to release stored pressure.",
+]
+
+
+def legacy_is_query_safe(query: str) -> bool:
+    """Original SafetyFilter loop: lowercase, then re.search each uncompiled pattern"""
+    query_lower = query.lower()
+    for pattern in UNSAFE_PATTERNS:
+        if re.search(pattern, query_lower):
+            return False
+    return True
+
+
+def legacy_contains_banned_verbs(text: str) -> bool:
+    """Original AIService loop: re.findall each pattern over the lowercased text"""
+    violations = []
+    text_lower = text.lower()
+    for pattern in BANNED_VERBS:
+        matches = re.findall(pattern, text_lower, re.IGNORECASE)
+        if matches:
+            violations.extend(matches)
+    return len(violations) > 0
+
+
+def build_corpus(queries: int, responses: int, seed: int = 7):
+    rng = random.Random(seed)
+    query_corpus = [
+        f"{rng.choice(QUERY_STARTS)} {rng.choice(QUERY_TOPICS)}?"
+        for _ in range(queries)
+    ]
+    response_corpus = []
+    for _ in range(responses):
+        sentences = rng.choices(RESPONSE_SENTENCES, k=rng.randint(6, 14))
+        if rng.random() < 0.2:
+            sentences.insert(rng.randrange(len(sentences)), rng.choice(VIOLATING_SENTENCES))
+        response_corpus.append(" ".join(sentences))
+    return query_corpus, response_corpus
+
+
+def timed(fn, corpus):
+    start = time.perf_counter()
+    flagged = sum(1 for text in corpus if fn(text))
+    return time.perf_counter() - start, flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--responses", type=int, default=5000)
+    args = parser.parse_args()
+
+    queries, responses = build_corpus(args.queries, args.responses)
+    service = AIService()
+
+    cases = [
+        ("queries", queries, lambda q: not legacy_is_query_safe(q), lambda q: SafetyFilter.UNSAFE_RULES.first_rule(q) is not None),
+        ("responses", responses, legacy_contains_banned_verbs, lambda r: service._contains_banned_verbs(r)[0]),
+    ]
+
+    for name, corpus, legacy, compiled in cases:
+        legacy_time, legacy_hits = timed(legacy, corpus)
+        compiled_time, compiled_hits = timed(compiled, corpus)
+        assert legacy_hits == compiled_hits, f"{name}: result mismatch ({legacy_hits} vs {compiled_hits})"
+        print(
+            f"{name:<10} n={len(corpus):<6} flagged={compiled_hits:<6} "
+            f"legacy={legacy_time * 1000:8.1f} ms  compiled={compiled_time * 1000:8.1f} ms  "
+            f"speedup={legacy_time / compiled_time:5.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Load test: replay a question mix against main.app at a fixed arrival rate.
+
+The backend runs in-process and its upstream calls go to the mock
+OpenRouter app (mock_openrouter.py), so nothing reaches the real service.
+Requests are started on schedule whether or not earlier ones finished
+(open loop), so queueing shows up as latency and 429s rather than as a
+lower offered rate.
+
+Run from the backend directory:
+    python benchmarks/load_test.py --rate 20 --duration 30 --latency lognormal:0.8,0.5 \\
+        --violation-rate 0.2 --output report.json [--baseline previous.json]
+
+The JSON report has throughput, p50/p95/p99 latency, status counts, upstream
+calls and the compliance rewrite rate. With --baseline, regressions beyond
+--tolerance are listed and the exit status is 1.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from app.main import app, ai_service  # noqa: E402
+from app.http_client import PooledHTTPClient  # noqa: E402
+from mock_openrouter import add_mock_arguments, mock_app_from_args  # noqa: E402
+
+MOCK_URL = "http://mock-openrouter/api/v1/chat/completions"
+
+# (weight, question, sop_id): mostly conceptual questions, some repeats that
+# the answer cache can absorb, and a few the safety filter refuses
+DEFAULT_MIX = [
+    (5, "What is the purpose of lockout/tagout?", "demo_loto"),
+    (4, "Why is LOTO important?", "demo_loto"),
+    (3, "What is hazardous energy?", None),
+    (3, "Explain confined space entry risks", None),
+    (2, "Describe why machine guarding matters", None),
+    (2, "What does PPE protect against?", None),
+    (1, "Is it safe to skip the lockout step?", None),
+    (1, "Can I bypass the interlock?", None),
+]
+
+# (report key, higher is better) compared against a baseline
+COMPARED = [
+    ("throughput_rps", True),
+    ("latency_ms.p50", False),
+    ("latency_ms.p95", False),
+    ("latency_ms.p99", False),
+    ("upstream_calls_per_request", False),
+    ("rewrite_rate", False),
+]
+
+
+def load_mix(path: Optional[str]) -> List[Tuple[float, str, Optional[str]]]:
+    """Question mix from a JSON list of {"question", "sop_id", "weight"}"""
+    if not path:
+        return DEFAULT_MIX
+    with open(path, "r", encoding="utf-8") as f:
+        return [(item.get("weight", 1), item["question"], item.get("sop_id")) for item in json.load(f)]
+
+
+def arrival_offsets(rate: float, duration: float, arrival: str, rng: random.Random) -> List[float]:
+    """Seconds after start at which each request is sent"""
+    if arrival == "constant":
+        return [i / rate for i in range(int(rate * duration))]
+    offsets, at = [], rng.expovariate(rate)
+    while at < duration:
+        offsets.append(at)
+        at += rng.expovariate(rate)
+    return offsets
+
+
+def percentile(ordered: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an ascending list"""
+    if not ordered:
+        return None
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+async def send(client: httpx.AsyncClient, question: str, sop_id: Optional[str]) -> Tuple[int, float]:
+    started = time.perf_counter()
+    try:
+        response = await client.post("/api/chat", json={"question": question, "sop_id": sop_id})
+        status = response.status_code
+    except httpx.HTTPError:
+        status = 0
+    return status, time.perf_counter() - started
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    mix = load_mix(args.questions)
+    weights = [weight for weight, _, _ in mix]
+
+    mock_app = mock_app_from_args(args)
+    upstream = PooledHTTPClient(transport=httpx.ASGITransport(app=mock_app))
+    await upstream.start()
+    ai_service.http_client = upstream
+    for target in ai_service.router.targets:
+        target.url = MOCK_URL
+    if args.no_cache:
+        ai_service.response_cache = None
+        ai_service.semantic_cache = None
+    compliance_before = dict(ai_service.compliance_paths)
+
+    offsets = arrival_offsets(args.rate, args.duration, args.arrival, rng)
+    picks = [mix[i] for i in rng.choices(range(len(mix)), weights=weights, k=len(offsets))]
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://backend", timeout=None) as client:
+        loop = asyncio.get_running_loop()
+        tasks = []
+        started = loop.time()
+        for offset, (_, question, sop_id) in zip(offsets, picks):
+            await asyncio.sleep(max(0.0, started + offset - loop.time()))
+            tasks.append(asyncio.create_task(send(client, question, sop_id)))
+        results = await asyncio.gather(*tasks)
+        wall = loop.time() - started
+    await upstream.close()
+
+    statuses = {}
+    for status, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    latencies = sorted(seconds * 1000 for status, seconds in results if status == 200)
+    ok = len(latencies)
+
+    compliance = {path: ai_service.compliance_paths[path] - compliance_before[path] for path in compliance_before}
+    generated = sum(compliance.values())
+    upstream_stats = mock_app.state.stats
+
+    return {
+        "config": {
+            "rate": args.rate,
+            "duration": args.duration,
+            "arrival": args.arrival,
+            "latency": args.latency,
+            "error_rate": args.error_rate,
+            "violation_rate": args.violation_rate,
+            "heavy_violation_share": args.heavy_violation_share,
+            "cache": not args.no_cache,
+            "questions": len(mix),
+            "seed": args.seed,
+        },
+        "requests": len(results),
+        "status": statuses,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(ok / wall, 3) if wall else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 1) if latencies else None,
+            "p95": round(percentile(latencies, 95), 1) if latencies else None,
+            "p99": round(percentile(latencies, 99), 1) if latencies else None,
+            "max": round(latencies[-1], 1) if latencies else None,
+            "mean": round(sum(latencies) / ok, 1) if latencies else None,
+        },
+        "upstream_calls": upstream_stats["calls"],
+        "upstream_calls_per_request": round(upstream_stats["calls"] / len(results), 3) if results else 0.0,
+        "upstream": dict(upstream_stats),
+        "compliance": compliance,
+        "rewrite_rate": round(compliance["remote"] / generated, 4) if generated else 0.0,
+        "local_fix_rate": round(compliance["local"] / generated, 4) if generated else 0.0,
+        "fallback_rate": round(compliance["fallback"] / generated, 4) if generated else 0.0,
+    }
+
+
+def _lookup(report: dict, dotted: str):
+    for part in dotted.split("."):
+        report = report.get(part) if isinstance(report, dict) else None
+    return report
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Human-readable regressions of `report` against `baseline`"""
+    regressions = []
+    for key, higher_is_better in COMPARED:
+        current, previous = _lookup(report, key), _lookup(baseline, key)
+        if current is None or not previous:
+            continue
+        change = (current - previous) / previous
+        if (change < -tolerance) if higher_is_better else (change > tolerance):
+            regressions.append(f"{key}: {previous} -> {current} ({change:+.1%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=10.0, help="requests per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of arrivals")
+    parser.add_argument("--arrival", choices=["constant", "poisson"], default="constant")
+    parser.add_argument("--questions", help="JSON list of {question, sop_id, weight}")
+    parser.add_argument("--no-cache", action="store_true", help="disable the answer caches")
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative regression")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    # Per-request logs (prompt sizes, compliance violations) would drown the report
+    logging.getLogger().setLevel(logging.ERROR)
+
+    report = asyncio.run(run(args))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        regressions = compare(report, json.loads(Path(args.baseline).read_text(encoding="utf-8")), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
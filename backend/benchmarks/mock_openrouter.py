@@ -0,0 +1,171 @@
+"""
+Local stand-in for the OpenRouter chat-completions API, for load tests.
+
+Latency, error rate and the share of replies containing banned verbs are
+configurable, so the cache, retry, hedging and compliance-rewrite paths can
+all be exercised without touching the real service. Streaming requests get
+SSE deltas. GET /stats reports what the stand-in has served.
+
+Run standalone from the backend directory:
+    python benchmarks/mock_openrouter.py --port 9100 --latency lognormal:0.8,0.5 \\
+        --error-rate 0.02 --violation-rate 0.2
+and point the backend at it with
+    OPENROUTER_API_URL=http://127.0.0.1:9100/api/v1/chat/completions
+
+load_test.py mounts the same app in-process instead.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+from typing import List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+COMPLIANT_REPLY = (
+    "Lockout-tagout is a safety practice used to protect people from hazardous energy while equipment "
+    "is serviced. The purpose is to keep machines in a safe, inactive state so they cannot start "
+    "unexpectedly. This helps reduce the risk of serious injury and supports a safer workplace."
+)
+# One offending sentence: the local sanitizer can usually drop it
+LIGHT_VIOLATION_REPLY = COMPLIANT_REPLY + " First, disconnect the main supply before work begins."
+# Mostly offending text: too little survives sanitizing, so a model rewrite follows
+HEAVY_VIOLATION_REPLY = "LOTO matters. " + "You should turn the key and lock the panel. " * 12
+
+# Marker of AIService's compliance-rewrite prompt
+REWRITE_MARKER = "VIOLATIONS FOUND"
+
+
+class LatencyDistribution:
+    """
+    Response delay in seconds from a spec string:
+        fixed:S | uniform:LOW,HIGH | lognormal:MEDIAN,SIGMA | exponential:MEAN
+    """
+
+    def __init__(self, kind: str, params: List[float]):
+        if kind not in ("fixed", "uniform", "lognormal", "exponential"):
+            raise ValueError(f"Unknown latency distribution: {kind}")
+        self.kind = kind
+        self.params = params
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyDistribution":
+        kind, _, args = spec.partition(":")
+        return cls(kind, [float(value) for value in args.split(",") if value])
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return rng.uniform(self.params[0], self.params[1])
+        if self.kind == "lognormal":
+            return rng.lognormvariate(math.log(self.params[0]), self.params[1])
+        return rng.expovariate(1 / self.params[0])
+
+    def __str__(self) -> str:
+        return f"{self.kind}:{','.join(str(value) for value in self.params)}"
+
+
+def create_mock_app(
+    latency: str = "fixed:0.2",
+    error_rate: float = 0.0,
+    error_status: int = 503,
+    violation_rate: float = 0.0,
+    heavy_violation_share: float = 0.5,
+    rewrite_violation_rate: float = 0.0,
+    seed: int = 0,
+) -> FastAPI:
+    """A chat-completions stand-in; app.state.stats counts what it served"""
+    app = FastAPI(title="Mock OpenRouter")
+    distribution = LatencyDistribution.parse(latency)
+    rng = random.Random(seed)
+    stats = {"calls": 0, "streams": 0, "rewrites": 0, "errors": 0, "violations": 0}
+    app.state.stats = stats
+
+    def choose_reply(body: dict) -> str:
+        prompt = body["messages"][-1]["content"]
+        if REWRITE_MARKER in prompt:
+            stats["rewrites"] += 1
+            violating = rng.random() < rewrite_violation_rate
+        else:
+            violating = rng.random() < violation_rate
+        if not violating:
+            return COMPLIANT_REPLY
+        stats["violations"] += 1
+        return HEAVY_VIOLATION_REPLY if rng.random() < heavy_violation_share else LIGHT_VIOLATION_REPLY
+
+    @app.post("/api/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = json.loads(await request.body())
+        stats["calls"] += 1
+        delay = distribution.sample(rng)
+
+        if rng.random() < error_rate:
+            stats["errors"] += 1
+            await asyncio.sleep(delay / 2)
+            return JSONResponse({"error": {"message": "mock upstream error"}}, status_code=error_status)
+
+        reply = choose_reply(body)
+        if not body.get("stream"):
+            await asyncio.sleep(delay)
+            return {"choices": [{"message": {"role": "assistant", "content": reply}}]}
+
+        stats["streams"] += 1
+        words = reply.split(" ")
+        chunks = [" ".join(words[i:i + 4]) + " " for i in range(0, len(words), 4)]
+
+        async def events():
+            # Half the delay before the first token, the rest spread over the chunks
+            await asyncio.sleep(delay / 2)
+            for chunk in chunks:
+                yield f"data: {json.dumps({'choices': [{'delta': {'content': chunk}}]})}\n\n"
+                await asyncio.sleep(delay / 2 / len(chunks))
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def get_stats():
+        return {**stats, "latency": str(distribution), "error_rate": error_rate, "violation_rate": violation_rate}
+
+    return app
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency", default="fixed:0.2", help="fixed:S | uniform:LO,HI | lognormal:MEDIAN,SIGMA | exponential:MEAN")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of calls answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--violation-rate", type=float, default=0.0, help="share of first answers containing banned verbs")
+    parser.add_argument("--heavy-violation-share", type=float, default=0.5, help="share of violations too heavy to fix locally")
+    parser.add_argument("--rewrite-violation-rate", type=float, default=0.0, help="share of rewrites that still violate")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def mock_app_from_args(args) -> FastAPI:
+    return create_mock_app(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        violation_rate=args.violation_rate,
+        heavy_violation_share=args.heavy_violation_share,
+        rewrite_violation_rate=args.rewrite_violation_rate,
+        seed=args.seed,
+    )
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(mock_app_from_args(args), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+import os
+import tempfile
+
+# Uploaded SOPs and other rows go to a throwaway database, never ./sql_app.db;
+# set before any app module reads the settings
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='sop-tests-')}/test.db")
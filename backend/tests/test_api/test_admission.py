@@ -0,0 +1,56 @@
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app, ai_service, admission, rate_limiter
+from app.http_client import PooledHTTPClient
+from app.admission import MemoryBucketStore
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def upstream(monkeypatch):
+    def handler(request):
+        return httpx.Response(200, json={"choices": [{"message": {"content": "LOTO keeps people safe."}}]})
+
+    monkeypatch.setattr(ai_service, "http_client", PooledHTTPClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(ai_service, "response_cache", None)
+
+
+def test_rate_limited_client_gets_429_with_retry_after(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "per_minute", 6)
+    monkeypatch.setattr(rate_limiter, "burst", 2)
+    monkeypatch.setattr(rate_limiter, "store", MemoryBucketStore())
+
+    statuses = [client.post("/api/chat", json={"question": "What is LOTO?"}).status_code for _ in range(3)]
+    limited = client.post("/api/chat/stream", json={"question": "What is LOTO?"})
+
+    assert statuses == [200, 200, 429]
+    assert limited.status_code == 429
+    assert 1 <= int(limited.headers["Retry-After"]) <= 10
+    # Other endpoints are never limited
+    assert client.get("/api/sops").status_code == 200
+
+
+def test_full_queue_is_rejected_with_retry_after(monkeypatch):
+    monkeypatch.setattr(admission, "max_concurrent", 0)
+    monkeypatch.setattr(admission, "max_queue", 0)
+    rejected_before = admission.rejected
+
+    response = client.post("/api/chat", json={"question": "What is LOTO?"})
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"].isdigit()
+    assert admission.rejected == rejected_before + 1
+
+
+def test_health_reports_admission_and_rate_limit():
+    client.post("/api/chat", json={"question": "What is LOTO?"})
+
+    body = client.get("/api/health").json()
+
+    assert body["admission"]["in_flight"] == 0
+    assert body["admission"]["admitted"] >= 1
+    assert "queue_depth" in body["admission"] and "avg_wait_ms" in body["admission"]
+    assert body["rate_limit"]["enabled"] is False
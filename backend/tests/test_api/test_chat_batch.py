@@ -0,0 +1,99 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.main import app, ai_service
+from app.http_client import PooledHTTPClient
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    state = {"calls": 0, "active": 0, "peak": 0}
+
+    async def handler(request):
+        state["calls"] += 1
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        question = json.loads(request.content)["messages"][1]["content"]
+        await asyncio.sleep(0.02)
+        state["active"] -= 1
+        answer = f"Conceptual answer about {question.split()[-1]}"
+        return httpx.Response(200, json={"choices": [{"message": {"content": answer}}]})
+
+    monkeypatch.setattr(ai_service, "http_client", PooledHTTPClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(ai_service, "response_cache", None)
+    return state
+
+
+def read_lines(response):
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+def test_batch_streams_ndjson_with_bounded_concurrency(upstream, monkeypatch):
+    monkeypatch.setattr(main.settings, "BATCH_MAX_CONCURRENCY", 3)
+    items = [{"question": f"Why does this exist: rule number{i}"} for i in range(10)]
+
+    response = client.post("/api/chat/batch", json={"items": items})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = read_lines(response)
+    results = {line["index"]: line for line in lines[:-1]}
+    assert sorted(results) == list(range(10))
+    assert "number7" in results[7]["response"]
+    assert lines[-1]["summary"] == {"items": 10, "answered": 10, "filtered": 0, "errors": 0}
+    assert upstream["calls"] == 10
+    assert upstream["peak"] <= 3
+
+
+def test_filtered_and_invalid_items_short_circuit(upstream):
+    items = [
+        {"question": "Can I skip the lockout step?"},
+        {"question": "   "},
+        {"question": "Why does LOTO exist"},
+    ]
+
+    lines = read_lines(client.post("/api/chat/batch", json={"items": items}))
+    results = {line["index"]: line for line in lines[:-1]}
+
+    assert results[0]["filtered"] is True and results[0]["safe"] is False
+    assert results[1]["error"] == "Question cannot be empty"
+    assert results[2]["safe"] is True
+    assert lines[-1]["summary"] == {"items": 3, "answered": 1, "filtered": 1, "errors": 1}
+    assert upstream["calls"] == 1
+
+
+def test_batch_size_is_limited(monkeypatch):
+    monkeypatch.setattr(main.settings, "BATCH_MAX_ITEMS", 2)
+    response = client.post("/api/chat/batch", json={"items": [{"question": "Why?"}] * 3})
+    assert response.status_code == 400
+
+
+def test_each_item_holds_its_own_admission_slot(upstream, monkeypatch):
+    monkeypatch.setattr(main.admission, "max_concurrent", 2)
+    admitted = main.admission.admitted
+    items = [{"question": f"Why does this exist: rule number{i}"} for i in range(6)]
+
+    lines = read_lines(client.post("/api/chat/batch", json={"items": items}))
+
+    assert lines[-1]["summary"]["answered"] == 6
+    assert main.admission.admitted == admitted + 6
+    assert main.admission.stats()["in_flight"] == 0
+    # BATCH_MAX_CONCURRENCY is 8, but only two slots exist
+    assert upstream["peak"] <= 2
+
+
+def test_items_without_an_admission_slot_report_busy(upstream, monkeypatch):
+    monkeypatch.setattr(main.admission, "max_concurrent", 0)
+    monkeypatch.setattr(main.admission, "max_queue", 0)
+
+    lines = read_lines(client.post("/api/chat/batch", json={"items": [{"question": "Why does LOTO exist"}]}))
+
+    assert lines[0]["error"] == "Server is busy. Please try again shortly."
+    assert upstream["calls"] == 0
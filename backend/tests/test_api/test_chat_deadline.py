@@ -0,0 +1,56 @@
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app, ai_service
+from app.http_client import PooledHTTPClient
+
+client = TestClient(app)
+
+VIOLATING = "LOTO matters. " + "You should turn the key now. " * 20
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    def install(handler):
+        monkeypatch.setattr(ai_service, "http_client", PooledHTTPClient(transport=httpx.MockTransport(handler)))
+        monkeypatch.setattr(ai_service, "response_cache", None)
+    return install
+
+
+def reply(text):
+    return httpx.Response(200, json={"choices": [{"message": {"content": text}}]})
+
+
+def test_short_budget_skips_rewrite_for_canned_answer(upstream):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return reply(VIOLATING)
+
+    upstream(handler)
+    response = client.post("/api/chat", json={"question": "Explain LOTO", "deadline_ms": 1000})
+
+    assert response.status_code == 200
+    assert response.json()["response"] == ai_service.FALLBACK_RESPONSE
+    assert len(calls) == 1
+
+
+def test_transient_upstream_error_is_retried(upstream):
+    statuses = [503]
+
+    def handler(request):
+        if statuses:
+            return httpx.Response(statuses.pop())
+        return reply("LOTO keeps people safe from hazardous energy.")
+
+    upstream(handler)
+    response = client.post("/api/chat", json={"question": "Why does LOTO exist?"})
+
+    assert "hazardous energy" in response.json()["response"]
+
+
+def test_deadline_must_be_positive():
+    response = client.post("/api/chat", json={"question": "Explain LOTO", "deadline_ms": 0})
+    assert response.status_code == 422
@@ -0,0 +1,156 @@
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app, ai_service
+from app.http_client import PooledHTTPClient
+
+client = TestClient(app)
+
+
+def sse_body(chunks):
+    lines = [": OPENROUTER PROCESSING\n\n"]
+    for chunk in chunks:
+        lines.append("data: " + json.dumps({"choices": [{"delta": {"content": chunk}}]}) + "\n\n")
+    lines.append("data: [DONE]\n\n")
+    return "".join(lines).encode()
+
+
+def mock_upstream(stream_chunks, rewrite="Conceptual rewrite focused on purpose."):
+    calls = {"stream": 0, "complete": 0}
+
+    def handler(request):
+        payload = json.loads(request.content)
+        if payload.get("stream"):
+            calls["stream"] += 1
+            return httpx.Response(200, content=sse_body(stream_chunks))
+        calls["complete"] += 1
+        return httpx.Response(200, json={"choices": [{"message": {"content": rewrite}}]})
+
+    return PooledHTTPClient(transport=httpx.MockTransport(handler)), calls
+
+
+def parse_events(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = block.split("\n")
+        kind = lines[0][len("event: "):]
+        data = json.loads(lines[1][len("data: "):])
+        events.append((kind, data))
+    return events
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    def install(*args, **kwargs):
+        pool, calls = mock_upstream(*args, **kwargs)
+        monkeypatch.setattr(ai_service, "http_client", pool)
+        monkeypatch.setattr(ai_service, "response_cache", None)
+        return calls
+    return install
+
+
+def test_stream_forwards_compliant_tokens(upstream):
+    words = ["Lockout ", "tagout ", "exists ", "to ", "protect ", "people ", "from ", "hazardous ", "energy. "] * 10
+    calls = upstream(words)
+
+    response = client.post("/api/chat/stream", json={"question": "Explain LOTO"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = parse_events(response.text)
+    kinds = [kind for kind, _ in events]
+    assert kinds[-1] == "done"
+    assert kinds.count("token") > 1
+    assert "reset" not in kinds
+
+    streamed = "".join(data["content"] for kind, data in events if kind == "token")
+    done = events[-1][1]
+    assert streamed == done["response"]
+    assert done["safe"] is True and done["filtered"] is False
+    assert "Safety Disclaimer" in done["response"]
+    assert calls == {"stream": 1, "complete": 0}
+
+
+def test_stream_small_violation_is_fixed_locally(upstream):
+    words = ["LOTO ", "protects ", "people. "] * 40 + ["You ", "should ", "turn ", "the ", "key ", "now. "] + ["Energy ", "stays ", "controlled. "] * 10
+    calls = upstream(words)
+    local_before = ai_service.compliance_paths["local"]
+
+    response = client.post("/api/chat/stream", json={"question": "Explain LOTO"})
+    events = parse_events(response.text)
+    kinds = [kind for kind, _ in events]
+
+    # The compliant prefix already shown stays valid, so nothing is retracted
+    assert "reset" not in kinds
+    streamed = "".join(data["content"] for kind, data in events if kind == "token")
+    done = events[-1][1]
+    assert streamed == done["response"]
+    assert "turn the" not in done["response"].lower()
+    assert "Energy stays controlled." in done["response"]
+    assert ai_service.compliance_paths["local"] == local_before + 1
+    assert calls == {"stream": 1, "complete": 0}
+
+
+def test_stream_heavy_violation_switches_to_rewrite(upstream):
+    words = ["LOTO ", "protects ", "people. "] * 5 + ["You ", "should ", "turn ", "the ", "key ", "now. "] * 40
+    calls = upstream(words)
+
+    response = client.post("/api/chat/stream", json={"question": "Explain LOTO"})
+    events = parse_events(response.text)
+    kinds = [kind for kind, _ in events]
+
+    assert "reset" in kinds
+    streamed_before_reset = "".join(data["content"] for kind, data in events[:kinds.index("reset")] if kind == "token")
+    assert "turn the" not in streamed_before_reset.lower()
+
+    done = events[-1][1]
+    assert done["response"].startswith("Conceptual rewrite focused on purpose.")
+    assert done["safe"] is True
+    assert calls == {"stream": 1, "complete": 1}
+
+
+def test_stream_is_closed_after_a_bounded_tail_past_a_violation(monkeypatch):
+    words = ["LOTO ", "protects ", "people. "] * 40 + ["You ", "should ", "turn ", "the ", "key ", "now. "]
+    words += ["Energy ", "stays ", "controlled. "] * 1000
+    body = sse_body(words).split(b"\n\n")
+    sent = {"events": 0}
+
+    async def events():
+        for event in body:
+            sent["events"] += 1
+            yield event + b"\n\n"
+
+    def handler(request):
+        return httpx.Response(200, content=events())
+
+    monkeypatch.setattr(ai_service, "http_client", PooledHTTPClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(ai_service, "response_cache", None)
+
+    response = client.post("/api/chat/stream", json={"question": "Explain LOTO"})
+    done = parse_events(response.text)[-1][1]
+
+    assert sent["events"] < len(body) // 2
+    assert done["safe"] is True
+    assert "turn the" not in done["response"].lower()
+    assert done["response"].split("\n")[0].rstrip().endswith(".")
+    assert done["response"].count("Energy stays controlled.") < 100
+
+
+def test_stream_filtered_query_short_circuits(upstream):
+    calls = upstream(["unused "])
+
+    response = client.post("/api/chat/stream", json={"question": "Can I skip the lockout step?"})
+    events = parse_events(response.text)
+
+    assert [kind for kind, _ in events] == ["done"]
+    assert events[0][1]["safe"] is False
+    assert events[0][1]["filtered"] is True
+    assert calls == {"stream": 0, "complete": 0}
+
+
+def test_stream_rejects_empty_question():
+    response = client.post("/api/chat/stream", json={"question": "  "})
+    assert response.status_code == 400
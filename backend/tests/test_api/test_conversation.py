@@ -0,0 +1,64 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.conversation_history import ConversationHistory
+from app.http_client import PooledHTTPClient
+
+client = TestClient(main.app)
+
+
+@pytest.fixture
+def prompts(monkeypatch):
+    seen = []
+
+    def handler(request):
+        seen.append(json.loads(request.content)["messages"][-1]["content"])
+        return httpx.Response(200, json={"choices": [{"message": {"content": f"Conceptual answer number {len(seen)}."}}]})
+
+    monkeypatch.setattr(main.ai_service, "http_client", PooledHTTPClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(main.ai_service, "response_cache", None)
+    monkeypatch.setattr(main, "conversation_history", ConversationHistory())
+    return seen
+
+
+def test_follow_up_carries_earlier_turns(prompts):
+    first = client.post("/api/chat", json={"question": "What is hazardous energy in hydraulic presses?"}).json()
+    conversation_id = first["conversation_id"]
+
+    second = client.post("/api/chat", json={"question": "And why does that matter?", "conversation_id": conversation_id})
+
+    assert second.status_code == 200
+    assert second.json()["conversation_id"] == conversation_id
+    assert "Conversation So Far" not in prompts[0]
+    assert "User: What is hazardous energy in hydraulic presses?" in prompts[1]
+    assert "Assistant: Conceptual answer number 1." in prompts[1]
+    assert "Safety Disclaimer" not in prompts[1]
+
+
+def test_stream_returns_and_continues_the_conversation(prompts):
+    conversation_id = ConversationHistory.new_id()
+    client.post("/api/chat", json={"question": "What is LOTO?", "conversation_id": conversation_id})
+
+    def sse(request):
+        prompts.append(json.loads(request.content)["messages"][-1]["content"])
+        body = 'data: {"choices": [{"delta": {"content": "Streamed concept."}}]}\n\ndata: [DONE]\n\n'
+        return httpx.Response(200, content=body.encode())
+
+    main.ai_service.http_client = PooledHTTPClient(transport=httpx.MockTransport(sse))
+    response = client.post("/api/chat/stream", json={"question": "Why?", "conversation_id": conversation_id})
+
+    done = [block for block in response.text.split("\n\n") if block.startswith("event: done")][0]
+    assert json.loads(done.split("data: ", 1)[1])["conversation_id"] == conversation_id
+    assert "User: What is LOTO?" in prompts[-1]
+    assert asyncio.run(main.conversation_history.load(conversation_id))["turns"][-1][0] == "Why?"
+
+
+def test_malformed_conversation_id_is_rejected(prompts):
+    response = client.post("/api/chat", json={"question": "Why?", "conversation_id": "not-an-id"})
+    assert response.status_code == 400
+    assert prompts == []
@@ -0,0 +1,67 @@
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.http_client import PooledHTTPClient
+from app.ingestion import IngestionPipeline
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "ingestion", IngestionPipeline(spool_dir=str(tmp_path), max_workers=0))
+    monkeypatch.setattr(
+        main, "http_client", PooledHTTPClient(transport=httpx.MockTransport(lambda r: httpx.Response(200)))
+    )
+    with TestClient(main.app) as client:
+        yield client
+
+
+def wait_for_job(client, status_url):
+    for _ in range(200):
+        job = client.get(status_url).json()
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError("ingestion job did not finish")
+
+
+def test_upload_returns_job_and_indexes_document(client):
+    response = client.post(
+        "/api/documents/upload",
+        files={"document": ("guarding.md", b"# Purpose\nGuards stay closed.\n\n# Scope\nAll presses.")},
+        data={"title": "Machine Guarding"},
+    )
+
+    assert response.status_code == 202
+    body = response.json()
+    assert body["fileName"] == "guarding.md"
+
+    job = wait_for_job(client, body["status_url"])
+    assert job["status"] == "done"
+    sops = {sop["id"]: sop["title"] for sop in client.get("/api/sops").json()}
+    assert sops[job["sop_id"]] == "Machine Guarding"
+
+
+def test_unknown_job_is_404(client):
+    assert client.get("/api/documents/jobs/nope").status_code == 404
+
+
+def test_declared_oversized_upload_is_refused_before_reading(client, monkeypatch):
+    monkeypatch.setattr(main.ingestion, "max_bytes", 1024)
+    spooled = []
+    monkeypatch.setattr(main.ingestion, "spool_form", lambda *args: spooled.append(args))
+
+    response = client.post(
+        "/api/documents/upload",
+        files={"document": ("big.txt", b"x" * (main.UPLOAD_FORM_OVERHEAD_BYTES + 2048))},
+    )
+
+    assert response.status_code == 413
+    assert spooled == []
+
+
+def test_upload_without_a_document_is_rejected(client):
+    assert client.post("/api/documents/upload", data={"title": "No file"}).status_code == 422
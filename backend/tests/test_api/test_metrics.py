@@ -0,0 +1,45 @@
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app, ai_service
+from app.http_client import PooledHTTPClient
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def upstream(monkeypatch):
+    def handler(request):
+        if b"broken" in request.content:
+            return httpx.Response(400)
+        return httpx.Response(200, json={"choices": [{"message": {"content": "LOTO keeps people safe."}}]})
+
+    monkeypatch.setattr(ai_service, "http_client", PooledHTTPClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(ai_service, "response_cache", None)
+
+
+def test_metrics_cover_chat_stages():
+    client.post("/api/chat", json={"question": "What is hazardous energy?"})
+    client.post("/api/chat", json={"question": "Is it safe to skip LOTO?"})
+    client.post("/api/chat", json={"question": "Explain the broken interlock"})
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert 'sop_http_request_duration_seconds_count{path="/api/chat",status="200"}' in text
+    assert "sop_safety_filter_seconds_count" in text
+    assert 'sop_safety_filter_results_total{result="refused"}' in text
+    assert "sop_compliance_scan_seconds_count" in text
+    assert 'sop_compliance_outcomes_total{path="clean"}' in text
+    assert f'sop_upstream_request_seconds_count{{model="{ai_service.model}",mode="complete"}}' in text
+    assert f'sop_upstream_errors_total{{model="{ai_service.model}",code="400"}}' in text
+    assert "sop_admission_queue_depth 0" in text
+
+
+def test_route_parameters_do_not_become_label_values():
+    client.get("/api/documents/jobs/not-a-real-job")
+
+    assert 'path="/api/documents/jobs/{job_id}",status="404"' in client.get("/metrics").text
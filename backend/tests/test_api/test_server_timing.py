@@ -0,0 +1,98 @@
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.main import app, ai_service
+from app.http_client import PooledHTTPClient
+from app.profiling import ProfileStore
+
+client = TestClient(app)
+
+VIOLATING = "LOTO matters. " + "You should turn the key now. " * 20
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    def install(text):
+        def handler(request):
+            return httpx.Response(200, json={"choices": [{"message": {"content": text}}]})
+        monkeypatch.setattr(ai_service, "http_client", PooledHTTPClient(transport=httpx.MockTransport(handler)))
+        monkeypatch.setattr(ai_service, "response_cache", None)
+    return install
+
+
+def stages(response):
+    return {part.split(";")[0] for part in response.headers["Server-Timing"].split(", ")}
+
+
+def test_server_timing_lists_chat_stages(upstream):
+    upstream("LOTO keeps people safe from hazardous energy.")
+
+    response = client.post("/api/chat", json={"question": "What is LOTO?", "sop_id": "demo_loto"})
+
+    assert response.status_code == 200
+    assert {"sop", "filter", "cache", "prompt", "completion", "scan", "total"} <= stages(response)
+    assert "X-Profile-Id" not in response.headers
+
+
+def test_server_timing_shows_rewrite(upstream):
+    upstream(VIOLATING)
+
+    response = client.post("/api/chat", json={"question": "Explain the lockout key"})
+
+    assert "rewrite" in stages(response)
+
+
+def test_refused_question_stops_after_filter(upstream):
+    upstream("unused")
+
+    response = client.post("/api/chat", json={"question": "Is it safe to skip LOTO?"})
+
+    assert "filter" in stages(response) and "completion" not in stages(response)
+
+
+def test_profiling_requires_admin(upstream, monkeypatch):
+    upstream("LOTO keeps people safe.")
+    monkeypatch.setattr(main.settings, "ADMIN_API_KEY", "secret")
+
+    response = client.post("/api/chat?profile=1", json={"question": "What is LOTO?"})
+
+    assert response.status_code == 403
+
+
+def test_admin_profile_is_saved_and_downloadable(upstream, monkeypatch, tmp_path):
+    upstream("LOTO keeps people safe.")
+    monkeypatch.setattr(main.settings, "ADMIN_API_KEY", "secret")
+    monkeypatch.setattr(main, "profiles", ProfileStore(str(tmp_path)))
+    admin = {"X-Admin-Key": "secret"}
+
+    response = client.post(
+        "/api/chat", json={"question": "What is LOTO?"}, headers={**admin, "X-Debug-Profile": "1"}
+    )
+    profile_id = response.headers["X-Profile-Id"]
+
+    listed = client.get("/api/admin/profiles", headers=admin).json()["profiles"]
+    assert [p["profile_id"] for p in listed] == [profile_id]
+    download = client.get(f"/api/admin/profiles/{profile_id}", headers=admin)
+    assert download.status_code == 200
+    assert client.get("/api/admin/profiles/..%2Fsecret", headers=admin).status_code == 404
+
+
+def test_failed_request_still_names_its_profile(upstream, monkeypatch, tmp_path):
+    upstream("unused")
+    monkeypatch.setattr(main.settings, "ADMIN_API_KEY", "secret")
+    monkeypatch.setattr(main, "profiles", ProfileStore(str(tmp_path)))
+    admin = {"X-Admin-Key": "secret", "X-Debug-Profile": "1"}
+
+    rejected = client.post("/api/chat", json={"question": "x" * 1001}, headers=admin)
+
+    async def broken(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(ai_service, "generate_explanation", broken)
+    failed = client.post("/api/chat", json={"question": "What is LOTO?"}, headers=admin)
+
+    assert rejected.status_code == 400 and failed.status_code == 500
+    ids = {rejected.headers["X-Profile-Id"], failed.headers["X-Profile-Id"]}
+    assert {p["profile_id"] for p in client.get("/api/admin/profiles", headers=admin).json()["profiles"]} == ids
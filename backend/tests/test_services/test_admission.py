@@ -0,0 +1,135 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from app.admission import AdmissionLimiter, AdmissionRejected, MemoryBucketStore, RateLimiter, SQLiteBucketStore
+
+
+def test_queue_overflow_is_rejected_and_waiters_are_served_in_order():
+    async def scenario():
+        limiter = AdmissionLimiter(max_concurrent=1, max_queue=2, max_wait_seconds=5)
+        order = []
+
+        async def request(name, hold):
+            await limiter.acquire()
+            order.append(name)
+            await asyncio.sleep(hold)
+            limiter.release(hold)
+
+        first = asyncio.create_task(request("first", 0.05))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(request(name, 0)) for name in ("second", "third")]
+        await asyncio.sleep(0)
+        assert limiter.stats()["queue_depth"] == 2
+
+        with pytest.raises(AdmissionRejected) as rejected:
+            await limiter.acquire()
+        assert rejected.value.retry_after >= 1
+
+        await asyncio.gather(first, *waiters)
+        return limiter, order
+
+    limiter, order = asyncio.run(scenario())
+    stats = limiter.stats()
+    assert order == ["first", "second", "third"]
+    assert stats["in_flight"] == 0 and stats["admitted"] == 3 and stats["rejected"] == 1
+    assert stats["max_queue_depth"] == 2 and stats["max_wait_ms"] > 0
+
+
+def test_waiting_too_long_is_rejected():
+    async def scenario():
+        limiter = AdmissionLimiter(max_concurrent=1, max_queue=5, max_wait_seconds=0.01)
+        await limiter.acquire()
+        with pytest.raises(AdmissionRejected):
+            await limiter.acquire()
+        limiter.release()
+        return limiter
+
+    stats = asyncio.run(scenario()).stats()
+    assert stats["timed_out"] == 1 and stats["queue_depth"] == 0 and stats["in_flight"] == 0
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    async def scenario():
+        limiter = AdmissionLimiter(max_concurrent=1, max_queue=5, max_wait_seconds=5)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        limiter.release()
+        await asyncio.wait_for(limiter.acquire(), 1)
+        return limiter
+
+    assert asyncio.run(scenario()).stats()["in_flight"] == 1
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_token_bucket_allows_burst_then_refills(tmp_path, shared):
+    store = SQLiteBucketStore(str(tmp_path / "limits.sqlite3")) if shared else MemoryBucketStore()
+
+    waits = [store.take("ip:1", rate=1.0, burst=3, now=100.0) for _ in range(4)]
+    assert waits[:3] == [0, 0, 0] and waits[3] == pytest.approx(1.0)
+    assert store.take("ip:2", rate=1.0, burst=3, now=100.0) == 0
+    assert store.take("ip:1", rate=1.0, burst=3, now=101.5) == 0
+    store.close()
+
+
+def test_sqlite_buckets_are_shared_between_workers(tmp_path):
+    path = str(tmp_path / "limits.sqlite3")
+    worker_a = RateLimiter(per_minute=60, burst=2, sqlite_path=path)
+    worker_b = RateLimiter(per_minute=60, burst=2, sqlite_path=path)
+
+    assert asyncio.run(worker_a.check("ip:1")) == 0
+    assert asyncio.run(worker_b.check("ip:1")) == 0
+    assert asyncio.run(worker_a.check("ip:1")) > 0
+    assert worker_a.stats()["limited"] == 1 and worker_b.stats()["clients"] == 1
+
+
+@pytest.mark.parametrize("fail_open", [True, False])
+def test_busy_shared_store_fails_fast_with_the_configured_policy(tmp_path, fail_open):
+    path = str(tmp_path / "limits.sqlite3")
+    limiter = RateLimiter(per_minute=60, burst=2, sqlite_path=path, sqlite_timeout=0.05, fail_open=fail_open)
+    holder = sqlite3.connect(path, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    try:
+        started = time.perf_counter()
+        wait = asyncio.run(limiter.check("ip:1"))
+        elapsed = time.perf_counter() - started
+    finally:
+        holder.execute("ROLLBACK")
+        holder.close()
+
+    assert elapsed < 1
+    assert limiter.stats()["errors"] == 1
+    limiter.close()
+    assert (wait == 0) if fail_open else (wait > 0)
+
+
+def test_client_keys_always_include_the_address():
+    limiter = RateLimiter(per_minute=60, burst=2, sqlite_path="")
+    scope = {"client": ("10.0.0.1", 5000), "headers": [(b"x-forwarded-for", b"1.2.3.4")]}
+
+    assert limiter.client_keys(scope) == ["ip:10.0.0.1"]
+    limiter.trust_forwarded = True
+    assert limiter.client_keys(scope) == ["ip:1.2.3.4"]
+    scope["headers"].append((b"authorization", b"Bearer abc"))
+    keys = limiter.client_keys(scope)
+    assert keys[0] == "ip:1.2.3.4" and keys[1].startswith("auth:")
+
+
+def test_fresh_authorization_headers_do_not_reset_the_address_bucket():
+    limiter = RateLimiter(per_minute=60, burst=2, sqlite_path="")
+
+    def scope(token):
+        return {"client": ("10.0.0.1", 5000), "headers": [(b"authorization", f"Bearer {token}".encode())]}
+
+    waits = [asyncio.run(limiter.check(*limiter.client_keys(scope(n)))) for n in range(3)]
+
+    assert waits[:2] == [0, 0] and waits[2] > 0
+    # A known token is its own extra limit, whatever address it comes from
+    other = {"client": ("10.0.0.2", 5000), "headers": [(b"authorization", b"Bearer 0")]}
+    assert asyncio.run(limiter.check(*limiter.client_keys(other))) == 0
+    assert asyncio.run(limiter.check(*limiter.client_keys(other))) > 0
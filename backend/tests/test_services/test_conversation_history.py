@@ -0,0 +1,71 @@
+import asyncio
+import threading
+
+from app.conversation_history import ConversationHistory
+from app.sop_index import estimate_tokens
+
+DISCLAIMER = "\n\n⚠️ Safety Disclaimer: This explanation is for educational purposes only."
+
+
+def long_answer(n):
+    return f"Answer {n} explains why stored energy matters. " + "Background detail. " * 80 + DISCLAIMER
+
+
+def test_window_stays_bounded_as_old_turns_roll_into_the_summary():
+    history = ConversationHistory(window_tokens=400, summary_tokens=120, turn_tokens=60)
+    conversation_id = history.new_id()
+
+    for n in range(30):
+        state = asyncio.run(history.load(conversation_id))
+        question = f"Question {n} about hydraulic accumulators?"
+        asyncio.run(history.append(conversation_id, state, question, long_answer(n)))
+
+    state = asyncio.run(history.load(conversation_id))
+    window = history.window(state)
+
+    assert estimate_tokens(window) <= 400
+    assert "Question 29 about hydraulic accumulators?" in window
+    assert state["summary"] and state["summary"][-1].startswith("- Asked: Question")
+    assert state["rolled"] == 30 - len(state["turns"])
+    # Stored compactly: no disclaimer, answers capped
+    assert all("Safety Disclaimer" not in answer and estimate_tokens(answer) <= 61 for _, answer in state["turns"])
+    assert asyncio.run(history.stats())["stored_bytes"] < 2000
+
+
+def test_unknown_or_expired_conversations_start_empty():
+    history = ConversationHistory(max_age_seconds=0)
+    conversation_id = history.new_id()
+    state = asyncio.run(history.load(conversation_id))
+    asyncio.run(history.append(conversation_id, state, "Why LOTO?", "It controls hazardous energy."))
+
+    assert asyncio.run(history.load(conversation_id))["turns"] == []
+    assert history.window(asyncio.run(history.load(history.new_id()))) == ""
+    assert ConversationHistory.valid_id(conversation_id)
+    assert not ConversationHistory.valid_id("../etc/passwd")
+
+
+def test_sqlite_store_shares_history_between_workers(tmp_path):
+    path = str(tmp_path / "history.sqlite3")
+    first, second = ConversationHistory(sqlite_path=path), ConversationHistory(sqlite_path=path)
+    conversation_id = first.new_id()
+
+    state = asyncio.run(first.load(conversation_id))
+    asyncio.run(first.append(conversation_id, state, "Why LOTO?", "It controls hazardous energy."))
+    state = asyncio.run(second.load(conversation_id))
+
+    assert ConversationHistory.last_question(state) == "Why LOTO?"
+    assert "Assistant: It controls hazardous energy." in second.window(state)
+    first.close()
+    second.close()
+
+
+def test_sqlite_store_runs_off_the_event_loop(tmp_path):
+    history = ConversationHistory(sqlite_path=str(tmp_path / "history.sqlite3"))
+    threads = []
+    get = history.store.get
+    history.store.get = lambda *args: threads.append(threading.current_thread()) or get(*args)
+
+    asyncio.run(history.load(history.new_id()))
+
+    assert threads and threads[0] is not threading.main_thread()
+    history.close()
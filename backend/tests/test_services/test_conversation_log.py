@@ -0,0 +1,127 @@
+import asyncio
+
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app import conversation_log as conversation_log_module
+from app.conversation_log import ConversationLog
+from app.db.database import create_engine, init_db
+from app.models.conversation import Conversation
+
+
+def run_with_log(tmp_path, scenario, **options):
+    async def main():
+        engine = create_engine(f"sqlite:///{tmp_path / 'log.db'}")
+        log = ConversationLog(engine=engine, **options)
+        await log.start()
+        try:
+            result = await scenario(log)
+            await log.close()
+            async with async_sessionmaker(engine)() as session:
+                rows = await session.scalar(select(func.count()).select_from(Conversation))
+            return result, rows, log.stats()
+        finally:
+            await engine.dispose()
+    return asyncio.run(main())
+
+
+def record(log, n):
+    return log.record(message=f"question {n}", response="answer", safe=True, latency_ms=12.5, sop_id="demo_loto")
+
+
+def test_rows_are_written_in_batches_and_flushed_on_close(tmp_path):
+    async def scenario(log):
+        for n in range(7):
+            assert await record(log, n)
+            await asyncio.sleep(0.01)
+        # Both full batches' flushes are already under way; wait for them, not for a timer
+        for _ in range(200):
+            if log.stats()["written"] >= 6:
+                break
+            await asyncio.sleep(0.01)
+        return log.stats()["written"]
+
+    written_before_close, rows, stats = run_with_log(tmp_path, scenario, batch_size=3, flush_interval=60)
+
+    # Two full batches went out on their own; the last row only on close()
+    assert written_before_close == 6
+    assert rows == 7
+    assert stats["batches"] == 3 and stats["max_batch"] == 3 and stats["pending"] == 0
+
+
+def test_partial_batch_is_flushed_after_the_interval(tmp_path):
+    async def scenario(log):
+        await record(log, 1)
+        await record(log, 2)
+        await asyncio.sleep(0.2)
+        return log.stats()["written"]
+
+    written, rows, _ = run_with_log(tmp_path, scenario, batch_size=100, flush_interval=0.05)
+
+    assert written == 2 and rows == 2
+
+
+def test_full_buffer_applies_backpressure_then_drops(tmp_path, monkeypatch):
+    original = conversation_log_module.ConversationRepository.insert_many
+
+    async def slow_insert(self, rows):
+        await asyncio.sleep(0.3)
+        await original(self, rows)
+
+    monkeypatch.setattr(conversation_log_module.ConversationRepository, "insert_many", slow_insert)
+
+    async def scenario(log):
+        kept = [await record(log, n) for n in range(6)]
+        return kept, log.stats()
+
+    (kept, during), rows, stats = run_with_log(
+        tmp_path, scenario, batch_size=2, max_pending=2, flush_interval=60, max_wait_seconds=0.02
+    )
+
+    # The first batch leaves the buffer at once, the next fills it; the rest waited and were dropped
+    assert kept == [True, True, True, True, False, False]
+    assert during["pending"] <= 2 and during["waited"] >= 2
+    assert stats["dropped"] == 2 and rows == 4
+
+
+def test_records_are_ignored_until_started_and_text_columns_are_not_indexed():
+    assert asyncio.run(ConversationLog().record(message="q", response="a", safe=True)) is False
+    assert not Conversation.__table__.c.message.index
+    assert not Conversation.__table__.c.response.index
+
+
+def test_startup_adds_new_columns_to_an_existing_conversations_table(tmp_path):
+    async def main():
+        engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+        try:
+            # The table as an earlier release created it, with one row in it
+            async with engine.begin() as connection:
+                await connection.execute(text(
+                    "CREATE TABLE conversations (id INTEGER PRIMARY KEY, user_id INTEGER, "
+                    "message VARCHAR, response VARCHAR)"
+                ))
+                await connection.execute(text("INSERT INTO conversations (message, response) VALUES ('q', 'a')"))
+
+            log = ConversationLog(engine=engine, batch_size=10, flush_interval=60)
+            await log.start()
+            await record(log, 1)
+            await log.close()
+            # Idempotent: a second worker starting up changes nothing
+            await init_db(engine)
+
+            async with engine.connect() as connection:
+                columns = await connection.run_sync(
+                    lambda sync: {c["name"] for c in inspect(sync).get_columns("conversations")}
+                )
+                old = (await connection.execute(text(
+                    "SELECT safe, filtered, created_at FROM conversations WHERE id = 1"
+                ))).one()
+            return columns, tuple(old), log.stats()
+        finally:
+            await engine.dispose()
+
+    columns, old, stats = asyncio.run(main())
+
+    assert {c.name for c in Conversation.__table__.columns} <= columns
+    assert old == (1, 0, 0)
+    assert stats["written"] == 1 and stats["failed"] == 0
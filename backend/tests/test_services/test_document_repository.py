@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.db.database import async_database_url, create_engine, init_db
+from app.db.repositories.document_repository import DocumentRepository
+from app.schemas.document import DocumentCreate, DocumentUpdate
+from app.schemas.user import UserCreate
+from app.services.auth_service import AuthService
+from app.services.document_service import DocumentService
+
+
+def run_with_session(tmp_path, scenario):
+    async def main():
+        engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+        await init_db(engine)
+        try:
+            async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+                return await scenario(session)
+        finally:
+            await engine.dispose()
+    return asyncio.run(main())
+
+
+def test_plain_urls_map_to_async_drivers():
+    assert async_database_url("sqlite:///./app.db") == "sqlite+aiosqlite:///./app.db"
+    assert async_database_url("postgresql://u:p@db/sop") == "postgresql+asyncpg://u:p@db/sop"
+    assert async_database_url("sqlite+aiosqlite:///x.db") == "sqlite+aiosqlite:///x.db"
+
+
+def test_document_service_crud(tmp_path):
+    async def scenario(session):
+        service = DocumentService(DocumentRepository(session))
+        created = await service.create_document(DocumentCreate(title="LOTO", content="Hazardous energy control"))
+        await service.create_document(DocumentCreate(title="PPE", content="Protective equipment"))
+
+        updated = await service.update_document(created.id, DocumentUpdate(title="Lockout/Tagout"))
+        titles = [document.title for document in await service.get_documents()]
+        await service.delete_document(created.id)
+        with pytest.raises(HTTPException) as missing:
+            await service.get_document(created.id)
+        return created, updated, titles, missing.value.status_code
+
+    created, updated, titles, status = run_with_session(tmp_path, scenario)
+    assert created.created_at > 0
+    assert updated.title == "Lockout/Tagout" and updated.content == "Hazardous energy control"
+    assert titles == ["Lockout/Tagout", "PPE"]
+    assert status == 404
+
+
+def test_auth_service_registers_and_authenticates(tmp_path):
+    async def scenario(session):
+        auth = AuthService(session)
+        user = await auth.register_user(UserCreate(username="sam", email="sam@example.com", password="s3cret"))
+        with pytest.raises(HTTPException) as duplicate:
+            await auth.register_user(UserCreate(username="sam", email="other@example.com", password="x"))
+        ok = await auth.authenticate_user("sam", "s3cret")
+        with pytest.raises(HTTPException) as wrong:
+            await auth.authenticate_user("sam", "wrong")
+        return user, duplicate.value.status_code, ok, wrong.value.status_code
+
+    user, duplicate, ok, wrong = run_with_session(tmp_path, scenario)
+    assert user.username == "sam" and ok.email == "sam@example.com"
+    assert duplicate == 400 and wrong == 401
@@ -0,0 +1,78 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+
+from app.services.embeddings_service import EmbeddingBatcher, EmbeddingsService
+
+
+class RecordingModel:
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.batches = []
+        self.threads = set()
+
+    def encode(self, texts):
+        self.threads.add(threading.current_thread().name)
+        self.batches.append(list(texts))
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("model offline")
+        return np.array([[len(text), i] for i, text in enumerate(texts)], dtype=np.float32)
+
+
+def test_concurrent_calls_share_one_encode():
+    model = RecordingModel()
+    batcher = EmbeddingBatcher(EmbeddingsService(model), max_batch_size=16, max_wait_ms=20)
+
+    async def scenario():
+        return await asyncio.gather(*(batcher.embed("x" * n) for n in range(1, 6)))
+
+    vectors = asyncio.run(scenario())
+
+    assert len(model.batches) == 1
+    assert [v[0] for v in vectors] == [1, 2, 3, 4, 5]  # results reach the right callers
+    assert model.threads != {threading.main_thread().name}
+    assert batcher.stats()["avg_batch_size"] == 5
+
+
+def test_batches_are_capped_at_max_size():
+    model = RecordingModel()
+    batcher = EmbeddingBatcher(EmbeddingsService(model), max_batch_size=4, max_wait_ms=50)
+
+    async def scenario():
+        start = time.perf_counter()
+        await asyncio.gather(*(batcher.embed(f"q{n}") for n in range(10)))
+        return time.perf_counter() - start
+
+    elapsed = asyncio.run(scenario())
+
+    assert [len(batch) for batch in model.batches] == [4, 4, 2]
+    stats = batcher.stats()
+    assert stats["full_batches"] == 2
+    assert stats["largest_batch"] == 4
+    # Full batches go out without waiting for the latency bound
+    assert elapsed < 0.1
+
+
+def test_encode_errors_reach_every_waiter():
+    batcher = EmbeddingBatcher(EmbeddingsService(RecordingModel(fail=True)), max_wait_ms=5)
+
+    async def scenario():
+        return await asyncio.gather(batcher.embed("a"), batcher.embed("b"), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_batcher_survives_a_new_event_loop():
+    batcher = EmbeddingBatcher(EmbeddingsService(RecordingModel()), max_wait_ms=1)
+
+    first = asyncio.run(batcher.embed("one"))
+    second = asyncio.run(batcher.embed("three"))
+
+    assert first[0] == 3 and second[0] == 5
+    batcher.close()
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from app.services.embeddings_service import EmbeddingIndex
+
+
+def brute_force(vectors, query, k):
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = vectors @ (query / np.linalg.norm(query))
+    return list(np.argsort(-scores)[:k])
+
+
+def test_batched_top_k_matches_brute_force():
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((500, 16))
+    queries = rng.standard_normal((4, 16))
+
+    index = EmbeddingIndex(16, initial_capacity=8)
+    index.add(list(range(500)), vectors)
+
+    results = index.search(queries, k=7)
+    for query, result in zip(queries, results):
+        assert [item_id for item_id, _ in result] == brute_force(vectors, query, 7)
+        scores = [score for _, score in result]
+        assert scores == sorted(scores, reverse=True)
+
+
+def test_group_filter_and_removal():
+    index = EmbeddingIndex(3, initial_capacity=2)
+    index.add(["a1", "a2"], np.array([[1, 0, 0], [0.9, 0.1, 0]]), group="sop-a")
+    index.add(["b1"], np.array([[1, 0, 0]]), group="sop-b")
+
+    assert [i for i, _ in index.search(np.array([1, 0, 0]), k=5, groups=["sop-a"])[0]] == ["a1", "a2"]
+
+    assert index.remove("a1")
+    assert not index.remove("a1")
+    assert len(index) == 2
+    assert [i for i, _ in index.search(np.array([1, 0, 0]), k=5, groups=["sop-a"])[0]] == ["a2"]
+
+    assert index.remove_group("sop-b") == 1
+    assert index.search(np.array([1, 0, 0]), k=5, groups=["sop-b"]) == [[]]
+    assert index.search(np.array([1, 0, 0]), k=5, groups=["unknown"]) == [[]]
+
+
+def test_re_adding_id_overwrites_in_place():
+    index = EmbeddingIndex(2)
+    index.add(["x"], np.array([[1, 0]]))
+    index.add(["x"], np.array([[0, 1]]))
+    assert len(index) == 1
+    assert index.search(np.array([0, 1]), k=1)[0][0] == ("x", pytest.approx(1.0))
+
+
+def test_dimension_mismatch_is_rejected():
+    index = EmbeddingIndex(4)
+    with pytest.raises(ValueError):
+        index.add(["x"], np.ones((1, 3)))
+
+
+def test_group_codes_are_freed_with_their_last_row():
+    index = EmbeddingIndex(2, initial_capacity=2)
+    for i in range(1000):
+        index.add([f"q{i}"], np.array([1.0, float(i)]), group=f"partition-{i}")
+        index.remove(f"q{i - 1}")
+
+    assert len(index._group_codes) == 1
+    assert index.search(np.array([1.0, 0.0]), k=1, groups=["partition-999"])[0][0][0] == "q999"
+    assert index.search(np.array([1.0, 0.0]), k=1, groups=["partition-998"]) == [[]]
+
+    # Moving a row to another group frees the group it left
+    index.add(["q999"], np.array([1.0, 0.0]), group="sop-b")
+    assert list(index._group_codes) == ["sop-b"]
+    assert index.remove_group("sop-b") == 1 and not index._group_codes
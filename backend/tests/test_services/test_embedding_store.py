@@ -0,0 +1,189 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app import sample_sops
+from app.services.embedding_store import EmbeddingStore
+
+
+def test_append_is_visible_to_a_second_reader(tmp_path):
+    writer = EmbeddingStore(str(tmp_path), dim=4)
+    reader = EmbeddingStore(str(tmp_path))
+
+    writer.append(["a", "b"], np.eye(4, dtype=np.float32)[:2], group="sop1")
+    size = (tmp_path / "vectors.0.f32").stat().st_size
+    writer.append(["c"], np.eye(4, dtype=np.float32)[2:3], group="sop2")
+
+    # Appending grows the file in place; nothing before it is rewritten
+    assert (tmp_path / "vectors.0.f32").stat().st_size == size + 16
+
+    reader.refresh()
+    assert len(reader) == 3
+    assert np.array_equal(reader.get("c"), [0, 0, 1, 0])
+    assert reader.groups() == {"sop1", "sop2"}
+
+
+def test_dimension_mismatch_is_rejected(tmp_path):
+    store = EmbeddingStore(str(tmp_path), dim=4)
+    with pytest.raises(ValueError):
+        store.append(["a"], np.ones((1, 3)))
+    with pytest.raises(ValueError):
+        EmbeddingStore(str(tmp_path), dim=8)
+
+
+def test_compaction_reclaims_deleted_rows(tmp_path):
+    store = EmbeddingStore(str(tmp_path), dim=2)
+    store.append(["a", "b", "c"], np.array([[1, 0], [0, 1], [1, 1]]), group="g")
+    store.append(["b"], np.array([[2, 2]]), group="g")  # supersedes the old "b"
+    store.delete(["a"])
+
+    result = store.compact()
+
+    assert result == {"rows_before": 4, "rows_after": 2, "reclaimed_rows": 2}
+    assert store.generation == 1
+    assert not (tmp_path / "vectors.0.f32").exists()
+    assert np.array_equal(store.get("b"), [2, 2])
+    assert store.get("a") is None
+
+    reopened = EmbeddingStore(str(tmp_path))
+    assert len(reopened) == 2
+    assert np.array_equal(reopened.get("c"), [1, 1])
+
+
+def test_load_index_searches_stored_vectors(tmp_path):
+    store = EmbeddingStore(str(tmp_path), dim=3)
+    store.append(["x1", "x2"], np.array([[1, 0, 0], [0, 1, 0]]), group="x")
+    store.append(["y1"], np.array([[0.9, 0.1, 0]]), group="y")
+
+    index = store.load_index()
+
+    assert index.search(np.array([1, 0, 0]), k=1)[0][0][0] == "x1"
+    assert index.search(np.array([1, 0, 0]), k=1, groups=["y"])[0][0][0] == "y1"
+
+
+class CountingModel:
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, texts):
+        self.calls += 1
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+
+def test_uploaded_sops_append_and_restarts_skip_unchanged(tmp_path, monkeypatch):
+    from app.services.embeddings_service import EmbeddingsService
+
+    monkeypatch.setattr(sample_sops, "_chunk_embedder", None)
+    monkeypatch.setattr(sample_sops, "_chunk_vectors", None)
+    model = CountingModel()
+    store = EmbeddingStore(str(tmp_path))
+    asyncio.run(sample_sops.enable_chunk_embeddings(EmbeddingsService(model), store))
+    calls = model.calls
+
+    asyncio.run(sample_sops.add_uploaded_sop("emb_test", "Embedding test", "1. Scope\nGuards stay on."))
+    assert model.calls == calls + 1
+    assert "emb_test" in store.groups()
+
+    # Same content after a "restart": nothing is re-embedded
+    asyncio.run(sample_sops.enable_chunk_embeddings(EmbeddingsService(model), EmbeddingStore(str(tmp_path))))
+    assert model.calls == calls + 1
+
+    asyncio.run(sample_sops.add_uploaded_sop("emb_test", "Embedding test", "1. Scope\nReplaced text."))
+    store.refresh()
+    assert model.calls == calls + 2
+    assert store.stats()["dead_rows"] == 1
+
+
+class LockingModel:
+    """Puts texts about locking out close together, whatever words they use"""
+
+    def encode(self, texts):
+        return np.array(
+            [[1.0, 0.0] if ("padlock" in text.lower() or "secure" in text.lower()) else [0.0, 1.0] for text in texts],
+            dtype=np.float32,
+        )
+
+
+def test_stored_vectors_take_part_in_retrieval(tmp_path, monkeypatch):
+    from app.services.embeddings_service import EmbeddingsService
+
+    monkeypatch.setattr(sample_sops, "_chunk_embedder", None)
+    monkeypatch.setattr(sample_sops, "_chunk_vectors", None)
+    chunks = [
+        "1. Scope\nThis procedure covers the packaging line.",
+        "2. Training\nOperators repeat the course every year.",
+        "3. Isolation\nFit your personal padlock to the breaker handle.",
+        "4. Records\nLog each job in the maintenance binder.",
+    ]
+    asyncio.run(sample_sops.add_uploaded_sop("emb_hybrid", "Hybrid test", "\n\n".join(chunks), chunks=chunks))
+    question = "How do I secure the switch?"
+
+    # No term overlap: BM25 alone falls back to the opening section
+    assert asyncio.run(sample_sops.get_sop_context("emb_hybrid", question, token_budget=17)) == chunks[0]
+
+    asyncio.run(sample_sops.enable_chunk_embeddings(EmbeddingsService(LockingModel()), EmbeddingStore(str(tmp_path))))
+    assert asyncio.run(sample_sops.get_sop_context("emb_hybrid", question, token_budget=17)) == chunks[2]
+
+    # Vectors of a replaced text are not used for the new one
+    replaced = chunks[:2] + ["3. Isolation\nAsk the supervisor for the key."] + chunks[3:]
+    asyncio.run(sample_sops.add_uploaded_sop("emb_hybrid", "Hybrid test", "\n\n".join(replaced), chunks=replaced, embed=False))
+    assert asyncio.run(sample_sops.get_sop_context("emb_hybrid", question, token_budget=17)) == replaced[0]
+
+
+class RecordingLockingModel(LockingModel):
+    def __init__(self):
+        self.batches = []
+
+    def encode(self, texts):
+        self.batches.append(list(texts))
+        return super().encode(texts)
+
+
+def test_each_question_is_embedded_once_through_the_shared_batcher(tmp_path, monkeypatch):
+    import httpx
+
+    from app.ai_service import AIService
+    from app.http_client import PooledHTTPClient
+    from app.semantic_cache import SemanticCache, build_embedding_batcher, question_embedder
+    from app.services.embeddings_service import EmbeddingsService
+
+    monkeypatch.setattr(sample_sops, "_chunk_embedder", None)
+    monkeypatch.setattr(sample_sops, "_chunk_vectors", None)
+    chunks = [
+        "1. Scope\nThis procedure covers the packaging line.",
+        "2. Training\nOperators repeat the course every year.",
+        "3. Isolation\nFit your personal padlock to the breaker handle.",
+        "4. Records\nLog each job in the maintenance binder.",
+    ]
+    model = RecordingLockingModel()
+    embeddings = EmbeddingsService(model)
+    batcher = build_embedding_batcher(embeddings)
+    cache = SemanticCache(embeddings, threshold=0.99, batcher=batcher)
+    pool = PooledHTTPClient(transport=httpx.MockTransport(
+        lambda request: httpx.Response(200, json={"choices": [{"message": {"content": "Use your own padlock."}}]})
+    ))
+    service = AIService(http_client=pool, semantic_cache=cache)
+    questions = ["How do I secure the switch?", "Where does the padlock go?"]
+
+    async def scenario():
+        await sample_sops.add_uploaded_sop("emb_once", "Once test", "\n\n".join(chunks), chunks=chunks)
+        await sample_sops.enable_chunk_embeddings(embeddings, EmbeddingStore(str(tmp_path)), batcher)
+        model.batches.clear()
+
+        async def ask(question):
+            embed_query = question_embedder(batcher, question)
+            context = await sample_sops.get_sop_context("emb_once", question, token_budget=17, embed_query=embed_query)
+            version = sample_sops.get_sop_version("emb_once")
+            await service.generate_explanation(question, context, sop_version=version, embed_query=embed_query)
+            return context
+
+        return await asyncio.gather(*(ask(question) for question in questions))
+
+    contexts = asyncio.run(scenario())
+    batcher.close()
+
+    assert contexts == [chunks[2], chunks[2]]
+    # Both questions went to the model together, once, for retrieval and the cache lookup alike
+    assert len(model.batches) == 1 and len(model.batches[0]) == 2
+    assert cache.stats()["lookups"] == 2
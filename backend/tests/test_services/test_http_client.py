@@ -0,0 +1,55 @@
+import asyncio
+
+import httpx
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.ai_service import AIService
+from app.http_client import PooledHTTPClient
+
+
+def completion_transport(content, calls=None):
+    def handler(request):
+        if calls is not None:
+            calls.append(request)
+        return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+    return httpx.MockTransport(handler)
+
+
+def test_generate_explanation_uses_shared_pool():
+    calls = []
+    pool = PooledHTTPClient(transport=completion_transport("LOTO exists to protect people.", calls))
+
+    async def run():
+        await pool.start()
+        try:
+            service = AIService(http_client=pool)
+            first = await service.generate_explanation("Explain LOTO")
+            second = await service.generate_explanation("Explain PPE")
+            return first, second
+        finally:
+            await pool.close()
+
+    first, second = asyncio.run(run())
+    assert first["safe"] and second["safe"]
+    assert len(calls) == 2
+    assert pool.requests_total == 2
+    assert pool.fallback_requests == 0
+    assert pool.peak_in_flight == 1
+
+
+def test_pool_falls_back_before_start():
+    pool = PooledHTTPClient(transport=completion_transport("Purpose-focused answer."))
+    result = asyncio.run(AIService(http_client=pool).generate_explanation("Explain LOTO"))
+    assert "Purpose-focused answer." in result["response"]
+    assert pool.fallback_requests == 1
+    assert pool.stats()["started"] is False
+
+
+def test_health_reports_pool_stats():
+    client = TestClient(app)
+    response = client.get("/api/health")
+    assert response.status_code == 200
+    pool = response.json()["http_pool"]
+    assert "open_connections" in pool
+    assert "requests_total" in pool
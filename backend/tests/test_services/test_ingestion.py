@@ -0,0 +1,117 @@
+import asyncio
+import sys
+
+import pytest
+
+from app import ingestion
+from app.ingestion import IngestionPipeline, normalize_text, parse_document
+
+
+SOP_TEXT = "1. Purpose\r\nKeep guards closed.\r\n\r\n\r\n\r\n2. Scope\r\nApplies to presses.   \r\n"
+
+
+def test_normalize_text():
+    assert normalize_text(SOP_TEXT) == "1. Purpose\nKeep guards closed.\n\n2. Scope\nApplies to presses."
+
+
+def test_parse_document_chunks_sections(tmp_path):
+    path = tmp_path / "press.txt"
+    path.write_bytes(SOP_TEXT.encode())
+
+    content, chunks = parse_document(str(path), "press.txt")
+
+    assert chunks == ["1. Purpose\nKeep guards closed.", "2. Scope\nApplies to presses."]
+
+
+def multipart_body(file_data: bytes, title: str = "Press SOP", boundary: str = "sopboundary"):
+    return (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"title\"\r\n\r\n{title}\r\n"
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"document\"; filename=\"press.txt\"\r\n"
+        f"Content-Type: text/plain\r\n\r\n"
+    ).encode() + file_data + f"\r\n--{boundary}--\r\n".encode()
+
+
+async def in_pieces(data: bytes, size: int, sent: list):
+    for start in range(0, len(data), size):
+        sent.append(size)
+        yield data[start:start + size]
+
+
+def spool_file(pipeline, data: bytes):
+    return pipeline.spool_form("multipart/form-data; boundary=sopboundary", in_pieces(multipart_body(data), 1000, []))
+
+
+def test_form_is_streamed_straight_into_the_spool(tmp_path):
+    pipeline = IngestionPipeline(spool_dir=str(tmp_path), max_bytes=1 << 20)
+    body = multipart_body(SOP_TEXT.encode() * 100)
+
+    path, size, filename, fields = asyncio.run(pipeline.spool_form(
+        "multipart/form-data; boundary=sopboundary", in_pieces(body, 1000, [])
+    ))
+
+    assert path.read_bytes() == SOP_TEXT.encode() * 100 and size == len(SOP_TEXT.encode()) * 100
+    assert filename == "press.txt" and fields == {"title": "Press SOP"}
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_oversized_form_stops_reading_and_is_removed(tmp_path):
+    pipeline = IngestionPipeline(spool_dir=str(tmp_path), max_bytes=2048)
+    body, sent = multipart_body(b"x" * 100000), []
+
+    with pytest.raises(ingestion.UploadTooLarge):
+        asyncio.run(pipeline.spool_form("multipart/form-data; boundary=sopboundary", in_pieces(body, 1000, sent)))
+
+    assert len(sent) < 5
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_form_without_the_file_is_rejected(tmp_path):
+    pipeline = IngestionPipeline(spool_dir=str(tmp_path))
+    body = b"--b\r\nContent-Disposition: form-data; name=\"title\"\r\n\r\nOnly a title\r\n--b--\r\n"
+
+    with pytest.raises(ValueError):
+        asyncio.run(pipeline.spool_form("multipart/form-data; boundary=b", in_pieces(body, 64, [])))
+    with pytest.raises(ValueError):
+        asyncio.run(pipeline.spool_form("application/json", in_pieces(b"{}", 64, [])))
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize("workers", [0, 1])
+def test_pipeline_indexes_in_the_background(tmp_path, workers):
+    pipeline = IngestionPipeline(spool_dir=str(tmp_path), max_workers=workers)
+
+    async def scenario():
+        path, size, _, _ = await spool_file(pipeline, SOP_TEXT.encode())
+        job = pipeline.submit(path, "Press Guarding.txt", size)
+        assert job["status"] == "queued"
+        while pipeline.get(job["job_id"])["status"] not in ("done", "failed"):
+            await asyncio.sleep(0.01)
+        await pipeline.close()
+        return pipeline.get(job["job_id"])
+
+    job = asyncio.run(scenario())
+    # The SOP registry the pipeline writes to (app dir may be on sys.path too)
+    sample_sops = sys.modules[ingestion.add_uploaded_sop.__module__]
+
+    assert job["status"] == "done", job["error"]
+    assert job["chunks"] == 2
+    assert job["sop_id"].startswith("press_guarding_")
+    assert sample_sops.SOP_INDEX.chunk_count(job["sop_id"]) == 2
+    assert sample_sops.SOP_STORE.peek(job["sop_id"])["title"] == "Press Guarding"
+    assert list(tmp_path.iterdir()) == []  # spool file cleaned up
+
+
+def test_failed_parse_is_reported(tmp_path):
+    pipeline = IngestionPipeline(spool_dir=str(tmp_path), max_workers=0)
+
+    async def scenario():
+        path, size, _, _ = await spool_file(pipeline, b"  \n\n  ")
+        job = pipeline.submit(path, "empty.txt", size)
+        while pipeline.get(job["job_id"])["status"] not in ("done", "failed"):
+            await asyncio.sleep(0.01)
+        return pipeline.get(job["job_id"])
+
+    job = asyncio.run(scenario())
+
+    assert job["status"] == "failed"
+    assert "no text" in job["error"]
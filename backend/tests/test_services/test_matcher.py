@@ -0,0 +1,70 @@
+import re
+
+from app.ai_service import AIService
+from app.matcher import CompiledRuleSet
+from app.safety_filter import SafetyFilter
+
+QUERIES = [
+    "Explain the LOTO procedure",
+    "Can I skip the verification step?",
+    "Is it okay to bypass the interlock?",
+    "What should I do right now?",
+    "Is this safe for a new operator?",
+    "I don't have supervisor sign-off, what now",
+    "Why is isolation important for hydraulics?",
+    "Please validate my reasoning",
+    "URGENT: how to restart the press",
+    "Describe PPE categories",
+]
+
+RESPONSES = [
+    "Lockout-tagout protects people from hazardous energy.",
+    "First, disconnect the supply and then lock the panel.",
+    "You should verify the isolation before work begins.",
+    "Open the valve to release pressure, then turn the handle.",
+    "The lockout concept exists to keep equipment inactive.",
+    "Isolation is a concept; nobody should switch anything here.",
+]
+
+
+def test_unsafe_rules_agree_with_pattern_loop():
+    for query in QUERIES:
+        expected = next(
+            (i for i, (_, pattern) in enumerate(SafetyFilter.UNSAFE_PATTERNS) if re.search(pattern, query.lower())),
+            None,
+        )
+        assert SafetyFilter.UNSAFE_RULES.first_rule(query) == expected, query
+
+
+def test_banned_verb_rules_agree_with_pattern_loop():
+    service = AIService()
+    for response in RESPONSES:
+        expected = any(re.search(pattern, response.lower()) for _, pattern in AIService.BANNED_VERBS)
+        assert service._contains_banned_verbs(response)[0] == expected, response
+
+
+def test_scan_reports_every_rule_with_category_and_span():
+    text = "You should turn the key. First, disconnect the feed."
+    matches = AIService.BANNED_VERB_RULES.scan(text)
+
+    found = {(match.category, match.text) for match in matches}
+    assert ("imperative", "You should turn") in found
+    assert ("operational_verb", "turn the") in found
+    assert ("imperative", "First, disconnect") in found
+    assert ("operational_verb", "disconnect the") in found
+    for match in matches:
+        assert text[match.start:match.end] == match.text
+
+
+def test_spans_index_original_text_when_lowering_changes_length():
+    text = "İİ then lock the door"
+    matches = AIService.BANNED_VERB_RULES.scan(text)
+    assert matches
+    for match in matches:
+        assert text[match.start:match.end] == match.text
+
+
+def test_underivable_trigger_falls_back_to_full_search():
+    rules = CompiledRuleSet([("odd", r"(?:lock|tag)out\s+box"), ("plain", r"\bopen\s+the\b")])
+    matches = rules.scan("A lockout box stands near; open the door.")
+    assert [match.category for match in matches] == ["odd", "plain"]
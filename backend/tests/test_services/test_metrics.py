@@ -0,0 +1,122 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+from app.metrics import MetricsRegistry
+
+
+def make_registry():
+    registry = MetricsRegistry()
+    counter = registry.counter("demo_calls_total", "Calls", ("code",))
+    histogram = registry.histogram("demo_seconds", "Latency", buckets=(0.1, 1.0))
+    return registry, counter, histogram
+
+
+def test_exposition_renders_cumulative_histograms_and_counters():
+    registry, counter, histogram = make_registry()
+    registry.gauge("demo_in_flight", "In flight", lambda: 3)
+    counter.inc("200")
+    counter.inc("200")
+    counter.inc("429")
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value)
+
+    text = registry.exposition()
+
+    assert "# TYPE demo_calls_total counter" in text
+    assert 'demo_calls_total{code="200"} 2' in text
+    assert 'demo_calls_total{code="429"} 1' in text
+    assert 'demo_seconds_bucket{le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{le="1"} 2' in text
+    assert 'demo_seconds_bucket{le="+Inf"} 3' in text
+    assert "demo_seconds_count 3" in text
+    assert "demo_seconds_sum 5.55" in text
+    assert "demo_in_flight 3" in text
+
+
+def test_scrape_merges_every_workers_snapshot(tmp_path):
+    registry, counter, histogram = make_registry()
+    counter.inc("200", amount=2)
+    histogram.observe(0.5)
+
+    # Another live worker's published snapshot
+    other, other_counter, other_histogram = make_registry()
+    other_counter.inc("200", amount=3)
+    other_counter.inc("500")
+    other_histogram.observe(0.05)
+    (tmp_path / f"{os.getppid()}.json").write_text(json.dumps(other.snapshot()))
+
+    text = registry.exposition(str(tmp_path))
+
+    assert 'demo_calls_total{code="200"} 5' in text
+    assert 'demo_calls_total{code="500"} 1' in text
+    assert 'demo_seconds_bucket{le="0.1"} 1' in text
+    assert "demo_seconds_count 2" in text
+    # Serving the scrape published this worker's own snapshot too
+    assert len(list(tmp_path.glob("*.json"))) == 2
+
+
+def test_unreadable_snapshot_is_skipped(tmp_path):
+    registry, counter, _ = make_registry()
+    counter.inc("200")
+    (tmp_path / "12345.json").write_text("{not json")
+
+    assert 'demo_calls_total{code="200"} 1' in registry.exposition(str(tmp_path))
+
+
+def _dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_dead_workers_counters_are_archived_not_lost(tmp_path):
+    registry, counter, histogram = make_registry()
+    registry.gauge("demo_in_flight", "In flight", lambda: 1)
+    counter.inc("200")
+    other, other_counter, other_histogram = make_registry()
+    other.gauge("demo_in_flight", "In flight", lambda: 5)
+    other_counter.inc("200", amount=10)
+    other_histogram.observe(0.5)
+
+    crashed = tmp_path / f"{_dead_pid()}.json"
+    crashed.write_text(json.dumps(other.snapshot()))
+
+    first = registry.exposition(str(tmp_path))
+    second = registry.exposition(str(tmp_path))
+
+    for text in (first, second):
+        # Counters and histograms survive the worker; its gauges do not
+        assert 'demo_calls_total{code="200"} 11' in text
+        assert "demo_seconds_count 1" in text
+        assert "demo_in_flight 1" in text
+    assert not crashed.exists()
+    assert sorted(path.name for path in tmp_path.glob("*.json")) == sorted([f"{os.getpid()}.json", "archive.json"])
+
+
+def test_live_worker_that_is_slow_to_flush_is_kept(tmp_path):
+    registry, counter, _ = make_registry()
+    other, other_counter, _ = make_registry()
+    other_counter.inc("200", amount=3)
+    slow = tmp_path / f"{os.getppid()}.json"
+    slow.write_text(json.dumps(other.snapshot()))
+    long_ago = time.time() - 3600
+    os.utime(slow, (long_ago, long_ago))
+
+    assert 'demo_calls_total{code="200"} 3' in registry.exposition(str(tmp_path))
+    assert slow.exists()
+
+
+def test_retired_snapshot_keeps_counting(tmp_path):
+    registry, counter, _ = make_registry()
+    counter.inc("200", amount=4)
+    registry.write_snapshot(str(tmp_path))
+    registry.retire_snapshot(str(tmp_path))
+
+    # A worker started afterwards still reports the retired worker's counts
+    fresh, fresh_counter, _ = make_registry()
+    fresh_counter.inc("200")
+
+    assert 'demo_calls_total{code="200"} 5' in fresh.exposition(str(tmp_path))
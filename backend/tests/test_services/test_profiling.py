@@ -0,0 +1,36 @@
+import threading
+import time
+
+from app.profiling import ProfileStore, SamplingProfiler
+
+
+def busy_loop(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_profiler_samples_the_target_thread():
+    profiler = SamplingProfiler(thread_id=threading.get_ident(), interval=0.001)
+    profiler.start()
+    busy_loop(0.1)
+    folded = profiler.stop()
+
+    lines = folded.strip().splitlines()
+    assert lines
+    assert any("busy_loop (test_profiling.py" in line for line in lines)
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) >= 1 and ";" in stack
+
+
+def test_store_keeps_newest_profiles(tmp_path):
+    store = ProfileStore(str(tmp_path), max_files=2)
+    ids = []
+    for n in range(3):
+        ids.append(store.save(f"main {n}\n"))
+        time.sleep(0.01)
+
+    assert [p["profile_id"] for p in store.list()] == ids[:0:-1]
+    assert store.path(ids[0]) is None
+    assert store.path(ids[2]).read_text() == "main 2\n"
+    assert store.path("../../etc/passwd") is None
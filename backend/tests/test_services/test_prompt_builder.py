@@ -0,0 +1,66 @@
+import json
+
+from app.ai_service import AIService
+from app.prompt_builder import PromptBuilder
+from app.sop_index import estimate_tokens
+
+
+def test_body_is_valid_json_with_static_prefix():
+    builder = PromptBuilder("openai/gpt-3.5-turbo", AIService.SYSTEM_PROMPT, max_input_tokens=4000)
+
+    first = builder.body("Why does LOTO exist? “quoted” ✓", 0.7)
+    second = builder.body("Another question", 0.5, stream=True)
+
+    payload = json.loads(first)
+    assert payload["model"] == "openai/gpt-3.5-turbo"
+    assert payload["messages"][0] == {"role": "system", "content": AIService.SYSTEM_PROMPT}
+    assert payload["messages"][1]["content"] == "Why does LOTO exist? “quoted” ✓"
+    assert payload["temperature"] == 0.7 and payload["max_tokens"] == 1000
+    assert "stream" not in payload
+    assert json.loads(second)["stream"] is True
+
+    # Both bodies share the byte-identical system prefix
+    prefix = first[:first.index(b'{"role": "user"')]
+    assert second.startswith(prefix) and len(prefix) > len(AIService.SYSTEM_PROMPT)
+
+
+def test_cache_control_hint_for_models_that_need_it():
+    builder = PromptBuilder("anthropic/claude-3-haiku", "Static rules.", cache_hints=True)
+    system = json.loads(builder.body("q", 0.7))["messages"][0]
+    assert system["content"][0]["cache_control"] == {"type": "ephemeral"}
+
+    plain = PromptBuilder("anthropic/claude-3-haiku", "Static rules.", cache_hints=False)
+    assert json.loads(plain.body("q", 0.7))["messages"][0]["content"] == "Static rules."
+
+
+def test_context_is_trimmed_to_the_input_budget(caplog):
+    builder = PromptBuilder("openai/gpt-3.5-turbo", "S" * 400, max_input_tokens=300)
+    context = "\n\n...\n\n".join(f"Section {i}. " + "energy control " * 30 for i in range(10))
+
+    with caplog.at_level("INFO", logger="app.prompt_builder"):
+        message = builder.user_message("Why?", context)
+
+    assert estimate_tokens(message) + builder.system_tokens <= 300
+    assert message.startswith("**Relevant SOP Content:**\nSection 0.")
+    assert message.endswith("**User Question:** Why?")
+    assert "context trimmed" in caplog.text
+
+
+def test_short_context_is_untouched():
+    builder = PromptBuilder("openai/gpt-3.5-turbo", "System.", max_input_tokens=4000)
+    message = builder.user_message("Why?", "Short SOP.")
+    assert message == "**Relevant SOP Content:**\nShort SOP.\n\n**User Question:** Why?"
+
+
+def test_history_sits_before_the_question_and_loses_oldest_turns_first(caplog):
+    builder = PromptBuilder("openai/gpt-3.5-turbo", "System.", max_input_tokens=120)
+    history = "\n\n".join(f"User: question {i}\nAssistant: " + "answer text " * 10 for i in range(5))
+
+    with caplog.at_level("INFO", logger="app.prompt_builder"):
+        message = builder.user_message("And why?", history=history)
+
+    assert message.startswith("**Conversation So Far:**\nUser: question")
+    assert "question 4" in message and "question 0" not in message
+    assert message.endswith("**User Question:** And why?")
+    assert estimate_tokens(message) + builder.system_tokens <= 120
+    assert "history trimmed" in caplog.text
@@ -0,0 +1,125 @@
+import asyncio
+import threading
+import time
+
+import httpx
+from fastapi.testclient import TestClient
+
+from app.ai_service import AIService
+from app.http_client import PooledHTTPClient
+from app.main import app, settings
+from app.response_cache import ResponseCache, normalize_question
+
+
+def counting_service(cache, content="LOTO exists to protect people from hazardous energy."):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+    pool = PooledHTTPClient(transport=httpx.MockTransport(handler))
+    return AIService(http_client=pool, response_cache=cache), calls
+
+
+def test_normalize_question():
+    assert normalize_question("  Why is LOTO   important?? ") == "why is loto important"
+
+
+def test_repeated_question_is_served_from_cache():
+    cache = ResponseCache(max_entries=10, ttl_seconds=60, sqlite_path="")
+    service, calls = counting_service(cache)
+
+    first = asyncio.run(service.generate_explanation("Why is LOTO important?", "SOP body"))
+    second = asyncio.run(service.generate_explanation("why is loto important", "SOP body"))
+
+    assert len(calls) == 1
+    assert "cached" not in first
+    assert second["cached"] is True
+    assert second["response"] == first["response"]
+    assert cache.stats()["hits"] == 1
+
+
+def test_key_changes_with_sop_content_and_prompt():
+    key = ResponseCache.make_key("Explain LOTO", "v1", "model-a", "prompt")
+    assert key != ResponseCache.make_key("Explain LOTO", "v2", "model-a", "prompt")
+    assert key != ResponseCache.make_key("Explain LOTO", "v1", "model-b", "prompt")
+    assert key != ResponseCache.make_key("Explain LOTO", "v1", "model-a", "prompt v2")
+
+
+def test_errors_and_fallbacks_are_not_cached():
+    cache = ResponseCache(max_entries=10, ttl_seconds=60, sqlite_path="")
+
+    def failing(request):
+        return httpx.Response(503)
+
+    service = AIService(http_client=PooledHTTPClient(transport=httpx.MockTransport(failing)), response_cache=cache)
+    result = asyncio.run(service.generate_explanation("Explain LOTO"))
+    assert "error" in result
+
+    service._store_result("k", {"response": AIService.FALLBACK_RESPONSE, "safe": True})
+    assert cache.stats()["stores"] == 0
+
+
+def test_lru_and_ttl_eviction():
+    cache = ResponseCache(max_entries=2, ttl_seconds=60, sqlite_path="")
+    cache.set("a", "A")
+    cache.set("b", "B")
+    asyncio.run(cache.get("a"))
+    cache.set("c", "C")
+    assert asyncio.run(cache.get("b")) is None
+    assert asyncio.run(cache.get("a"))["response"] == "A"
+    assert cache.stats()["evictions"] == 1
+
+    cache._entries["a"] = (time.time() - 1, cache._entries["a"][1])
+    assert asyncio.run(cache.get("a")) is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_sqlite_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = ResponseCache(max_entries=10, ttl_seconds=60, sqlite_path=path)
+    cache.set("key", "Persisted answer", rewritten=True)
+    cache.close()
+
+    reopened = ResponseCache(max_entries=10, ttl_seconds=60, sqlite_path=path)
+    assert asyncio.run(reopened.contains("key"))
+    assert asyncio.run(reopened.get("key")) == {"response": "Persisted answer", "rewritten": True}
+    assert reopened.stats()["persistent_hits"] == 1
+    assert asyncio.run(reopened.purge()) == 1
+    assert asyncio.run(reopened.get("key")) is None
+    reopened.close()
+
+
+def test_sqlite_tier_runs_off_the_event_loop(tmp_path):
+    cache = ResponseCache(max_entries=10, ttl_seconds=60, sqlite_path=str(tmp_path / "cache.db"))
+    loop_threads = set()
+
+    class RecordingConnection:
+        def __init__(self, db):
+            self.db = db
+
+        def execute(self, *args):
+            loop_threads.add(threading.current_thread() is threading.main_thread())
+            return self.db.execute(*args)
+
+        def close(self):
+            self.db.close()
+
+    cache._db = RecordingConnection(cache._db)
+    cache.set("key", "Answer")
+    cache._entries.clear()
+
+    assert asyncio.run(cache.get("key"))["response"] == "Answer"
+    cache.close()
+    assert loop_threads == {False}
+
+
+def test_admin_purge_requires_key(monkeypatch):
+    client = TestClient(app)
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", "secret")
+
+    assert client.delete("/api/admin/cache").status_code == 403
+    response = client.delete("/api/admin/cache", headers={"X-Admin-Key": "secret"})
+    assert response.status_code == 200
+    assert "purged" in response.json()
@@ -0,0 +1,234 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+# Deadline types as the router imported them (the app dir may also be on sys.path)
+from app.router import Deadline, DeadlineExceeded, ModelRouter, UpstreamTarget, UpstreamUnavailable
+
+
+def make_router(n=2, **kwargs):
+    targets = [UpstreamTarget(f"https://upstream-{i}.test/v1/chat/completions", f"model-{i}") for i in range(n)]
+    options = dict(hedge_enabled=True, hedge_initial_delay=0.05, hedge_min_delay=0.01,
+                   breaker_threshold=2, breaker_reset_seconds=60,
+                   max_retries=0, retry_base_delay=0.01, retry_max_delay=0.05)
+    options.update(kwargs)
+    return ModelRouter(targets, **options)
+
+
+def test_fast_primary_needs_no_hedge():
+    router = make_router()
+
+    async def attempt(target):
+        return target.model
+
+    assert asyncio.run(router.call(attempt)) == "model-0"
+    assert router.hedges == 0
+    assert router.targets[1].requests == 0
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    router = make_router()
+    cancelled = []
+
+    async def attempt(target):
+        if target.model == "model-0":
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(target.model)
+                raise
+        return target.model
+
+    assert asyncio.run(router.call(attempt)) == "model-1"
+    assert router.hedges == 1
+    assert cancelled == ["model-0"]
+    stats = router.stats()["targets"]
+    assert stats[0]["cancelled"] == 1 and stats[1]["wins"] == 1
+
+
+def test_failure_fails_over_immediately():
+    router = make_router(hedge_initial_delay=10)
+
+    async def attempt(target):
+        if target.model == "model-0":
+            raise httpx.ConnectError("refused")
+        return "ok"
+
+    async def timed():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        result = await router.call(attempt)
+        return result, loop.time() - start
+
+    result, elapsed = asyncio.run(timed())
+    assert result == "ok" and elapsed < 1
+    assert router.targets[0].errors == 1
+
+
+def test_non_compliant_result_waits_for_a_better_one():
+    router = make_router(hedge_initial_delay=0.01)
+
+    async def attempt(target):
+        if target.model == "model-0":
+            await asyncio.sleep(0.02)
+            return "turn the key"
+        await asyncio.sleep(0.05)
+        return "conceptual"
+
+    result = asyncio.run(router.call(attempt, accept=lambda text: "turn" not in text))
+    assert result == "conceptual"
+
+
+def test_breaker_opens_and_then_fails_fast():
+    router = make_router()
+    calls = []
+
+    async def failing(target):
+        calls.append(target.model)
+        raise httpx.ReadTimeout("slow")
+
+    for _ in range(2):
+        with pytest.raises(httpx.ReadTimeout):
+            asyncio.run(router.call(failing))
+
+    assert all(target["circuit_open"] for target in router.stats()["targets"])
+    calls.clear()
+    with pytest.raises(UpstreamUnavailable):
+        asyncio.run(router.call(failing))
+    assert calls == []
+    assert router.stats()["fast_failures"] == 1
+
+
+def test_half_open_breaker_lets_a_single_trial_through():
+    router = make_router(n=1, breaker_reset_seconds=0.05)
+    target = router.targets[0]
+    target.record_failure(threshold=1, reset_seconds=0.05)
+    release = {}
+
+    async def scenario(outcome):
+        await asyncio.sleep(0.06)
+        release["event"] = asyncio.Event()
+        calls = []
+
+        async def attempt(target):
+            calls.append(target.model)
+            await release["event"].wait()
+            if outcome == "fail":
+                raise httpx.ReadTimeout("still down")
+            return "ok"
+
+        trial = asyncio.ensure_future(router.call(attempt))
+        await asyncio.sleep(0.01)
+        # The trial is in flight: everyone else fails fast
+        with pytest.raises(UpstreamUnavailable):
+            await router.call(attempt)
+        with pytest.raises(UpstreamUnavailable):
+            router.acquire()
+        assert router.stats()["targets"][0]["half_open_probe"] is True
+        release["event"].set()
+        if outcome == "fail":
+            with pytest.raises(httpx.ReadTimeout):
+                await trial
+        else:
+            assert await trial == "ok"
+        return calls
+
+    # A failed trial re-opens the breaker for another period
+    assert asyncio.run(scenario("fail")) == ["model-0"]
+    assert not target.available(time.monotonic())
+    assert target.probing is False
+
+    # A successful trial closes it: requests flow freely again
+    assert asyncio.run(scenario("ok")) == ["model-0"]
+    assert target.open_until == 0.0
+    assert target.claim(time.monotonic()) and target.claim(time.monotonic())
+
+
+def test_cancelled_trial_frees_the_half_open_slot():
+    router = make_router(n=1)
+    target = router.targets[0]
+    target.open_until = time.monotonic() - 1
+
+    async def hang(target):
+        await asyncio.sleep(10)
+
+    async def scenario():
+        trial = asyncio.ensure_future(router.call(hang))
+        await asyncio.sleep(0.01)
+        assert not target.available(time.monotonic())
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+    asyncio.run(scenario())
+    assert target.available(time.monotonic())
+
+
+def status_error(status, headers=None):
+    request = httpx.Request("POST", "https://upstream.test")
+    response = httpx.Response(status, headers=headers, request=request)
+    return httpx.HTTPStatusError(f"{status}", request=request, response=response)
+
+
+def test_transient_errors_are_retried_with_backoff():
+    router = make_router(n=1, max_retries=3)
+    outcomes = [status_error(503), status_error(429), "ok"]
+
+    async def flaky(target):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert asyncio.run(router.call(flaky)) == "ok"
+    assert router.retries == 2
+    assert router.targets[0].errors == 0
+
+
+def test_client_errors_are_not_retried():
+    router = make_router(n=1, max_retries=3)
+    attempts = []
+
+    async def bad_request(target):
+        attempts.append(1)
+        raise status_error(400)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(router.call(bad_request))
+    assert len(attempts) == 1
+
+
+def test_retries_stop_at_the_deadline():
+    router = make_router(n=1, max_retries=5, retry_base_delay=1.0, retry_max_delay=1.0)
+
+    async def rate_limited(target):
+        raise status_error(429, headers={"Retry-After": "1"})
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(router.call(rate_limited, deadline=Deadline.after(0.5)))
+    assert router.retries == 0
+
+
+def test_slow_upstream_hits_the_deadline():
+    router = make_router(n=1)
+
+    async def hanging(target):
+        await asyncio.sleep(5)
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(router.call(hanging, deadline=Deadline.after(0.05)))
+    # Our own budget running out is not held against the target
+    assert router.targets[0].errors == 0
+
+
+def test_open_breaker_moves_traffic_to_next_target():
+    router = make_router()
+    router.targets[0].record_failure(threshold=1, reset_seconds=60)
+
+    async def attempt(target):
+        return target.model
+
+    assert [t.model for t in router.candidates()] == ["model-1"]
+    assert asyncio.run(router.call(attempt)) == "model-1"
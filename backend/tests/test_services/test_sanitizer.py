@@ -0,0 +1,56 @@
+from app.ai_service import AIService
+from app.sanitizer import ComplianceSanitizer, sentence_spans
+
+
+def make_sanitizer(min_retained=0.7):
+    return ComplianceSanitizer(AIService.BANNED_VERB_RULES, min_retained=min_retained)
+
+
+def test_sentence_spans_tile_the_text():
+    text = "Intro line.\n\n1. First, turn the key. Another one!  Last"
+    spans = sentence_spans(text)
+
+    assert "".join(text[a:b] for a, b in spans) == text
+    assert text[spans[1][0]:spans[1][1]] == "1. First, turn the key. "
+
+
+def test_offending_sentence_is_dropped():
+    sanitizer = make_sanitizer()
+    text = (
+        "Lockout-tagout protects people from hazardous energy during servicing. "
+        "Then, disconnect the feed. "
+        "The purpose is to keep equipment in a safe, inactive state until work is complete."
+    )
+
+    result = sanitizer.sanitize(text)
+
+    assert result == (
+        "Lockout-tagout protects people from hazardous energy during servicing. "
+        "The purpose is to keep equipment in a safe, inactive state until work is complete."
+    )
+    assert sanitizer.stats()["sentences_dropped"] == 1
+
+
+def test_phrase_table_rephrases_instead_of_dropping():
+    sanitizer = make_sanitizer()
+    text = "Stored energy can be dangerous.\nYou should verify that the system is de-energized.\n"
+
+    result = sanitizer.sanitize(text)
+
+    assert result == "Stored energy can be dangerous.\nIt is important to confirm that the system is de-energized."
+    assert sanitizer.stats()["sentences_rephrased"] == 1
+
+
+def test_paragraph_breaks_survive_a_dropped_sentence():
+    sanitizer = make_sanitizer(min_retained=0.3)
+    text = "Energy control matters.\n\nPress the button twice.\n\nIt protects maintenance staff."
+
+    assert sanitizer.sanitize(text) == "Energy control matters.\n\nIt protects maintenance staff."
+
+
+def test_escalates_when_too_much_is_lost():
+    sanitizer = make_sanitizer()
+    text = "LOTO matters. First, lock the panel. Then, press the reset. Finally, turn the key to resume."
+
+    assert sanitizer.sanitize(text) is None
+    assert sanitizer.stats()["escalated"] == 1
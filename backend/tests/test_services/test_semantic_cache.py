@@ -0,0 +1,106 @@
+import asyncio
+
+import httpx
+import numpy as np
+
+from app import sample_sops
+from app.ai_service import AIService
+from app.http_client import PooledHTTPClient
+from app.semantic_cache import SemanticCache
+from app.services.embeddings_service import EmbeddingsService
+
+# Paraphrases share concept words; unrelated questions do not
+SYNONYMS = {"loto": "lockout", "tagout": "lockout", "reason": "why"}
+VOCAB = ["lockout", "why", "ppe", "gloves", "forklift", "energy"]
+
+
+class KeywordModel:
+    def encode(self, texts):
+        vectors = []
+        for text in texts:
+            words = [SYNONYMS.get(w.strip("?'s"), w.strip("?'s")) for w in text.lower().split()]
+            vectors.append([float(words.count(term)) + 0.01 for term in VOCAB])
+        return np.array(vectors)
+
+
+def make_service(cache):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, json={"choices": [{"message": {"content": "LOTO protects people."}}]})
+
+    pool = PooledHTTPClient(transport=httpx.MockTransport(handler))
+    return AIService(http_client=pool, semantic_cache=cache), calls
+
+
+def test_paraphrase_served_from_semantic_cache():
+    cache = SemanticCache(EmbeddingsService(KeywordModel()), threshold=0.9, max_entries=8)
+    service, calls = make_service(cache)
+
+    first = asyncio.run(service.generate_explanation("why is LOTO important", "SOP"))
+    second = asyncio.run(service.generate_explanation("what's the reason for lockout tagout", "SOP"))
+    unrelated = asyncio.run(service.generate_explanation("what gloves count as PPE", "SOP"))
+
+    assert "cached" not in first
+    assert second["cached"] is True
+    assert second["semantic_similarity"] >= 0.9
+    assert "cached" not in unrelated
+    assert len(calls) == 2
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["lookups"] == 3
+
+
+def test_lookup_is_scoped_to_sop_partition():
+    cache = SemanticCache(EmbeddingsService(KeywordModel()), threshold=0.9, max_entries=8)
+    service, calls = make_service(cache)
+
+    asyncio.run(service.generate_explanation("why is LOTO important", "SOP A"))
+    other = asyncio.run(service.generate_explanation("why is LOTO important", "SOP B"))
+
+    assert "cached" not in other
+    assert len(calls) == 2
+
+
+def test_paraphrases_over_a_long_sop_share_a_partition(monkeypatch):
+    monkeypatch.setattr(sample_sops, "_chunk_embedder", None)
+    chunks = [
+        "1. Purpose\nLOTO is important because stored energy can restart a machine.",
+        "2. Scope\nThis covers every press and conveyor in the plant.",
+        "3. Background\nThe reason for lockout tagout is to keep hands out of moving parts.",
+        "4. Records\nEach job is logged in the maintenance binder.",
+    ]
+    asyncio.run(sample_sops.add_uploaded_sop("cache_long", "Long SOP", "\n\n".join(chunks), chunks=chunks))
+    first_question, paraphrase = "why is LOTO important", "what's the reason for lockout tagout"
+
+    # The two phrasings retrieve different sections of the same SOP text
+    first_context = asyncio.run(sample_sops.get_sop_context("cache_long", first_question, token_budget=20))
+    second_context = asyncio.run(sample_sops.get_sop_context("cache_long", paraphrase, token_budget=20))
+    assert first_context != second_context
+    version = sample_sops.get_sop_version("cache_long")
+
+    cache = SemanticCache(EmbeddingsService(KeywordModel()), threshold=0.9, max_entries=8)
+    service, calls = make_service(cache)
+    asyncio.run(service.generate_explanation(first_question, first_context, sop_version=version))
+    second = asyncio.run(service.generate_explanation(paraphrase, second_context, sop_version=version))
+
+    assert second["cached"] is True
+    assert len(calls) == 1
+
+    # A new text of the SOP starts a new partition
+    asyncio.run(sample_sops.add_uploaded_sop("cache_long", "Long SOP", "\n\n".join(chunks[::-1]), chunks=chunks[::-1]))
+    assert sample_sops.get_sop_version("cache_long") != version
+
+
+def test_bounded_size_evicts_least_recently_used():
+    cache = SemanticCache(EmbeddingsService(KeywordModel()), threshold=0.99, max_entries=2)
+    for i, question in enumerate(["lockout", "forklift", "gloves"]):
+        _, embedding = asyncio.run(cache.lookup(question, "p"))
+        cache.add(embedding, "p", question, f"answer {i}")
+
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["evictions"] == 1
+    hit, _ = asyncio.run(cache.lookup("lockout", "p"))
+    assert hit is None
+    hit, _ = asyncio.run(cache.lookup("gloves", "p"))
+    assert hit["response"] == "answer 2"
@@ -0,0 +1,63 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.ai_service import AIService
+from app.http_client import PooledHTTPClient
+from app.singleflight import SingleFlight
+
+
+def test_concurrent_identical_questions_share_one_upstream_call():
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"choices": [{"message": {"content": "LOTO protects people."}}]})
+
+    service = AIService(http_client=PooledHTTPClient(transport=httpx.MockTransport(handler)))
+
+    async def run():
+        questions = ["Why is LOTO important?"] * 10 + ["why is loto important"] * 10 + ["Explain PPE"]
+        return await asyncio.gather(*(service.generate_explanation(q, "SOP") for q in questions))
+
+    results = asyncio.run(run())
+    assert len(calls) == 2
+    assert all(r["response"] == results[0]["response"] for r in results[:20])
+    assert len({id(r) for r in results}) == len(results)
+    assert service.single_flight.stats()["collapsed"] == 19
+
+
+def test_exception_reaches_every_waiter():
+    flight = SingleFlight()
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream exploded")
+
+    async def run():
+        return await asyncio.gather(*(flight.do("k", boom) for _ in range(5)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert flight.stats() == {"in_flight": 0, "executions": 1, "collapsed": 4, "collapse_rate": 0.8}
+
+
+def test_cancelled_waiter_does_not_cancel_shared_work():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def run():
+        first = asyncio.ensure_future(flight.do("k", work))
+        second = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == "done"
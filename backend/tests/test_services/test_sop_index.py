@@ -0,0 +1,85 @@
+import asyncio
+
+from app.sample_sops import SOP_INDEX, add_uploaded_sop, get_sop_context
+from app.sop_index import SOPIndex, chunk_sop, estimate_tokens
+
+LONG_SOP = "\n\n".join(
+    [
+        "HYDRAULIC PRESS SAFETY\nGeneral overview of press hazards.",
+        "1. Purpose\nThis SOP explains why stored hydraulic energy is dangerous.",
+        "2. Scope\nCovers every hydraulic press on the stamping line.",
+    ]
+    + [f"{n}. Appendix {n}\n" + "Record keeping filler text. " * 60 for n in range(3, 40)]
+    + ["40. Accumulators\nAccumulators retain hydraulic pressure after shutdown, which is why residual energy matters."]
+)
+
+
+def test_chunks_follow_section_headings():
+    chunks = chunk_sop(LONG_SOP)
+    assert chunks[0].startswith("HYDRAULIC PRESS SAFETY")
+    assert chunks[1].startswith("1. Purpose")
+    assert chunks[-1].startswith("40. Accumulators")
+
+
+def test_oversized_section_is_split_with_heading_repeated():
+    section = "5. Training\n\n" + "\n\n".join(["Paragraph about training. " * 20] * 6)
+    chunks = chunk_sop(section, max_chars=1200)
+    assert len(chunks) > 1
+    assert all(chunk.startswith("5. Training") for chunk in chunks)
+    assert all(len(chunk) <= 1200 + len("5. Training") + 2 for chunk in chunks)
+
+
+def test_text_without_blank_lines_is_split_on_sentences():
+    # Extracted text: one line per step, no headings, no blank lines
+    lines = [f"Check clamp {n} before cycling the press. Wear gloves near station {n}." for n in range(260)]
+    lines[200] = "Bleed the accumulator until the gauge reads zero before any maintenance."
+    content = "\n".join(lines)
+    assert len(content) > 18000
+
+    chunks = chunk_sop(content)
+    assert len(chunks) > 1 and all(len(chunk) <= 1200 for chunk in chunks)
+    assert all(chunk.endswith(".") for chunk in chunks)
+
+    index = SOPIndex()
+    index.add_document("extracted", content)
+    context = index.build_context("how do I bleed the accumulator", "extracted", token_budget=400)
+    assert "Bleed the accumulator" in context
+    assert 0 < estimate_tokens(context) <= 400
+
+
+def test_best_chunk_is_trimmed_rather_than_dropped():
+    index = SOPIndex()
+    # A caller-supplied chunk larger than the whole budget
+    index.add_document("big", "", chunks=["Lock out the press before clearing jams. " * 200])
+
+    context = index.build_context("clearing jams", "big", token_budget=50)
+
+    assert context.startswith("Lock out the press") and context.endswith(".")
+    assert estimate_tokens(context) <= 50
+
+
+def test_bm25_ranks_relevant_chunk_within_sop():
+    index = SOPIndex()
+    index.add_document("press", LONG_SOP)
+    index.add_document("forklift", "1. Speed\nForklift speed limits near accumulators.")
+
+    results = index.search("why do accumulators keep hydraulic pressure", sop_id="press", k=2)
+    assert results[0][1].text.startswith("40. Accumulators")
+    assert all(chunk.sop_id == "press" for _, chunk in results)
+
+
+def test_long_sop_context_respects_budget_and_updates_incrementally():
+    asyncio.run(add_uploaded_sop("test_press", "Hydraulic press", LONG_SOP))
+    context = asyncio.run(get_sop_context("test_press", "accumulator residual energy", token_budget=300))
+    assert "Accumulators retain hydraulic pressure" in context
+    assert estimate_tokens(context) <= 300 + 10
+    assert estimate_tokens(context) < estimate_tokens(LONG_SOP)
+
+    asyncio.run(add_uploaded_sop("test_press", "Hydraulic press", "1. Purpose\nReplaced content about guarding."))
+    assert SOP_INDEX.chunk_count("test_press") == 1
+    assert SOP_INDEX.search("accumulators", sop_id="test_press") == []
+
+
+def test_short_sop_is_returned_whole():
+    context = asyncio.run(get_sop_context("demo_loto", "why is LOTO important"))
+    assert "Lockout/Tagout" in context
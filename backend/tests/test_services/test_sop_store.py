@@ -0,0 +1,130 @@
+import asyncio
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.db.database import create_engine
+from app.sop_index import SOPIndex
+from app.sop_store import SOPStore
+
+BUILTINS = {"demo": {"title": "Demo SOP", "content": "1. Purpose\nBuilt in."}}
+
+
+def run_workers(tmp_path, scenario, workers=2, **options):
+    """Run `scenario` with several SOPStores sharing one database, like uvicorn workers"""
+    async def main():
+        engines = [create_engine(f"sqlite:///{tmp_path / 'sops.db'}") for _ in range(workers)]
+        stores = [SOPStore(BUILTINS, SOPIndex(), engine=engine, **options) for engine in engines]
+        try:
+            return await scenario(*stores)
+        finally:
+            for engine in engines:
+                await engine.dispose()
+    return asyncio.run(main())
+
+
+def test_read_through_caches_bodies_and_lists_uploads(tmp_path):
+    async def scenario(writer, reader):
+        await writer.put("press", "Press guarding", "1. Scope\nAll presses.")
+        listed = await reader.list()
+        first = await reader.get("press")
+        second = await reader.get("press")
+        missing = await reader.get("nope")
+        return listed, first, second, missing, reader
+
+    listed, first, second, missing, reader = run_workers(tmp_path, scenario, check_interval=60)
+
+    assert listed == [{"id": "demo", "title": "Demo SOP"}, {"id": "press", "title": "Press guarding"}]
+    assert first["content"] == "1. Scope\nAll presses." and second is first
+    assert missing is None
+    assert reader.stats()["misses"] == 2 and reader.stats()["hits"] == 1
+    assert reader.index.chunk_count("press") == 1
+
+
+def test_lru_evicts_least_recently_used_and_its_chunks(tmp_path):
+    async def scenario(store):
+        for sop_id in ("a", "b", "c"):
+            await store.put(sop_id, sop_id.upper(), f"1. Scope\nSOP {sop_id}.")
+        await store.get("b")
+        await store.put("d", "D", "1. Scope\nSOP d.")
+        reloaded = await store.get("c")
+        return store, reloaded
+
+    store, reloaded = run_workers(tmp_path, scenario, workers=1, max_entries=3)
+
+    assert store.peek("a") is None and store.index.chunk_count("a") == 0
+    assert reloaded["content"] == "1. Scope\nSOP c."
+    assert [sop_id for sop_id in ("b", "c", "d") if store.peek(sop_id)] == ["b", "c", "d"]
+
+
+def test_version_counter_invalidates_other_workers(tmp_path):
+    async def scenario(writer, reader):
+        await writer.put("press", "Press guarding", "1. Scope\nOld text.")
+        await writer.put("forklift", "Forklifts", "1. Scope\nForklift text.")
+        await reader.get("press")
+        await reader.get("forklift")
+
+        await writer.put("press", "Press guarding", "1. Scope\nNew text.")
+        # Within the check interval the reader still serves its copy
+        stale = (await reader.get("press"))["content"]
+        reader._next_check = 0
+        fresh = (await reader.get("press"))["content"]
+        return stale, fresh, reader
+
+    stale, fresh, reader = run_workers(tmp_path, scenario, check_interval=60)
+
+    assert stale == "1. Scope\nOld text."
+    assert fresh == "1. Scope\nNew text."
+    # Only the changed SOP was dropped
+    assert reader.stats()["invalidations"] == 1
+    assert reader.peek("forklift") is not None
+    assert reader.index.search("new", sop_id="press")
+
+
+def test_failed_version_check_keeps_serving_the_cache(tmp_path):
+    async def scenario(store):
+        await store.put("press", "Press guarding", "1. Scope\nAll presses.")
+        await store.list()
+
+        original = store._sessions
+
+        def broken():
+            raise OperationalError("SELECT version", {}, Exception("database is locked"))
+
+        store._sessions = broken
+        store._next_check = 0
+        listed = await store.list()
+        cached = await store.get("press")
+        # Retried only after the next interval
+        retry_at = store._next_check
+        store._sessions = original
+        store._next_check = 0
+        await store.list()
+        return listed, cached, retry_at, store
+
+    listed, cached, retry_at, store = run_workers(tmp_path, scenario, workers=1, check_interval=60)
+
+    assert [item["id"] for item in listed] == ["demo", "press"]
+    assert cached["content"] == "1. Scope\nAll presses."
+    assert retry_at > 0
+    assert store.stats()["check_errors"] == 1 and store.stats()["version_checks"] >= 2
+
+
+def test_documents_table_from_an_older_release_is_upgraded(tmp_path):
+    async def scenario(store):
+        async with store.engine.begin() as connection:
+            await connection.execute(text(
+                "CREATE TABLE documents (id INTEGER PRIMARY KEY, title VARCHAR(255) NOT NULL, "
+                "content TEXT NOT NULL, created_at INTEGER NOT NULL, updated_at INTEGER NOT NULL)"
+            ))
+            await connection.execute(text(
+                "INSERT INTO documents (title, content, created_at, updated_at) VALUES ('Old', 'Old body.', 0, 0)"
+            ))
+        await store.put("press", "Press guarding", "1. Scope\nAll presses.")
+        store._next_check = 0
+        return await store.list(), await store.get("1")
+
+    listed, old = run_workers(tmp_path, scenario, workers=1)
+
+    assert [item["id"] for item in listed] == ["demo", "1", "press"]
+    assert old["content"] == "Old body." and old["version"] == 1
@@ -0,0 +1,78 @@
+import asyncio
+import json
+
+import httpx
+
+from app.ai_service import AIService
+from app.http_client import PooledHTTPClient
+from app.response_cache import ResponseCache
+from app.warmup import load_questions, warm_cache
+
+
+def make_service(tmp_path, fail_on=()):
+    calls = []
+
+    def handler(request):
+        question = json.loads(request.content)["messages"][1]["content"]
+        calls.append(question)
+        if any(marker in question for marker in fail_on):
+            return httpx.Response(400)
+        return httpx.Response(200, json={"choices": [{"message": {"content": "LOTO protects people."}}]})
+
+    cache = ResponseCache(sqlite_path=str(tmp_path / "cache.sqlite3"))
+    service = AIService(http_client=PooledHTTPClient(transport=httpx.MockTransport(handler)), response_cache=cache)
+    return service, cache, calls
+
+
+def test_load_questions_merges_faq_and_file(tmp_path):
+    path = tmp_path / "faq.json"
+    path.write_text(json.dumps({"demo_loto": ["Why is LOTO important?", "What is a tag?"], "": ["What is PPE?"]}))
+
+    pairs = asyncio.run(load_questions(str(path)))
+
+    assert ("demo_loto", "What is the purpose of lockout/tagout?") in pairs
+    assert pairs.count(("demo_loto", "Why is LOTO important?")) == 1
+    assert ("demo_loto", "What is a tag?") in pairs
+    assert (None, "What is PPE?") in pairs
+
+
+def test_warm_up_populates_cache_and_skips_on_rerun(tmp_path):
+    questions = [("demo_loto", "Why is LOTO important?"), (None, "What is hazardous energy?"),
+                 (None, "Can I skip the lockout step?")]
+    service, cache, calls = make_service(tmp_path)
+
+    report = asyncio.run(warm_cache(service, questions, concurrency=2))
+
+    assert report["generated"] == 3 and report["cached"] == 2 and report["filtered"] == 1
+    assert len(calls) == 2
+
+    # A new process sharing the SQLite tier finds everything already cached
+    cache.close()
+    service, cache, calls = make_service(tmp_path)
+    report = asyncio.run(warm_cache(service, questions[:2], concurrency=2))
+    assert report["skipped_cached"] == 2 and report["generated"] == 0
+    assert calls == []
+
+
+def test_state_file_resumes_without_retrying(tmp_path):
+    state = str(tmp_path / "state.jsonl")
+    questions = [(None, "What is hazardous energy?"), (None, "Can I skip the lockout step?")]
+    service, cache, calls = make_service(tmp_path)
+    service.response_cache = ResponseCache()  # memory-only: nothing survives a restart
+
+    asyncio.run(warm_cache(service, questions, state_path=state))
+    service.response_cache = ResponseCache()
+    report = asyncio.run(warm_cache(service, questions, state_path=state))
+
+    assert report["skipped_resumed"] == 2 and report["generated"] == 0
+    assert len(calls) == 1
+
+
+def test_failures_are_counted_and_retried_next_run(tmp_path):
+    state = str(tmp_path / "state.jsonl")
+    service, cache, calls = make_service(tmp_path, fail_on=("broken",))
+
+    report = asyncio.run(warm_cache(service, [(None, "A broken question")], state_path=state))
+
+    assert report["failed"] == 1
+    assert open(state).read() == ""